@@ -1,68 +1,184 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, flash, redirect, request, url_for
 from flask_login import LoginManager
 from flask_mail import Mail
 from backend.routes.auth import auth_bp
 from backend.routes.compliance import comp_bp
 from backend.routes.dashboard import dash_bp
+from backend.routes.admin import admin_bp
+from backend.routes.calendar import calendar_bp
 from backend.utils.billing import billing_bp
-from backend.database.database import db
+from backend.database.database import db, get_database_uri, get_database_binds, get_shard_binds, get_engine_options, apply_sqlite_pragmas, remember_last_write, init_db_command
+from backend.database.sharding import move_organization_command, OrganizationMoving
+from backend.database.replication import sync_replica_command
 from backend.models.auth import User
 from backend.models.compliance import ComplianceRequirement, ComplianceDocument
-from backend.models.reminders import ReminderLog
-from backend.models.finance import Subscription
-from backend.utils.scheduler import start_scheduler
+from backend.models.reminders import ReminderLog, ReminderRollup
+from backend.models.finance import Subscription, StripeEvent
+from backend.models.profiling import Profile, JobProfileRequest
+from backend.models.history import ComplianceSnapshot
+from backend.models.imports import ImportJob
+from backend.utils.scheduler import start_scheduler, run_scheduler_command
+from backend.utils.history import backfill_snapshots_command
+from backend.utils.status import backfill_document_stats_command
+from backend.utils.renewal import normalize_renewal_frequencies_command
+from backend.utils.stripe_events import start_event_worker, replay_stripe_events_command
+from backend.utils.identity import load_identity
+from backend.utils.entitlements import require_entitlement
+from backend.utils.assets import init_assets, build_assets_command
+from backend.utils.compression import init_compression
+from backend.utils.sql_timing import init_sql_timing
+from backend.utils.profiling import init_profiling
 from dotenv import load_dotenv
 import os
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__, template_folder="frontend/templates", static_folder="frontend/static")
-
-# Configuration
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///clearcomply.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
-
-# Email configuration
-app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
-app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
-app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'true').lower() in ['true', 'on', '1']
-app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
-app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@clearcomply.com')
-
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-# Initialize extensions
-db.init_app(app)
-mail = Mail(app)
+mail = Mail()
 
 # Initialize Flask-Login
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    return load_identity(int(user_id))
+
+# Gate protected blueprints on the organization's entitlement
+dash_bp.before_request(require_entitlement)
+comp_bp.before_request(require_entitlement)
 
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/auth')
-app.register_blueprint(dash_bp, url_prefix='/dashboard')
-app.register_blueprint(comp_bp, url_prefix='/compliance')
-app.register_blueprint(billing_bp, url_prefix='/billing')
+def create_app(config=None):
+    """
+    Build the application. config overrides settings read from the environment.
+    Nothing is created or started here: run `flask init-db` for the schema,
+    and start_background_workers (or `flask run-scheduler`) for background jobs.
+    """
+    app = Flask(__name__, template_folder="frontend/templates", static_folder="frontend/static")
+    
+    # Configuration
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+    app.config['SQLALCHEMY_DATABASE_URI'] = get_database_uri()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    # Optional organization shards (SHARD_DATABASE_URLS) for compliance data
+    app.config['SQLALCHEMY_BINDS'] = {**get_database_binds(), **get_shard_binds()}
+    app.config['DATABASE_SHARDS'] = list(get_shard_binds())
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Seconds after a client's write during which its reads stay on the primary
+    app.config['REPLICA_STALENESS_SECONDS'] = float(os.environ.get('REPLICA_STALENESS_SECONDS', 5))
+    app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', os.path.join(os.path.dirname(__file__), 'uploads'))
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+    # Response compression: COMPRESS_LEVEL trades CPU for size (1 fastest .. 9 smallest, 0 off);
+    # buffered responses smaller than COMPRESS_MIN_SIZE bytes are not worth compressing
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 5))
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    app.config['REQUIREMENTS_PAGE_SIZE'] = int(os.environ.get('REQUIREMENTS_PAGE_SIZE', 50))
+    # Rendered dashboard/list fragments kept per process, keyed by organization data version (0 disables)
+    app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get('FRAGMENT_CACHE_SIZE', 1000))
+    # Per-request SQL timing (Server-Timing header); requests taking at least SLOW_REQUEST_MS
+    # are logged as JSON with their costliest statements, to SLOW_REQUEST_LOG when set (0 disables)
+    app.config['SQL_TIMING_ENABLED'] = os.environ.get('SQL_TIMING_ENABLED', 'true').lower() in ['true', 'on', '1']
+    app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', 500))
+    app.config['SLOW_REQUEST_TOP_STATEMENTS'] = int(os.environ.get('SLOW_REQUEST_TOP_STATEMENTS', 5))
+    app.config['SLOW_REQUEST_LOG'] = os.environ.get('SLOW_REQUEST_LOG')
+    # Operators allowed on the admin pages (comma separated emails)
+    app.config['ADMIN_EMAILS'] = [email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()]
+    # On-demand profiles (pstats files) and how many of the newest are kept
+    app.config['PROFILE_FOLDER'] = os.environ.get('PROFILE_FOLDER', os.path.join(os.path.dirname(__file__), 'profiles'))
+    app.config['PROFILE_RETENTION'] = int(os.environ.get('PROFILE_RETENTION', 50))
+    # Seconds the admin analytics page reuses its last computation (0 recomputes on every view)
+    app.config['ANALYTICS_CACHE_TTL'] = int(os.environ.get('ANALYTICS_CACHE_TTL', 900))
+    app.config['FILE_SWEEP_BATCH_SIZE'] = int(os.environ.get('FILE_SWEEP_BATCH_SIZE', 500))
+    app.config['FILE_SWEEP_GRACE_MINUTES'] = int(os.environ.get('FILE_SWEEP_GRACE_MINUTES', 60))
+    # Reminder logs older than this are compacted into monthly rollups, a batch per transaction
+    app.config['REMINDER_LOG_RETENTION_DAYS'] = int(os.environ.get('REMINDER_LOG_RETENTION_DAYS', 90))
+    app.config['REMINDER_COMPACT_BATCH_SIZE'] = int(os.environ.get('REMINDER_COMPACT_BATCH_SIZE', 1000))
+    # Seconds to cache the logged-in user, organization and subscription per process (0 disables)
+    app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 0))
+    # Seconds to cache each organization's subscription entitlement snapshot
+    app.config['ENTITLEMENT_CACHE_TTL'] = int(os.environ.get('ENTITLEMENT_CACHE_TTL', 300))
+    # Password hashing: werkzeug method string (e.g. 'scrypt', 'scrypt:65536:8:1', 'pbkdf2:sha256:600000'),
+    # pool size bounding concurrent hashes, and how long a request waits for a pool slot
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    # Redirect organizations without an active trial or subscription to billing
+    app.config['ENTITLEMENT_GATE_ENABLED'] = os.environ.get('ENTITLEMENT_GATE_ENABLED', 'false').lower() in ['true', 'on', '1']
 
-@app.route('/')
-def landing_page():
-    return render_template('landing_page.html')
+    # Email configuration
+    app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'true').lower() in ['true', 'on', '1']
+    app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
+    app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
+    app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@clearcomply.com')
+    
+    # Run the scheduler inside this process (single-process deployments); otherwise use `flask run-scheduler`
+    app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED', 'false').lower() in ['true', 'on', '1']
+    # Apply stored Stripe webhook events in a background thread of each web process
+    app.config['EVENT_WORKER_ENABLED'] = os.environ.get('EVENT_WORKER_ENABLED', 'true').lower() in ['true', 'on', '1']
+    
+    if config:
+        app.config.update(config)
+        if 'SQLALCHEMY_DATABASE_URI' in config and 'SQLALCHEMY_ENGINE_OPTIONS' not in config:
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    
+    # Initialize extensions
+    db.init_app(app)
+    init_sql_timing(app)
+    init_profiling(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine)
+    app.after_request(remember_last_write)
+    mail.init_app(app)
+    init_assets(app)
+    init_compression(app)
+    login_manager.init_app(app)
+    
+    # Register blueprints
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(dash_bp, url_prefix='/dashboard')
+    app.register_blueprint(comp_bp, url_prefix='/compliance')
+    app.register_blueprint(billing_bp, url_prefix='/billing')
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(calendar_bp, url_prefix='/calendar')
+    
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(run_scheduler_command)
+    app.cli.add_command(replay_stripe_events_command)
+    app.cli.add_command(sync_replica_command)
+    app.cli.add_command(move_organization_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(backfill_snapshots_command)
+    app.cli.add_command(backfill_document_stats_command)
+    app.cli.add_command(normalize_renewal_frequencies_command)
+    
+    @app.route('/')
+    def landing_page():
+        return render_template('landing_page.html')
+    
+    @app.errorhandler(OrganizationMoving)
+    def organization_moving(error):
+        flash('Your organization is being migrated. Changes are paused for a moment; please try again shortly.', 'warning')
+        return redirect(request.referrer or url_for('dashboard.dashboard'))
+    
+    return app
 
-# Create tables and start scheduler
-with app.app_context():
-    db.create_all()
-    start_scheduler(app, mail)
+def start_background_workers(app):
+    """
+    Start this process's Stripe event worker, and the scheduler when
+    SCHEDULER_ENABLED. Call once per process, after any fork.
+    """
+    if app.config['EVENT_WORKER_ENABLED']:
+        start_event_worker(app)
+    if app.config['SCHEDULER_ENABLED']:
+        start_scheduler(app, mail)
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app = create_app()
+    start_background_workers(app)
+    # The reloader would start a second copy of the background workers
+    app.run(debug=True, use_reloader=False)
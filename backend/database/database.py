@@ -1,3 +1,262 @@
+from flask import current_app, g, has_request_context, session
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+import sqlalchemy as sa
+from sqlalchemy.sql import util as sql_util
+from functools import wraps
+import click
+import time
+import os
 
-db = SQLAlchemy()
\ No newline at end of file
+# Bind key of the optional read replica (REPLICA_DATABASE_URL)
+REPLICA_BIND = 'replica'
+
+# Bind keys of the optional organization shards (SHARD_DATABASE_URLS) are shard0, shard1, ...
+SHARD_BIND_PREFIX = 'shard'
+
+def sharded_table(mapper=None, clause=None):
+    """
+    A per-organization table (tables with info['sharded']) a statement reads
+    or writes, if any. Every table counts, including both sides of joins and
+    subqueries: with one sharded table anywhere, only a shard can run it.
+    """
+    tables = []
+    if mapper is not None:
+        tables.append(sa.inspect(mapper).local_table)
+    if isinstance(clause, sa.Table):
+        tables.append(clause)
+    elif isinstance(clause, (sa.Select, sa.UpdateBase)):
+        tables.extend(sql_util.find_tables(clause, include_crud=True))
+
+    for table in tables:
+        if isinstance(table, sa.Table) and table.info.get('sharded'):
+            return table
+    return None
+
+class RoutingSession(Session):
+    """
+    Session that sends per-organization tables to the organization's shard
+    when sharding is enabled, and SELECTs from read-only views to the replica
+    bind. Flushes, writes and every other request use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and current_app.config.get('DATABASE_SHARDS')
+            and sharded_table(mapper, clause) is not None
+        ):
+            from backend.database.sharding import resolve_shard
+            key = resolve_shard(for_write=self._flushing or getattr(clause, 'is_dml', False))
+            return self._db.engines[key]
+
+        if (
+            bind is None
+            and not self._flushing
+            and has_request_context()
+            and g.get('use_replica')
+            and getattr(clause, 'is_select', False)
+        ):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _record_write(db_session, flush_context):
+    """
+    Note that this request wrote, so the client is pinned to the primary for a while
+    """
+    if has_request_context():
+        g.db_write = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _record_statement_write(orm_execute_state):
+    """
+    Same for INSERT/UPDATE/DELETE statements run through session.execute
+    (bulk and Core DML), which write without a flush
+    """
+    if has_request_context() and (
+        orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete
+    ):
+        g.db_write = True
+
+def remember_last_write(response):
+    """
+    after_request hook: store the time of this client's last write in its session cookie
+    """
+    if g.get('db_write'):
+        session['last_write_at'] = time.time()
+    return response
+
+def read_replica(view):
+    """
+    Route a read-only view's queries to the replica, unless this client wrote
+    within REPLICA_STALENESS_SECONDS and must read its own writes from the primary
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        staleness = current_app.config.get('REPLICA_STALENESS_SECONDS', 5)
+        last_write_at = session.get('last_write_at', 0)
+        g.use_replica = time.time() - last_write_at > staleness
+        return view(*args, **kwargs)
+    return wrapper
+
+def normalize_database_uri(uri):
+    """
+    Some hosts still hand out the pre-SQLAlchemy-1.4 postgres:// scheme
+    """
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def get_database_uri():
+    """
+    Database URI from DATABASE_URL, defaulting to the local SQLite file
+    """
+    return normalize_database_uri(os.environ.get('DATABASE_URL', 'sqlite:///clearcomply.db'))
+
+def get_database_binds():
+    """
+    Extra binds; currently just the optional read replica
+    """
+    replica_uri = os.environ.get('REPLICA_DATABASE_URL')
+    if not replica_uri:
+        return {}
+
+    replica_uri = normalize_database_uri(replica_uri)
+    return {REPLICA_BIND: {'url': replica_uri, **get_engine_options(replica_uri)}}
+
+def get_shard_binds():
+    """
+    Organization shard binds from SHARD_DATABASE_URLS (comma separated), keyed shard0, shard1, ...
+    """
+    urls = [url.strip() for url in os.environ.get('SHARD_DATABASE_URLS', '').split(',') if url.strip()]
+
+    binds = {}
+    for index, url in enumerate(urls):
+        url = normalize_database_uri(url)
+        binds[f'{SHARD_BIND_PREFIX}{index}'] = {'url': url, **get_engine_options(url)}
+    return binds
+
+def get_engine_options(uri):
+    """
+    Engine options for the configured backend.
+    PostgreSQL gets a tuned connection pool; SQLite is tuned per connection
+    by apply_sqlite_pragmas instead.
+    """
+    if uri.startswith('sqlite'):
+        return {
+            # Seconds the driver waits on a locked database before raising
+            'connect_args': {'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000}
+        }
+
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True
+    }
+
+def apply_sqlite_pragmas(engine):
+    """
+    Apply WAL and cache pragmas to every new SQLite connection so the
+    scheduler's commits and user writes don't serialize on the rollback journal
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        # Negative cache_size is in KiB
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)),
+    }
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def add_missing_columns(engine, tables):
+    """
+    Add model columns missing from tables that already exist; create_all only
+    creates whole tables. Columns are added when that is safe on a populated
+    table: nullable, or NOT NULL with a server default, and not unique.
+    Others need their own upgrade step (e.g. backfill-document-stats).
+    Returns 'table.column' names.
+    """
+    inspector = sa.inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    ddl = engine.dialect.ddl_compiler(engine.dialect, None)
+
+    added = []
+    with engine.begin() as connection:
+        for table in tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or column.unique or column.primary_key:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    continue
+                connection.execute(sa.text(
+                    f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl.get_column_specification(column)}'
+                ))
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+def add_missing_indexes(engine, tables):
+    """
+    Create model indexes missing from tables that already exist; create_all
+    only builds indexes along with a new table. Returns the index names.
+    """
+    added = []
+    with engine.begin() as connection:
+        # One connection throughout, and listing tables first: SQLite's index
+        # list can otherwise come from a pooled connection's stale schema
+        inspector = sa.inspect(connection)
+        existing_tables = set(inspector.get_table_names())
+        for table in tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection, checkfirst=True)
+                    added.append(index.name)
+    return added
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """
+    Create any missing tables on the primary database and every shard, and
+    add new columns and indexes to tables created by an earlier release.
+    """
+    # Imported here; sharding imports this module
+    from backend.database.sharding import create_shard_tables, shard_keys, sharded_tables
+
+    added = add_missing_columns(db.engine, db.metadata.tables.values())
+    for key in shard_keys():
+        added += add_missing_columns(db.engines[key], sharded_tables())
+
+    db.create_all()
+    indexed = add_missing_indexes(db.engine, db.metadata.tables.values())
+    indexed += create_shard_tables()
+    click.echo('Database tables created')
+    if added:
+        click.echo(f"Columns added: {', '.join(added)}")
+    if indexed:
+        click.echo(f"Indexes added: {', '.join(indexed)}")
@@ -0,0 +1,43 @@
+from backend.database.database import db, REPLICA_BIND
+from flask.cli import with_appcontext
+import sqlite3
+import click
+import time
+
+def copy_sqlite_database(source_path, target_path):
+    """
+    Copy a live SQLite database onto another file with the online backup API
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+@click.command('sync-replica')
+@click.option('--interval', default=2.0, show_default=True, help='Seconds between copies (the replication lag).')
+@click.option('--once', is_flag=True, help='Copy once and exit.')
+@with_appcontext
+def sync_replica_command(interval, once):
+    """
+    Local replication stand-in: keep the SQLite replica file in sync with the primary.
+    """
+    engines = db.engines
+    if REPLICA_BIND not in engines:
+        raise click.ClickException('REPLICA_DATABASE_URL is not set')
+
+    primary, replica = engines[None], engines[REPLICA_BIND]
+    if primary.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise click.ClickException('The replication stand-in only copies SQLite files')
+
+    # Let the replica's pooled connections see the new file contents
+    replica.dispose()
+
+    while True:
+        copy_sqlite_database(primary.url.database, replica.url.database)
+        replica.dispose()
+        if once:
+            break
+        time.sleep(interval)
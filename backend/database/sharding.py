@@ -0,0 +1,422 @@
+from backend.database.database import db, sharded_table, add_missing_indexes
+from backend.models.auth import OrganizationShard
+from backend.models.compliance import ComplianceRequirement, ComplianceDocument
+from backend.models.reminders import ReminderLog, ReminderRollup
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import current_app, g, has_request_context
+from flask.cli import with_appcontext
+from flask_login import current_user
+import hashlib
+import click
+import time
+
+# Rows per batch when copying or deleting an organization's data during a move
+MOVE_BATCH_SIZE = 1000
+
+# Copies of a moving organization made before giving up on writes landing during the copy
+MOVE_COPY_ATTEMPTS = 3
+
+# New rows on shard N get ids from (N + 1) * SHARD_ID_SPAN, the primary below
+# SHARD_ID_SPAN, so rows keep their ids when an organization moves. Integer
+# keys leave room for 20 shards.
+SHARD_ID_SPAN = 100_000_000
+
+_UNSET = object()
+
+# Explicit shard (bind key, None for the primary) for scheduler jobs and tools
+_current_shard = ContextVar('current_shard', default=_UNSET)
+
+# Explicit organization for work outside a request, e.g. import threads
+_current_organization = ContextVar('current_organization', default=None)
+
+class OrganizationMoving(Exception):
+    """Raised on a write to an organization whose data is being moved between shards"""
+
+class ShardNotSelected(Exception):
+    """Raised when a per-organization table is queried with no organization or shard in scope"""
+
+def shard_keys():
+    """
+    Bind keys of the configured shards (empty when sharding is off)
+    """
+    return list(current_app.config.get('DATABASE_SHARDS', []))
+
+def data_shards():
+    """
+    Every database holding compliance data: the primary (None), which keeps
+    organizations that were never placed on a shard, followed by the shards
+    """
+    return [None] + shard_keys()
+
+def sharded_tables():
+    """
+    Tables that live on the organization's shard
+    """
+    return [table for table in db.metadata.tables.values() if sharded_table(clause=table) is not None]
+
+@contextmanager
+def shard_scope(key):
+    """
+    Route per-organization tables to one shard (None for the primary) for the block
+    """
+    token = _current_shard.set(key)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+@contextmanager
+def organization_scope(organization_id):
+    """
+    Route per-organization tables to this organization's shard for the block
+    """
+    token = _current_organization.set(organization_id)
+    try:
+        yield
+    finally:
+        _current_organization.reset(token)
+
+def get_organization_shard(organization_id):
+    """
+    (bind key, moving) for an organization, read straight from the primary.
+    Organizations without a directory row live on the primary.
+    """
+    with db.engine.connect() as connection:
+        row = connection.execute(
+            db.select(OrganizationShard.shard, OrganizationShard.moving).where(
+                OrganizationShard.organization_id == organization_id
+            )
+        ).first()
+
+    if row is None:
+        return None, False
+    return row.shard, row.moving
+
+def moving_organizations():
+    """
+    Ids of organizations whose data is being moved, read straight from the primary
+    """
+    with db.engine.connect() as connection:
+        return connection.execute(
+            db.select(OrganizationShard.organization_id).where(OrganizationShard.moving.is_(True))
+        ).scalars().all()
+
+def check_no_moves():
+    """
+    Raise OrganizationMoving while any organization is being moved. Writes
+    covering a whole shard, and jobs combining data read from several
+    shards, can't leave the moving organization out, so they wait it out.
+    """
+    moving = moving_organizations()
+    if moving:
+        raise OrganizationMoving(*moving)
+
+def resolve_shard(for_write=False):
+    """
+    Bind key for per-organization tables in the current context: an explicit
+    shard_scope, else the scoped or logged-in user's organization. Placements
+    are looked up once per app context for reads and again for every write,
+    so a placement cached before a move started never sends writes to the source.
+    """
+    key = _current_shard.get()
+    if key is not _UNSET:
+        if for_write:
+            check_no_moves()
+        return key
+
+    organization_id = _current_organization.get()
+    if organization_id is None and has_request_context() and current_user.is_authenticated:
+        organization_id = current_user.organization_id
+    if organization_id is None:
+        raise ShardNotSelected('No organization or shard in scope for a per-organization table')
+
+    placements = g.setdefault('organization_shards', {})
+    if for_write or organization_id not in placements:
+        placements[organization_id] = get_organization_shard(organization_id)
+    key, moving = placements[organization_id]
+
+    if for_write and moving:
+        raise OrganizationMoving(organization_id)
+
+    return key
+
+def place_organization(organization_id):
+    """
+    Assign a new organization to a shard. Call inside the transaction that creates it.
+    """
+    shards = shard_keys()
+    if not shards:
+        return None
+
+    placement = OrganizationShard(
+        organization_id=organization_id,
+        shard=shards[organization_id % len(shards)]
+    )
+    db.session.add(placement)
+    return placement
+
+def run_on_shards(app, func):
+    """
+    Run func() once per data shard in parallel, each in its own app context
+    and shard scope. Returns {bind key: result}.
+    """
+    with app.app_context():
+        keys = data_shards()
+
+    def run(key):
+        with app.app_context(), shard_scope(key):
+            return func()
+
+    with ThreadPoolExecutor(max_workers=len(keys), thread_name_prefix='shard') as pool:
+        return dict(zip(keys, pool.map(run, keys)))
+
+def create_shard_tables():
+    """
+    Create the per-organization tables on every shard, and their indexes
+    where the tables already existed, and reserve each shard's id range.
+    Foreign keys to tables that only exist on the primary (organization) are
+    left out. Returns the names of indexes added to existing tables.
+    """
+    tables = sharded_tables()
+    names = {table.name for table in tables}
+
+    metadata = db.MetaData()
+    for table in tables:
+        copy = table.to_metadata(metadata)
+        # SQLite only honours a starting id on AUTOINCREMENT tables
+        copy.dialect_options['sqlite']['autoincrement'] = True
+        for constraint in list(copy.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.split('.')[0] not in names:
+                copy.constraints.discard(constraint)
+                for element in constraint.elements:
+                    element.parent.foreign_keys.discard(element)
+                    copy.foreign_keys.discard(element)
+
+    indexed = []
+    for index, key in enumerate(shard_keys()):
+        engine = db.engines[key]
+        metadata.create_all(engine)
+        indexed += add_missing_indexes(engine, metadata.tables.values())
+        with engine.begin() as connection:
+            for table in tables:
+                _reserve_ids(connection, table.name, (index + 1) * SHARD_ID_SPAN)
+    return indexed
+
+def _reserve_ids(connection, table_name, first_id):
+    """
+    Make a table's next generated id at least first_id. Never moves a
+    sequence backwards. SQLite always allocates after the largest id in the
+    table, so once an organization moves onto an SQLite shard its new rows
+    continue from the moved ids; the conflict check before a move catches
+    any overlap that causes.
+    """
+    if connection.dialect.name == 'postgresql':
+        sequence = connection.execute(
+            db.text("SELECT pg_get_serial_sequence(:table_name, 'id')"), {'table_name': table_name}
+        ).scalar()
+        if sequence:
+            connection.execute(db.text(
+                f'SELECT setval(:sequence, GREATEST(:last_id, (SELECT last_value FROM {sequence})))'
+            ), {'sequence': sequence, 'last_id': first_id - 1})
+    elif connection.dialect.name == 'sqlite':
+        autoincrement = connection.execute(
+            db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :table_name AND sql LIKE '%AUTOINCREMENT%'"),
+            {'table_name': table_name}
+        ).first()
+        if autoincrement:
+            updated = connection.execute(
+                db.text('UPDATE sqlite_sequence SET seq = MAX(seq, :last_id) WHERE name = :table_name'),
+                {'table_name': table_name, 'last_id': first_id - 1}
+            ).rowcount
+            if not updated:
+                connection.execute(
+                    db.text('INSERT INTO sqlite_sequence (name, seq) VALUES (:table_name, :last_id)'),
+                    {'table_name': table_name, 'last_id': first_id - 1}
+                )
+
+def _set_placement(organization_id, **fields):
+    """
+    Upsert an organization's directory row and commit
+    """
+    placement = db.session.get(OrganizationShard, organization_id)
+    if placement is None:
+        placement = OrganizationShard(organization_id=organization_id)
+        db.session.add(placement)
+    for field, value in fields.items():
+        setattr(placement, field, value)
+    db.session.commit()
+
+def _organization_filters(organization_id):
+    """
+    (table, WHERE clause) for each table holding an organization's rows, parents first
+    """
+    requirements = ComplianceRequirement.__table__
+    requirement_ids = db.select(requirements.c.id).where(requirements.c.organization_id == organization_id)
+    return [(requirements, requirements.c.organization_id == organization_id)] + [
+        (table, table.c.requirement_id.in_(requirement_ids))
+        for table in [ComplianceDocument.__table__, ReminderLog.__table__, ReminderRollup.__table__]
+    ]
+
+def _organization_fingerprint(organization_id, engine):
+    """
+    ({table: row count}, digest of every row) of an organization's data on
+    one database; the digest changes with any write to it
+    """
+    counts = {}
+    digest = hashlib.sha1()
+    with engine.connect() as connection:
+        for table, where in _organization_filters(organization_id):
+            rows = connection.execution_options(yield_per=MOVE_BATCH_SIZE).execute(
+                db.select(table).where(where).order_by(table.c.id)
+            )
+            counts[table.name] = 0
+            for row in rows:
+                digest.update(repr(tuple(row)).encode())
+                counts[table.name] += 1
+    return counts, digest.hexdigest()
+
+def _conflicting_ids(organization_id, source, target):
+    """
+    Number of the organization's rows whose id is already taken on the
+    target, e.g. rows created before shards had separate id ranges
+    """
+    conflicts = 0
+    with source.connect() as src, target.connect() as dst:
+        for table, where in _organization_filters(organization_id):
+            ids = src.execution_options(yield_per=MOVE_BATCH_SIZE).execute(
+                db.select(table.c.id).where(where)
+            ).scalars()
+            for batch in ids.partitions(MOVE_BATCH_SIZE):
+                conflicts += dst.execute(
+                    db.select(db.func.count()).select_from(table).where(table.c.id.in_(batch))
+                ).scalar()
+    return conflicts
+
+def _copy_organization(organization_id, source, target):
+    """
+    Copy an organization's requirements, documents and reminder history,
+    ids included, in batches inside one target transaction
+    """
+    report = {}
+
+    with source.connect() as src, target.begin() as dst:
+        for table, where in _organization_filters(organization_id):
+            report[table.name] = 0
+            last_id = 0
+            while True:
+                rows = src.execute(
+                    db.select(table).where(where, table.c.id > last_id).order_by(table.c.id).limit(MOVE_BATCH_SIZE)
+                ).mappings().all()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                dst.execute(table.insert(), [dict(row) for row in rows])
+                report[table.name] += len(rows)
+
+    return report
+
+def _delete_organization(organization_id, engine):
+    """
+    Delete an organization's rows from a shard in short batched transactions
+    """
+    requirements = ComplianceRequirement.__table__
+
+    while True:
+        with engine.begin() as connection:
+            ids = connection.execute(
+                db.select(requirements.c.id).where(
+                    requirements.c.organization_id == organization_id
+                ).limit(MOVE_BATCH_SIZE)
+            ).scalars().all()
+            if not ids:
+                break
+            for table in [ReminderLog.__table__, ReminderRollup.__table__, ComplianceDocument.__table__]:
+                connection.execute(table.delete().where(table.c.requirement_id.in_(ids)))
+            connection.execute(requirements.delete().where(requirements.c.id.in_(ids)))
+
+def move_organization(organization_id, target, settle_seconds=2):
+    """
+    Move an organization's compliance data, ids included, to another shard
+    while the app keeps serving it. Reads continue from the source until the
+    directory points at the target; writes are refused with OrganizationMoving
+    from when the move starts until the source copy is gone.
+
+    Writers check the directory on every write, but one that checked before
+    the move started can still commit to the source. So the source is
+    fingerprinted before and after each copy, and the copy is redone when it
+    changed. It is checked once more before the source rows are deleted,
+    and the move is rolled back if it changed.
+    """
+    source_key, moving = get_organization_shard(organization_id)
+    if moving:
+        raise click.ClickException(f'Organization {organization_id} is already being moved')
+    if source_key == target:
+        return None
+
+    source, destination = db.engines[source_key], db.engines[target]
+
+    conflicts = _conflicting_ids(organization_id, source, destination)
+    if conflicts:
+        raise click.ClickException(
+            f'{conflicts} of organization {organization_id}\'s rows have ids already used on {target or "primary"}'
+        )
+
+    _set_placement(organization_id, shard=source_key, moving=True)
+
+    try:
+        for attempt in range(MOVE_COPY_ATTEMPTS):
+            # Let requests and jobs that checked the directory before the freeze finish
+            time.sleep(settle_seconds)
+
+            counts, before = _organization_fingerprint(organization_id, source)
+            report = _copy_organization(organization_id, source, destination)
+            if _organization_fingerprint(organization_id, source)[1] == before and report == counts:
+                break
+
+            print(f"[Sharding] Organization {organization_id} changed during copy {attempt + 1}; copying again")
+            _delete_organization(organization_id, destination)
+        else:
+            raise click.ClickException(
+                f'Organization {organization_id} kept changing during the copy; try again when it is quieter'
+            )
+    except Exception:
+        _delete_organization(organization_id, destination)
+        _set_placement(organization_id, moving=False)
+        raise
+
+    # Reads switch to the target; writes stay paused until the source is gone
+    _set_placement(organization_id, shard=target, moving=True)
+
+    if _organization_fingerprint(organization_id, source)[1] != before:
+        _set_placement(organization_id, shard=source_key, moving=True)
+        _delete_organization(organization_id, destination)
+        _set_placement(organization_id, moving=False)
+        raise click.ClickException(
+            f'Organization {organization_id} was written to during the move; it stays on {source_key or "primary"}'
+        )
+
+    _delete_organization(organization_id, source)
+    _set_placement(organization_id, moving=False)
+
+    return report
+
+@click.command('move-organization')
+@click.argument('organization_id', type=int)
+@click.argument('target')
+@click.option('--settle-seconds', default=2.0, show_default=True, help='Wait after pausing writes before copying.')
+@with_appcontext
+def move_organization_command(organization_id, target, settle_seconds):
+    """
+    Move an organization's data to TARGET (a shard bind key, or 'primary').
+    """
+    target = None if target == 'primary' else target
+    if target not in data_shards():
+        raise click.ClickException(f'Unknown shard: {target}')
+
+    report = move_organization(organization_id, target, settle_seconds)
+    if report is None:
+        click.echo(f'Organization {organization_id} is already on {target or "primary"}')
+    else:
+        click.echo(f'Moved organization {organization_id} to {target or "primary"}: {report}')
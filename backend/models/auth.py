@@ -1,13 +1,12 @@
 from backend.database.database import db
 from flask_login import UserMixin
-from datetime import datetime, timedelta
 
 class User(UserMixin, db.Model):
     __tablename__ = 'user'
     
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
     
     # Foreign key
@@ -18,31 +17,33 @@ class User(UserMixin, db.Model):
 
 class Organization(db.Model):
     __tablename__ = 'organization'
+    __table_args__ = (
+        # A unique index rather than a column constraint, so init-db can add it to existing tables
+        db.Index('ix_organization_calendar_token', 'calendar_token', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), unique=True, nullable=False)
     org_owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped whenever displayed data changes
+    data_changed_at = db.Column(db.DateTime)  # When data_version was last bumped
+    calendar_token = db.Column(db.String(64))  # Secret in the iCalendar feed URL; NULL when the feed is off
+    profile_requests = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Upcoming requests to profile
     
     # Relationships
     owner = db.relationship('User', foreign_keys=[org_owner_id])
     users = db.relationship('User', back_populates='organization', foreign_keys='User.organization_id')
     subscription = db.relationship('Subscription', back_populates='organization', uselist=False)
     
+    def get_entitlement(self):
+        """Get the cached entitlement snapshot (status, trial end, period end, access)"""
+        from backend.utils.entitlements import get_entitlement
+        return get_entitlement(self)
+    
     def get_trial_days_remaining(self):
         """Get number of trial days remaining"""
-        from backend.models.finance import Subscription
-        subscription = Subscription.query.filter_by(organization_id=self.id).first()
-        
-        if subscription:
-            if subscription.status == 'trial' and subscription.trial_end:
-                days_left = (subscription.trial_end - datetime.utcnow()).days
-                return max(0, days_left)
-        
-        # Default 30 day trial from creation
-        trial_end = self.created_at + timedelta(days=30)
-        days_left = (trial_end - datetime.utcnow()).days
-        return max(0, days_left)
+        return self.get_entitlement()['trial_days_remaining']
     
     def is_trial_expired(self):
         """Check if trial has expired"""
@@ -50,14 +51,17 @@ class Organization(db.Model):
     
     def has_active_subscription(self):
         """Check if organization has an active subscription or is in trial"""
-        from backend.models.finance import Subscription
-        subscription = Subscription.query.filter_by(organization_id=self.id).first()
-        if not subscription:
-            return False
-        return subscription.status in ['trial', 'active'] and not self.is_trial_expired()
+        return self.get_entitlement()['access_allowed']
     
     def get_subscription_status(self):
         """Get subscription status"""
-        from backend.models.finance import Subscription
-        subscription = Subscription.query.filter_by(organization_id=self.id).first()
-        return subscription.status if subscription else 'trial'
\ No newline at end of file
+        return self.get_entitlement()['status']
+
+class OrganizationShard(db.Model):
+    __tablename__ = 'organization_shard'
+    
+    # Organizations without a row keep their compliance data on the primary database
+    organization_id = db.Column(db.Integer, db.ForeignKey('organization.id'), primary_key=True)
+    shard = db.Column(db.String(50))  # Bind key; NULL means the primary
+    moving = db.Column(db.Boolean, nullable=False, default=False)  # Writes paused while set
+    updated_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
@@ -1,30 +1,68 @@
 from backend.database.database import db
 from datetime import datetime
 
+# Renewal frequencies: key stored in renewal_frequency -> (label, months per period).
+# 'days' and 'months' periods take their length from renewal_interval_days and
+# renewal_interval_months.
+RENEWAL_FREQUENCIES = {
+    'monthly': ('Monthly', 1),
+    'quarterly': ('Quarterly', 3),
+    'semiannual': ('Semi-annual', 6),
+    'annual': ('Annual', 12),
+    'biennial': ('Every 2 Years', 24),
+    'days': ('Every N Days', None),
+    'months': ('Every N Months', None),
+}
+
 class ComplianceRequirement(db.Model):
     __tablename__ = 'compliance_requirement'
+    __table_args__ = (
+        # Keyset pagination of an organization's requirements list
+        db.Index('ix_compliance_requirement_org_expiration', 'organization_id', 'expiration_date', 'id'),
+        # Lives on the organization's shard when sharding is enabled
+        {'info': {'sharded': True}}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     expiration_date = db.Column(db.Date, nullable=False)
     renewal_frequency = db.Column(db.String(50))
+    renewal_interval_days = db.Column(db.Integer)
+    renewal_interval_months = db.Column(db.Integer)
     status = db.Column(db.String(20), default='missing')
     organization_id = db.Column(db.Integer, db.ForeignKey('organization.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalized document stats, maintained on upload and delete
+    document_count = db.Column(db.Integer, nullable=False, default=0)
+    latest_document_uploaded_at = db.Column(db.DateTime)
+    
     # Relationships
     organization = db.relationship('Organization', backref='requirements')
     documents = db.relationship('ComplianceDocument', back_populates='requirement', cascade='all, delete-orphan')
+    
+    @property
+    def renewal_frequency_label(self):
+        """Display text for the renewal frequency; older free-text values are shown as entered"""
+        if self.renewal_frequency == 'days' and self.renewal_interval_days:
+            return f'Every {self.renewal_interval_days} days'
+        if self.renewal_frequency == 'months' and self.renewal_interval_months:
+            return f'Every {self.renewal_interval_months} months'
+        if self.renewal_frequency in RENEWAL_FREQUENCIES:
+            return RENEWAL_FREQUENCIES[self.renewal_frequency][0]
+        return self.renewal_frequency
 
 class ComplianceDocument(db.Model):
     __tablename__ = 'compliance_document'
+    __table_args__ = {'info': {'sharded': True}}
     
     id = db.Column(db.Integer, primary_key=True)
-    requirement_id = db.Column(db.Integer, db.ForeignKey('compliance_requirement.id'), nullable=False)
+    requirement_id = db.Column(db.Integer, db.ForeignKey('compliance_requirement.id'), nullable=False, index=True)
     filename = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
+    stored_name = db.Column(db.String(255), index=True)  # Name of the file in the upload folder (basename of file_path)
     description = db.Column(db.Text)
     version = db.Column(db.Integer, default=1)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -12,8 +12,26 @@ class Subscription(db.Model):
     trial_end = db.Column(db.DateTime)
     current_period_end = db.Column(db.DateTime)
     cancel_at_period_end = db.Column(db.Boolean, default=False)
+    last_event_created = db.Column(db.BigInteger)  # Stripe timestamp of the newest webhook event applied
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    organization = db.relationship('Organization', back_populates='subscription', uselist=False)
\ No newline at end of file
+    organization = db.relationship('Organization', back_populates='subscription', uselist=False)
+
+class StripeEvent(db.Model):
+    __tablename__ = 'stripe_event'
+    __table_args__ = (
+        # Worker picks up unprocessed events in Stripe's order
+        db.Index('ix_stripe_event_pending', 'processed_at', 'created', 'received_at'),
+    )
+    
+    id = db.Column(db.String(255), primary_key=True)  # Stripe event id (evt_...)
+    type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # Raw verified webhook body
+    created = db.Column(db.BigInteger, nullable=False)  # Stripe's event timestamp
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+    claimed_at = db.Column(db.DateTime)  # Set while a worker is applying the event
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
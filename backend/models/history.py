@@ -0,0 +1,20 @@
+from backend.database.database import db
+
+class ComplianceSnapshot(db.Model):
+    __tablename__ = 'compliance_snapshot'
+    __table_args__ = (
+        # Platform-wide trends read one date range across every organization
+        db.Index('ix_compliance_snapshot_date', 'snapshot_date'),
+    )
+
+    # Status counts of one organization on one day, appended by the nightly
+    # status job. Kept on the primary even when compliance data is sharded,
+    # so trends for one or all organizations are a single range scan.
+    organization_id = db.Column(db.Integer, db.ForeignKey('organization.id'), primary_key=True)
+    snapshot_date = db.Column(db.Date, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    compliant = db.Column(db.Integer, nullable=False, default=0)
+    expiring_soon = db.Column(db.Integer, nullable=False, default=0)
+    expired = db.Column(db.Integer, nullable=False, default=0)
+    missing = db.Column(db.Integer, nullable=False, default=0)
+    backfilled = db.Column(db.Boolean, nullable=False, default=False)  # Reconstructed rather than recorded
@@ -0,0 +1,19 @@
+from backend.database.database import db
+from datetime import datetime
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_job'
+    
+    # Progress of a bulk requirements import. Kept on the primary so any web
+    # process can report on a job running in another one.
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    organization_id = db.Column(db.Integer, db.ForeignKey('organization.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='validating')  # validating, importing, completed, failed
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.JSON, nullable=False, default=list)  # [row_number, message] pairs, capped
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.Text, nullable=False, default='')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    finished_at = db.Column(db.DateTime)
@@ -0,0 +1,22 @@
+from backend.database.database import db
+from datetime import datetime
+
+class Profile(db.Model):
+    __tablename__ = 'profile'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # request, job
+    name = db.Column(db.String(255), nullable=False)  # "GET /compliance/export/csv" or the job id
+    organization_id = db.Column(db.Integer, db.ForeignKey('organization.id'))
+    requested_by = db.Column(db.String(120))  # Admin email, NULL for per-organization and job flags
+    file_path = db.Column(db.String(500), nullable=False)  # pstats dump
+    duration_ms = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class JobProfileRequest(db.Model):
+    __tablename__ = 'job_profile_request'
+    
+    # The next run of the job is profiled, then the row is removed
+    job = db.Column(db.String(50), primary_key=True)
+    requested_by = db.Column(db.String(120))
+    requested_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
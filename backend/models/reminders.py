@@ -3,12 +3,35 @@ from datetime import datetime
 
 class ReminderLog(db.Model):
     __tablename__ = 'reminder_log'
+    __table_args__ = (
+        # Dedupe lookups only scan a requirement's recent sends of one type
+        db.Index('ix_reminder_log_requirement_type_sent', 'requirement_id', 'reminder_type', 'sent_at'),
+        {'info': {'sharded': True}}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     requirement_id = db.Column(db.Integer, db.ForeignKey('compliance_requirement.id'), nullable=False)
     reminder_type = db.Column(db.String(20), nullable=False)  # '30_day', '7_day', 'day_of'
-    sent_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     email_to = db.Column(db.String(120), nullable=False)
     
     # Relationships
-    requirement = db.relationship('ComplianceRequirement', backref='reminder_logs')
\ No newline at end of file
+    requirement = db.relationship('ComplianceRequirement', backref=db.backref('reminder_logs', cascade='all, delete-orphan'))
+
+class ReminderRollup(db.Model):
+    __tablename__ = 'reminder_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('requirement_id', 'month', name='uq_reminder_rollup_requirement_month'),
+        {'info': {'sharded': True}}
+    )
+    
+    # Compacted reminder history: one row per requirement per month,
+    # written when reminder logs pass the retention window
+    id = db.Column(db.Integer, primary_key=True)
+    requirement_id = db.Column(db.Integer, db.ForeignKey('compliance_requirement.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)  # First day of the month
+    reminder_count = db.Column(db.Integer, nullable=False, default=0)
+    last_sent_at = db.Column(db.DateTime)
+    
+    # Relationships
+    requirement = db.relationship('ComplianceRequirement', backref=db.backref('reminder_rollups', cascade='all, delete-orphan'))
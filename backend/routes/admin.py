@@ -0,0 +1,87 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
+from flask_login import current_user
+from backend.database.database import db
+from backend.models.auth import Organization
+from backend.models.profiling import Profile, JobProfileRequest
+from backend.utils.admin import admin_required
+from backend.utils.identity import invalidate_identity
+from backend.utils.profiling import PROFILE_HEADER, PROFILABLE_JOBS
+from backend.utils.analytics import get_operator_analytics, STATUSES
+import os
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.route('/profiles', methods=['GET'])
+@admin_required
+def profiles():
+    return render_template(
+        'admin_profiles.html',
+        profiles=Profile.query.order_by(Profile.created_at.desc(), Profile.id.desc()).all(),
+        flagged_organizations=Organization.query.filter(Organization.profile_requests > 0).order_by(Organization.name).all(),
+        job_requests=JobProfileRequest.query.order_by(JobProfileRequest.requested_at).all(),
+        jobs=PROFILABLE_JOBS,
+        profile_header=PROFILE_HEADER
+    )
+
+@admin_bp.route('/profiles/organization', methods=['POST'])
+@admin_required
+def flag_organization():
+    try:
+        organization_id = int(request.form.get('organization_id', ''))
+        count = max(0, int(request.form.get('count', 1)))
+    except ValueError:
+        flash('Organization id and request count must be numbers', 'error')
+        return redirect(url_for('admin.profiles'))
+    
+    # A Core update, so flagging doesn't expire the organization's cached pages
+    table = Organization.__table__
+    updated = db.session.execute(
+        table.update().where(table.c.id == organization_id).values(profile_requests=count)
+    ).rowcount
+    db.session.commit()
+    
+    if not updated:
+        flash('Organization not found', 'error')
+    else:
+        invalidate_identity(organization_id=organization_id)
+        flash(f'The next {count} requests of organization {organization_id} will be profiled', 'success')
+    
+    return redirect(url_for('admin.profiles'))
+
+@admin_bp.route('/profiles/job', methods=['POST'])
+@admin_required
+def flag_job():
+    job = request.form.get('job')
+    
+    if job not in PROFILABLE_JOBS:
+        flash('Unknown job', 'error')
+        return redirect(url_for('admin.profiles'))
+    
+    db.session.merge(JobProfileRequest(job=job, requested_by=current_user.email))
+    db.session.commit()
+    
+    flash(f'The next run of {job} will be profiled', 'success')
+    return redirect(url_for('admin.profiles'))
+
+@admin_bp.route('/profiles/<int:profile_id>/download', methods=['GET'])
+@admin_required
+def download_profile(profile_id):
+    profile = Profile.query.get_or_404(profile_id)
+    
+    if not os.path.isfile(profile.file_path):
+        flash('Profile file is missing', 'error')
+        return redirect(url_for('admin.profiles'))
+    
+    return send_file(profile.file_path, as_attachment=True, download_name=os.path.basename(profile.file_path))
+
+@admin_bp.route('/analytics', methods=['GET'])
+@admin_required
+def analytics():
+    return render_template('admin_analytics.html', analytics=get_operator_analytics(), statuses=STATUSES)
+
+@admin_bp.route('/analytics/refresh', methods=['POST'])
+@admin_required
+def refresh_analytics():
+    get_operator_analytics(refresh=True)
+    flash('Analytics recomputed', 'success')
+    return redirect(url_for('admin.analytics'))
@@ -1,9 +1,10 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from backend.models.auth import User, Organization
 from backend.models.finance import Subscription
 from backend.database.database import db
+from backend.database.sharding import place_organization
+from backend.utils.passwords import hash_password, verify_password, needs_rehash, PasswordHashBusy
 from datetime import datetime, timedelta
 
 auth_bp = Blueprint('auth', __name__)
@@ -20,10 +21,16 @@ def register():
             flash('Email already registered', 'error')
             return redirect(url_for('auth.register'))
         
+        try:
+            password_hash = hash_password(password)
+        except PasswordHashBusy:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return redirect(url_for('auth.register'))
+        
         # Create new user
         new_user = User(
             email=email,
-            password_hash=generate_password_hash(password)
+            password_hash=password_hash
         )
         db.session.add(new_user)
         db.session.flush()  # Get the user ID
@@ -39,6 +46,9 @@ def register():
         # Link user to organization
         new_user.organization_id = new_org.id
         
+        # Choose the shard for the organization's compliance data
+        place_organization(new_org.id)
+        
         # Create trial subscription (30 days)
         trial_end = datetime.utcnow() + timedelta(days=30)
         new_subscription = Subscription(
@@ -64,7 +74,21 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            valid = user is not None and verify_password(user.password_hash, password)
+        except PasswordHashBusy:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return render_template('login.html')
+        
+        if valid:
+            # Upgrade hashes made with outdated parameters while we have the plaintext
+            if needs_rehash(user.password_hash):
+                try:
+                    user.password_hash = hash_password(password)
+                    db.session.commit()
+                except PasswordHashBusy:
+                    pass
+            
             login_user(user)
             return redirect(url_for('dashboard.dashboard'))
         else:
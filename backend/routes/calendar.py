@@ -0,0 +1,69 @@
+from flask import Blueprint, request, redirect, url_for, flash, abort, current_app
+from flask_login import login_required, current_user
+from backend.database.database import db
+from backend.database.sharding import organization_scope
+from backend.models.auth import Organization
+from backend.utils.calendar_feed import build_calendar, organization_requirements
+from backend.utils.page_cache import cached_fragment
+from backend.utils.entitlements import get_entitlement
+import secrets
+
+calendar_bp = Blueprint('calendar', __name__)
+
+@calendar_bp.route('/<token>.ics', methods=['GET'])
+def feed(token):
+    """
+    iCalendar feed of an organization's expirations. Calendar clients poll
+    it without a session, so the secret token in the URL is the credential.
+    The body is built once per data version; unchanged polls get a 304.
+    """
+    organization = Organization.query.filter_by(calendar_token=token).first()
+    if organization is None:
+        abort(404)
+    # Same rule as require_entitlement, which can't redirect a calendar client to billing
+    if current_app.config.get('ENTITLEMENT_GATE_ENABLED') and not get_entitlement(organization)['access_allowed']:
+        abort(404)
+
+    def render():
+        with organization_scope(organization.id):
+            return build_calendar(
+                organization,
+                organization_requirements(organization.id),
+                lambda requirement: url_for('compliance.view_requirement', requirement_id=requirement.id, _external=True)
+            )
+
+    body, etag = cached_fragment(organization.id, organization.data_version, 'calendar', None, render)
+
+    response = current_app.response_class(body, mimetype='text/calendar')
+    response.set_etag(etag)
+    if organization.data_changed_at:
+        response.last_modified = organization.data_changed_at
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Content-Disposition'] = 'inline; filename="clearcomply.ics"'
+    return response.make_conditional(request)
+
+@calendar_bp.route('/token', methods=['POST'])
+@login_required
+def reset_token():
+    """Create the organization's feed link, or replace it so the old one stops working"""
+    if not current_user.organization:
+        return redirect(url_for('auth.login'))
+
+    current_user.organization.calendar_token = secrets.token_urlsafe(32)
+    db.session.commit()
+
+    flash('Calendar feed link created. Add it to your calendar app as a subscription.', 'success')
+    return redirect(url_for('dashboard.dashboard'))
+
+@calendar_bp.route('/token/delete', methods=['POST'])
+@login_required
+def delete_token():
+    """Turn the feed off"""
+    if not current_user.organization:
+        return redirect(url_for('auth.login'))
+
+    current_user.organization.calendar_token = None
+    db.session.commit()
+
+    flash('Calendar feed link removed.', 'success')
+    return redirect(url_for('dashboard.dashboard'))
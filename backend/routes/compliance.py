@@ -1,11 +1,20 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, send_from_directory, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, send_from_directory, send_file, Response, stream_with_context
 from flask_login import login_required, current_user
-from backend.database.database import db
-from backend.models.compliance import ComplianceRequirement, ComplianceDocument
-from backend.utils.status import update_requirement_status, update_all_statuses
-from backend.utils.export import generate_compliance_pdf, generate_compliance_csv, generate_requirement_detail_pdf
-from datetime import datetime
+from markupsafe import Markup
+from sqlalchemy.orm import selectinload
+from backend.database.database import db, read_replica
+from backend.models.compliance import ComplianceRequirement, ComplianceDocument, RENEWAL_FREQUENCIES
+from backend.utils.status import update_requirement_status, refresh_document_stats
+from backend.utils.export import generate_compliance_pdf, stream_compliance_csv, generate_requirement_detail_pdf, CSV_CHUNK_ROWS
+from backend.utils.file_cleanup import enqueue_file_removal, stored_file_path
+from backend.utils.bulk_import import start_import_job, get_import_job
+from backend.utils.page_cache import get_data_version, cached_fragment, page_etag, conditional_page
+from backend.utils.renewal import parse_renewal_frequency, next_expiration_date, renew_all_due
+from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
+from urllib.parse import quote
+import unicodedata
+import tempfile
 import os
 
 comp_bp = Blueprint('compliance', __name__)
@@ -13,23 +22,107 @@ comp_bp = Blueprint('compliance', __name__)
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'jpg', 'jpeg', 'png', 'txt'}
 
+# Allowed bulk import file extensions
+IMPORT_EXTENSIONS = {'csv', 'xlsx'}
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Status values accepted by the list filter
+STATUS_FILTERS = {'compliant', 'expiring_soon', 'expired', 'missing'}
+
+def parse_cursor(cursor):
+    """
+    Parse an 'after' cursor of the form YYYY-MM-DD.<id> into (expiration_date, id)
+    """
+    try:
+        date_part, id_part = cursor.split('.', 1)
+        return datetime.strptime(date_part, '%Y-%m-%d').date(), int(id_part)
+    except (AttributeError, ValueError):
+        return None
+
 @comp_bp.route('/', methods=['GET'])
 @login_required
+@read_replica
 def compliance():
     if not current_user.organization:
         return redirect(url_for('auth.login'))
     
-    # Auto-update all statuses before displaying
-    update_all_statuses(current_user.organization_id)
+    status = request.args.get('status', '')
+    search = request.args.get('q', '').strip()
+    expires_within = request.args.get('expires_within', type=int)
+    cursor = parse_cursor(request.args.get('after'))
+    page_size = current_app.config['REQUIREMENTS_PAGE_SIZE']
     
-    requirements = ComplianceRequirement.query.filter_by(
-        organization_id=current_user.organization_id
-    ).order_by(ComplianceRequirement.expiration_date).all()
+    org_id = current_user.organization_id
+    version = get_data_version(org_id)
+    
+    filters = {
+        'status': status,
+        'q': search,
+        'expires_within': expires_within if expires_within is not None else ''
+    }
+    
+    def render_requirements_table():
+        query = ComplianceRequirement.query.filter_by(
+            organization_id=org_id
+        )
+        
+        if status in STATUS_FILTERS:
+            query = query.filter(ComplianceRequirement.status == status)
+        
+        if search:
+            query = query.filter(db.or_(
+                ComplianceRequirement.name.icontains(search, autoescape=True),
+                ComplianceRequirement.description.icontains(search, autoescape=True)
+            ))
+        
+        if expires_within is not None:
+            today = datetime.now().date()
+            query = query.filter(
+                ComplianceRequirement.expiration_date >= today,
+                ComplianceRequirement.expiration_date <= today + timedelta(days=expires_within)
+            )
+        
+        # Keyset pagination on (expiration_date, id)
+        if cursor:
+            query = query.filter(db.tuple_(
+                ComplianceRequirement.expiration_date, ComplianceRequirement.id
+            ) > db.tuple_(*cursor))
+        
+        requirements = query.order_by(
+            ComplianceRequirement.expiration_date, ComplianceRequirement.id
+        ).limit(page_size + 1).all()
+        
+        next_cursor = None
+        if len(requirements) > page_size:
+            requirements = requirements[:page_size]
+            last = requirements[-1]
+            next_cursor = f"{last.expiration_date.strftime('%Y-%m-%d')}.{last.id}"
+        
+        table = Markup(render_template(
+            'partials/requirements_table.html',
+            requirements=requirements,
+            filters=filters,
+            next_cursor=next_cursor,
+            is_first_page=cursor is None
+        ))
+        return table, bool(requirements)
+    
+    def render_page():
+        requirements_table, has_requirements = cached_fragment(
+            org_id, version, 'requirements_table',
+            (status, search, expires_within, cursor, page_size),
+            render_requirements_table
+        )
+        return render_template(
+            'requirements.html',
+            requirements_table=requirements_table,
+            has_requirements=has_requirements,
+            filters=filters
+        )
     
-    return render_template('requirements.html', requirements=requirements)
+    return conditional_page(page_etag(org_id, version, current_user.id), render_page)
 
 @comp_bp.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -41,17 +134,28 @@ def add_requirement():
         name = request.form.get('name')
         description = request.form.get('description')
         expiration_date = request.form.get('expiration_date')
-        renewal_frequency = request.form.get('renewal_frequency')
         
         if not name or not expiration_date:
             flash('Name and expiration date are required', 'error')
             return render_template('add_requirement.html')
         
+        try:
+            renewal_frequency, renewal_interval_days, renewal_interval_months = parse_renewal_frequency(
+                request.form.get('renewal_frequency'),
+                request.form.get('renewal_interval_days'),
+                request.form.get('renewal_interval_months')
+            )
+        except ValueError as e:
+            flash(str(e), 'error')
+            return render_template('add_requirement.html')
+        
         requirement = ComplianceRequirement(
             name=name,
             description=description,
             expiration_date=datetime.strptime(expiration_date, '%Y-%m-%d').date(),
             renewal_frequency=renewal_frequency,
+            renewal_interval_days=renewal_interval_days,
+            renewal_interval_months=renewal_interval_months,
             organization_id=current_user.organization_id,
             status='missing'
         )
@@ -67,8 +171,51 @@ def add_requirement():
     
     return render_template('add_requirement.html')
 
+@comp_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_requirements():
+    """Bulk import requirements from a CSV or XLSX file"""
+    if not current_user.organization:
+        return redirect(url_for('auth.login'))
+    
+    if request.method == 'POST':
+        file = request.files.get('file')
+        
+        if not file or file.filename == '':
+            flash('No file selected', 'error')
+            return redirect(request.url)
+        
+        extension = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
+        if extension not in IMPORT_EXTENSIONS:
+            flash('Invalid file type. Allowed: CSV, XLSX', 'error')
+            return redirect(request.url)
+        
+        # Keep the upload outside UPLOAD_FOLDER; the import job removes it when done
+        fd, file_path = tempfile.mkstemp(suffix=f'.{extension}', prefix='clearcomply_import_')
+        with os.fdopen(fd, 'wb') as temp_file:
+            file.save(temp_file)
+        
+        job_id = start_import_job(current_app._get_current_object(), current_user.organization_id, file_path)
+        
+        return redirect(url_for('compliance.import_status', job_id=job_id))
+    
+    return render_template('import_requirements.html', job=None)
+
+@comp_bp.route('/import/<job_id>', methods=['GET'])
+@login_required
+def import_status(job_id):
+    """Show progress and row errors for a bulk import"""
+    job = get_import_job(job_id)
+    
+    if not job or job['organization_id'] != current_user.organization_id:
+        flash('Import not found', 'error')
+        return redirect(url_for('compliance.import_requirements'))
+    
+    return render_template('import_requirements.html', job=job)
+
 @comp_bp.route('/<int:requirement_id>', methods=['GET'])
 @login_required
+@read_replica
 def view_requirement(requirement_id):
     requirement = ComplianceRequirement.query.get_or_404(requirement_id)
     
@@ -76,10 +223,6 @@ def view_requirement(requirement_id):
         flash('Access denied', 'error')
         return redirect(url_for('compliance.compliance'))
     
-    # Update status before viewing
-    update_requirement_status(requirement)
-    db.session.commit()
-    
     return render_template('requirement_detail.html', requirement=requirement)
 
 @comp_bp.route('/<int:requirement_id>/edit', methods=['GET', 'POST'])
@@ -92,10 +235,26 @@ def edit_requirement(requirement_id):
         return redirect(url_for('compliance.compliance'))
     
     if request.method == 'POST':
+        frequency = request.form.get('renewal_frequency')
+        try:
+            renewal = parse_renewal_frequency(
+                frequency,
+                request.form.get('renewal_interval_days'),
+                request.form.get('renewal_interval_months')
+            )
+        except ValueError as e:
+            # A free-text frequency from before the fixed list, left as it was
+            if frequency and frequency == requirement.renewal_frequency and frequency not in RENEWAL_FREQUENCIES:
+                renewal = None
+            else:
+                flash(str(e), 'error')
+                return render_template('edit_requirement.html', requirement=requirement, frequencies=RENEWAL_FREQUENCIES)
+        
         requirement.name = request.form.get('name')
         requirement.description = request.form.get('description')
         requirement.expiration_date = datetime.strptime(request.form.get('expiration_date'), '%Y-%m-%d').date()
-        requirement.renewal_frequency = request.form.get('renewal_frequency')
+        if renewal is not None:
+            requirement.renewal_frequency, requirement.renewal_interval_days, requirement.renewal_interval_months = renewal
         requirement.updated_at = datetime.utcnow()
         
         # Update status based on new expiration date
@@ -106,7 +265,27 @@ def edit_requirement(requirement_id):
         flash('Requirement updated successfully!', 'success')
         return redirect(url_for('compliance.view_requirement', requirement_id=requirement.id))
     
-    return render_template('edit_requirement.html', requirement=requirement)
+    return render_template('edit_requirement.html', requirement=requirement, frequencies=RENEWAL_FREQUENCIES)
+
+@comp_bp.route('/renew-due', methods=['POST'])
+@login_required
+def renew_due_requirements():
+    """Roll forward every expired or expiring requirement that has a renewal frequency and a new document"""
+    if not current_user.organization:
+        return redirect(url_for('auth.login'))
+    
+    renewed, skipped, awaiting = renew_all_due(current_user.organization_id)
+    
+    if renewed:
+        flash(f'Renewed {renewed} requirement(s).', 'success')
+    elif not awaiting:
+        flash('No requirements were due for renewal.', 'info')
+    if awaiting:
+        flash(f'{awaiting} due requirement(s) have no document uploaded since they came due and were left unchanged. Upload the renewed documents to renew them.', 'warning')
+    if skipped:
+        flash(f'{skipped} due requirement(s) have no renewal frequency and were left unchanged.', 'warning')
+    
+    return redirect(url_for('compliance.compliance'))
 
 @comp_bp.route('/<int:requirement_id>/delete', methods=['POST'])
 @login_required
@@ -117,16 +296,14 @@ def delete_requirement(requirement_id):
         flash('Access denied', 'error')
         return redirect(url_for('compliance.compliance'))
     
-    # Delete associated files
-    for doc in requirement.documents:
-        try:
-            os.remove(doc.file_path)
-        except OSError:
-            pass
+    file_paths = [stored_file_path(current_app.config['UPLOAD_FOLDER'], doc.file_path) for doc in requirement.documents]
     
     db.session.delete(requirement)
     db.session.commit()
     
+    # Remove files only once the delete has committed
+    enqueue_file_removal(file_paths)
+    
     flash('Requirement deleted successfully', 'success')
     return redirect(url_for('compliance.compliance'))
 
@@ -174,12 +351,23 @@ def upload_document(requirement_id):
                 requirement_id=requirement_id,
                 filename=filename,
                 file_path=file_path,
+                stored_name=unique_filename,
                 description=description,
                 version=next_version
             )
             
             db.session.add(document)
             requirement.updated_at = datetime.utcnow()
+            refresh_document_stats(requirement)
+            
+            # A renewed certificate moves the expiration forward by its renewal period
+            if request.form.get('roll_forward'):
+                next_expiration = next_expiration_date(requirement)
+                if next_expiration:
+                    requirement.expiration_date = next_expiration
+                    flash(f"Expiration date moved to {next_expiration.strftime('%B %d, %Y')}.", 'success')
+                else:
+                    flash('Expiration date not changed: this requirement has no renewal frequency.', 'warning')
             
             # Auto-update status after upload
             update_requirement_status(requirement)
@@ -220,34 +408,31 @@ def delete_document(document_id):
         flash('Access denied', 'error')
         return redirect(url_for('compliance.compliance'))
     
-    # Delete file from filesystem
-    try:
-        os.remove(document.file_path)
-    except OSError:
-        pass
-    
     requirement_id = document.requirement_id
+    file_path = stored_file_path(current_app.config['UPLOAD_FOLDER'], document.file_path)
     db.session.delete(document)
+    refresh_document_stats(requirement)
     
     # Auto-update status after deletion
     update_requirement_status(requirement)
     
     db.session.commit()
     
+    # Remove file only once the delete has committed
+    enqueue_file_removal([file_path])
+    
     flash('Document deleted successfully', 'success')
     return redirect(url_for('compliance.view_requirement', requirement_id=requirement_id))
 
 @comp_bp.route('/export/pdf', methods=['GET'])
 @login_required
+@read_replica
 def export_all_pdf():
     """Export all requirements as PDF"""
     if not current_user.organization:
         flash('Access denied', 'error')
         return redirect(url_for('compliance.compliance'))
     
-    # Update statuses before export
-    update_all_statuses(current_user.organization_id)
-    
     requirements = ComplianceRequirement.query.filter_by(
         organization_id=current_user.organization_id
     ).order_by(ComplianceRequirement.expiration_date).all()
@@ -265,37 +450,37 @@ def export_all_pdf():
 
 @comp_bp.route('/export/csv', methods=['GET'])
 @login_required
+@read_replica
 def export_all_csv():
     """Export all requirements as CSV"""
     if not current_user.organization:
         flash('Access denied', 'error')
         return redirect(url_for('compliance.compliance'))
     
-    # Update statuses before export
-    update_all_statuses(current_user.organization_id)
-    
+    # Stream rows in batches instead of building the whole file in memory
     requirements = ComplianceRequirement.query.filter_by(
         organization_id=current_user.organization_id
-    ).order_by(ComplianceRequirement.expiration_date).all()
-    
-    csv_buffer = generate_compliance_csv(current_user.organization, requirements)
+    ).order_by(ComplianceRequirement.expiration_date).options(
+        selectinload(ComplianceRequirement.documents)
+    ).yield_per(CSV_CHUNK_ROWS)
     
     filename = f"{current_user.organization.name}_compliance_report_{datetime.now().strftime('%Y%m%d')}.csv"
     
-    # Convert StringIO to BytesIO for send_file
-    import io
-    bytes_buffer = io.BytesIO(csv_buffer.getvalue().encode('utf-8'))
-    bytes_buffer.seek(0)
-    
-    return send_file(
-        bytes_buffer,
-        as_attachment=True,
-        download_name=filename,
+    response = Response(
+        stream_with_context(stream_compliance_csv(current_user.organization, requirements)),
         mimetype='text/csv'
     )
+    # Same Content-Disposition send_file would write, with an RFC 5987 name for non-ASCII
+    ascii_filename = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    response.headers.set(
+        'Content-Disposition', 'attachment', filename=ascii_filename,
+        **({} if ascii_filename == filename else {'filename*': f"UTF-8''{quote(filename)}"})
+    )
+    return response
 
 @comp_bp.route('/<int:requirement_id>/export/pdf', methods=['GET'])
 @login_required
+@read_replica
 def export_requirement_pdf(requirement_id):
     """Export single requirement detail as PDF"""
     requirement = ComplianceRequirement.query.get_or_404(requirement_id)
@@ -304,10 +489,6 @@ def export_requirement_pdf(requirement_id):
         flash('Access denied', 'error')
         return redirect(url_for('compliance.compliance'))
     
-    # Update status before export
-    update_requirement_status(requirement)
-    db.session.commit()
-    
     pdf_buffer = generate_requirement_detail_pdf(requirement)
     
     filename = f"{requirement.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf"
@@ -1,30 +1,78 @@
-from flask import Blueprint, render_template, redirect, url_for
+from flask import Blueprint, render_template, redirect, url_for, request
 from flask_login import login_required, current_user
+from markupsafe import Markup
+from backend.database.database import read_replica
 from backend.utils.status import get_status_counts, get_expiring_soon_requirements
+from backend.utils.page_cache import get_data_version, cached_fragment, page_etag, conditional_page
+from backend.utils.history import get_compliance_trend
+from datetime import datetime, timedelta
 
 dash_bp = Blueprint('dashboard', __name__)
 
+# Ranges offered on the history page, in days
+HISTORY_RANGES = [30, 90, 365]
+
 @dash_bp.route('/', methods=['GET'])
 @login_required
+@read_replica
 def dashboard():
     if not current_user.organization:
         return redirect(url_for('auth.login'))
     
     org_id = current_user.organization_id
+    version = get_data_version(org_id)
+    
+    def render_status_cards():
+        # Get status counts
+        status_data = get_status_counts(org_id)
+        
+        # Get expiring soon requirements
+        expiring_soon = get_expiring_soon_requirements(org_id, days=30)
+        
+        return Markup(render_template(
+            'partials/status_cards.html',
+            compliance_percentage=status_data['compliance_percentage'],
+            compliant_count=status_data['compliant'],
+            expiring_soon_count=status_data['expiring_soon'],
+            expiring_soon=expiring_soon,
+            missing_count=status_data['missing'] + status_data['expired'],
+            total_requirements=status_data['total']
+        ))
+    
+    calendar_token = current_user.organization.calendar_token
+    
+    def render_page():
+        return render_template(
+            'dashboard.html',
+            organization_name=current_user.organization.name,
+            calendar_url=url_for('calendar.feed', token=calendar_token, _external=True) if calendar_token else None,
+            status_cards=cached_fragment(org_id, version, 'status_cards', None, render_status_cards)
+        )
+    
+    return conditional_page(page_etag(org_id, version, current_user.id), render_page)
+
+@dash_bp.route('/history', methods=['GET'])
+@login_required
+@read_replica
+def history():
+    if not current_user.organization:
+        return redirect(url_for('auth.login'))
+    
+    days = request.args.get('days', 90, type=int)
+    if days not in HISTORY_RANGES:
+        days = 90
+    
+    org_id = current_user.organization_id
+    version = get_data_version(org_id)
+    
+    def render_page():
+        end = datetime.now().date()
+        snapshots = get_compliance_trend(org_id, end - timedelta(days=days - 1), end)
+        return render_template(
+            'compliance_history.html',
+            snapshots=list(reversed(snapshots)),
+            days=days,
+            ranges=HISTORY_RANGES
+        )
     
-    # Get status counts (auto-updates statuses)
-    status_data = get_status_counts(org_id)
-    
-    # Get expiring soon requirements
-    expiring_soon = get_expiring_soon_requirements(org_id, days=30)
-    
-    return render_template(
-        'dashboard.html',
-        organization_name=current_user.organization.name,
-        compliance_percentage=status_data['compliance_percentage'],
-        compliant_count=status_data['compliant'],
-        expiring_soon_count=status_data['expiring_soon'],
-        expiring_soon=expiring_soon,
-        missing_count=status_data['missing'] + status_data['expired'],
-        total_requirements=status_data['total']
-    )
\ No newline at end of file
+    return conditional_page(page_etag(org_id, version, current_user.id), render_page)
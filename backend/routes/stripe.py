@@ -1,14 +1,102 @@
 import stripe
+import requests
+import threading
+import time
 import os
+from requests.adapters import HTTPAdapter
 from flask import url_for
 from backend.models.finance import Subscription
 from backend.database.database import db
+from backend.utils.page_cache import bump_data_version
 from datetime import datetime
 
 # Get and clean the Stripe key
 stripe_secret = os.environ.get('STRIPE_SECRET_KEY', '').strip('"').strip("'")
 stripe.api_key = stripe_secret
 
+# Point the SDK at a local stand-in (e.g. stripe-mock on http://localhost:12111) for testing
+stripe_api_base = os.environ.get('STRIPE_API_BASE')
+if stripe_api_base:
+    stripe.api_base = stripe_api_base
+
+# HTTP client tuning for the shared Stripe client
+STRIPE_CONNECT_TIMEOUT = float(os.environ.get('STRIPE_CONNECT_TIMEOUT', 3))
+STRIPE_READ_TIMEOUT = float(os.environ.get('STRIPE_READ_TIMEOUT', 10))
+STRIPE_POOL_SIZE = int(os.environ.get('STRIPE_POOL_SIZE', 10))
+STRIPE_MAX_RETRIES = int(os.environ.get('STRIPE_MAX_RETRIES', 2))
+
+# Seconds to reuse recently fetched Stripe objects
+STRIPE_OBJECT_CACHE_TTL = int(os.environ.get('STRIPE_OBJECT_CACHE_TTL', 60))
+
+_stripe_client = None
+_client_lock = threading.Lock()
+
+# (kind, id) -> (expires_at, object)
+_object_cache = {}
+_cache_lock = threading.Lock()
+
+def get_stripe_client():
+    """
+    Get the shared Stripe client: one keep-alive connection pool, explicit
+    timeouts and automatic retries, created on first use
+    """
+    global _stripe_client
+
+    with _client_lock:
+        if _stripe_client is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=STRIPE_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+
+            _stripe_client = stripe.StripeClient(
+                stripe_secret,
+                http_client=stripe.RequestsClient(
+                    timeout=(STRIPE_CONNECT_TIMEOUT, STRIPE_READ_TIMEOUT),
+                    session=session
+                ),
+                max_network_retries=STRIPE_MAX_RETRIES,
+                base_addresses={'api': stripe_api_base} if stripe_api_base else None
+            )
+    return _stripe_client
+
+def _cached(kind, object_id, fetch):
+    """
+    Return a recently fetched Stripe object, or fetch and cache it
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _object_cache.get((kind, object_id))
+    if entry and entry[0] > now:
+        return entry[1]
+
+    obj = fetch()
+    with _cache_lock:
+        # Drop expired entries so the cache stays small
+        for key in [key for key, cached in _object_cache.items() if cached[0] <= now]:
+            del _object_cache[key]
+        _object_cache[(kind, object_id)] = (now + STRIPE_OBJECT_CACHE_TTL, obj)
+    return obj
+
+def retrieve_checkout_session(session_id):
+    """
+    Retrieve a checkout session with its subscription expanded in the same call
+    """
+    return _cached('checkout_session', session_id, lambda: get_stripe_client().v1.checkout.sessions.retrieve(
+        session_id, params={'expand': ['subscription']}
+    ))
+
+def get_period_end(stripe_subscription):
+    """
+    Read current_period_end from a subscription payload; newer API versions
+    carry it on the subscription items rather than the subscription itself
+    """
+    period_end = stripe_subscription.get('current_period_end')
+    if period_end is None:
+        items = (stripe_subscription.get('items') or {}).get('data') or []
+        period_end = items[0].get('current_period_end') if items else None
+    return datetime.fromtimestamp(period_end) if period_end else None
+
 def create_checkout_session(organization, user_email, success_url, cancel_url):
     """
     Create a Stripe checkout session for subscription
@@ -17,42 +105,33 @@ def create_checkout_session(organization, user_email, success_url, cancel_url):
         # Check if customer already exists
         subscription = Subscription.query.filter_by(organization_id=organization.id).first()
         
-        if subscription and subscription.stripe_customer_id:
-            customer_id = subscription.stripe_customer_id
-        else:
-            # Create new Stripe customer
-            customer = stripe.Customer.create(
-                email=user_email,
-                metadata={
-                    'organization_id': organization.id,
-                    'organization': organization.name
-                }
-            )
-            customer_id = customer.id
-            
-            # Update subscription record
-            if subscription:
-                subscription.stripe_customer_id = customer_id
-                db.session.commit()
-        
-        # Get price ID
-        price_id = os.environ.get('STRIPE_PRICE_ID', '').strip('"').strip("'")
-        
-        # Create checkout session
-        session = stripe.checkout.Session.create(
-            customer=customer_id,
-            payment_method_types=['card'],
-            line_items=[{
-                'price': price_id,
+        params = {
+            'payment_method_types': ['card'],
+            'line_items': [{
+                'price': os.environ.get('STRIPE_PRICE_ID', '').strip('"').strip("'"),
                 'quantity': 1,
             }],
-            mode='subscription',
-            success_url=success_url,
-            cancel_url=cancel_url,
-            metadata={
+            'mode': 'subscription',
+            'success_url': success_url,
+            'cancel_url': cancel_url,
+            'metadata': {
                 'organization_id': organization.id
+            },
+            # Lets webhooks find the organization before the customer id is stored
+            'subscription_data': {
+                'metadata': {
+                    'organization_id': organization.id
+                }
             }
-        )
+        }
+        
+        if subscription and subscription.stripe_customer_id:
+            params['customer'] = subscription.stripe_customer_id
+        else:
+            # Checkout creates the customer; its id is stored when checkout completes
+            params['customer_email'] = user_email
+        
+        session = get_stripe_client().v1.checkout.sessions.create(params=params)
         
         return session
     except Exception as e:
@@ -64,16 +143,62 @@ def create_customer_portal_session(customer_id, return_url):
     Create a Stripe customer portal session for managing subscription
     """
     try:
-        session = stripe.billing_portal.Session.create(
-            customer=customer_id,
-            return_url=return_url,
-        )
+        session = get_stripe_client().v1.billing_portal.sessions.create(params={
+            'customer': customer_id,
+            'return_url': return_url,
+        })
         return session
     except Exception as e:
         print(f"Error creating portal session: {str(e)}")
         return None
 
-def handle_checkout_completed(session):
+def claim_event_order(subscription, event_created):
+    """
+    Record a webhook event as the newest applied to a subscription, inside
+    the handler's transaction. Returns False when a newer event has already
+    been applied, so a retried older event can't undo it. The conditional
+    UPDATE holds the row until commit, so workers applying events of the
+    same subscription take turns here.
+    """
+    if event_created is None:
+        return True
+
+    table = Subscription.__table__
+    return db.session.execute(
+        table.update().where(
+            table.c.id == subscription.id,
+            db.or_(table.c.last_event_created.is_(None), table.c.last_event_created <= event_created)
+        ).values(last_event_created=event_created)
+    ).rowcount > 0
+
+def fill_period_end(subscription, stripe_subscription):
+    """
+    Take the period end from an event older than the last one applied while
+    it is still unset locally. checkout.session.completed usually carries
+    only the subscription id, so when customer.subscription.created arrives
+    after it, this is the only event with the period end. Returns True when
+    it was filled.
+    """
+    period_end = get_period_end(stripe_subscription)
+    if period_end is None:
+        return False
+
+    table = Subscription.__table__
+    filled = db.session.execute(
+        table.update().where(
+            table.c.id == subscription.id,
+            table.c.current_period_end.is_(None),
+            db.or_(table.c.stripe_subscription_id.is_(None), table.c.stripe_subscription_id == stripe_subscription.id)
+        ).values(current_period_end=period_end, updated_at=datetime.utcnow())
+    ).rowcount > 0
+
+    if filled:
+        # Core updates skip the flush hooks that normally do this
+        bump_data_version([subscription.organization_id])
+    db.session.commit()
+    return filled
+
+def handle_checkout_completed(session, event_created=None):
     """
     Handle successful checkout completion
     """
@@ -82,16 +207,28 @@ def handle_checkout_completed(session):
     if not organization_id:
         return False
     
-    subscription = Subscription.query.filter_by(organization_id=organization_id).first()
+    # Metadata values are strings; compare as an integer so PostgreSQL doesn't reject integer = text
+    subscription = Subscription.query.filter_by(organization_id=int(organization_id)).first()
     
     if subscription:
-        # Get subscription details from Stripe
-        stripe_subscription = stripe.Subscription.retrieve(session.subscription)
+        if not claim_event_order(subscription, event_created):
+            return False
+        
+        stripe_subscription = session.subscription
+        
+        # The period end arrives with the customer.subscription.created event;
+        # only read it here if the session payload has the subscription expanded
+        if isinstance(stripe_subscription, str):
+            subscription.stripe_subscription_id = stripe_subscription
+        else:
+            subscription.stripe_subscription_id = stripe_subscription.id
+            subscription.current_period_end = get_period_end(stripe_subscription) or subscription.current_period_end
+        
+        if session.get('customer') and not subscription.stripe_customer_id:
+            subscription.stripe_customer_id = session.get('customer')
         
-        subscription.stripe_subscription_id = session.subscription
         subscription.status = 'active'
         subscription.trial_end = None
-        subscription.current_period_end = datetime.fromtimestamp(stripe_subscription.current_period_end)
         subscription.updated_at = datetime.utcnow()
         
         db.session.commit()
@@ -99,17 +236,38 @@ def handle_checkout_completed(session):
     
     return False
 
-def handle_subscription_updated(stripe_subscription):
+def find_local_subscription(stripe_subscription):
     """
-    Handle subscription status updates
+    Find the local subscription for a Stripe subscription by customer id,
+    falling back to the organization_id set in subscription_data metadata
     """
     customer_id = stripe_subscription.customer
     
     subscription = Subscription.query.filter_by(stripe_customer_id=customer_id).first()
     
+    if not subscription:
+        organization_id = (stripe_subscription.get('metadata') or {}).get('organization_id')
+        if organization_id:
+            subscription = Subscription.query.filter_by(organization_id=int(organization_id)).first()
+            if subscription and not subscription.stripe_customer_id:
+                subscription.stripe_customer_id = customer_id
+    
+    return subscription
+
+def handle_subscription_updated(stripe_subscription, event_created=None):
+    """
+    Handle subscription status updates
+    """
+    subscription = find_local_subscription(stripe_subscription)
+    
     if subscription:
+        if not claim_event_order(subscription, event_created):
+            fill_period_end(subscription, stripe_subscription)
+            return False
+        
         subscription.status = stripe_subscription.status
-        subscription.current_period_end = datetime.fromtimestamp(stripe_subscription.current_period_end)
+        subscription.stripe_subscription_id = stripe_subscription.id
+        subscription.current_period_end = get_period_end(stripe_subscription) or subscription.current_period_end
         subscription.cancel_at_period_end = stripe_subscription.cancel_at_period_end
         subscription.updated_at = datetime.utcnow()
         
@@ -118,15 +276,16 @@ def handle_subscription_updated(stripe_subscription):
     
     return False
 
-def handle_subscription_deleted(stripe_subscription):
+def handle_subscription_deleted(stripe_subscription, event_created=None):
     """
     Handle subscription cancellation
     """
-    customer_id = stripe_subscription.customer
-    
-    subscription = Subscription.query.filter_by(stripe_customer_id=customer_id).first()
+    subscription = find_local_subscription(stripe_subscription)
     
     if subscription:
+        if not claim_event_order(subscription, event_created):
+            return False
+        
         subscription.status = 'canceled'
         subscription.updated_at = datetime.utcnow()
         
@@ -0,0 +1,26 @@
+from flask import current_app, flash, redirect, url_for
+from flask_login import current_user, login_required
+from functools import wraps
+
+def is_admin(user):
+    """
+    Operators are the users listed in ADMIN_EMAILS
+    """
+    return bool(
+        user
+        and user.is_authenticated
+        and user.email.lower() in current_app.config.get('ADMIN_EMAILS', [])
+    )
+
+def admin_required(view):
+    """
+    Restrict a view to operators
+    """
+    @wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if not is_admin(current_user):
+            flash('Access denied', 'error')
+            return redirect(url_for('dashboard.dashboard'))
+        return view(*args, **kwargs)
+    return wrapped
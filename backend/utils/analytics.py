@@ -0,0 +1,203 @@
+from backend.models.auth import Organization
+from backend.models.compliance import ComplianceRequirement
+from backend.models.finance import Subscription
+from backend.database.database import db
+from backend.database.sharding import run_on_shards
+from backend.utils.entitlements import TRIAL_DAYS
+from backend.utils.history import get_platform_trend
+from flask import current_app
+from datetime import datetime, timedelta
+import pandas as pd
+import numpy as np
+import threading
+import time
+
+# Requirement statuses, in display order
+STATUSES = ['compliant', 'expiring_soon', 'expired', 'missing']
+
+# "Expiring next week" window, in days
+WEEK_DAYS = 7
+
+# Organizations listed on the at-risk table
+AT_RISK_LIMIT = 25
+
+# Subscription statuses that count as a paying customer
+PAID_STATUSES = ['active', 'past_due']
+
+# Signup-month cohorts shown in the conversion table
+COHORT_MONTHS = 12
+
+# (expires_at, analytics) of the last computation in this process
+_analytics_cache = {}
+_cache_lock = threading.Lock()
+
+def _as_text(column):
+    """
+    A date/time column read without per-row conversion; read_frame parses it column-wise
+    """
+    return db.type_coerce(column, db.String).label(column.key)
+
+def read_frame(statement, date_columns=()):
+    """
+    Load a SELECT into a DataFrame column-wise on the session's connection
+    for the statement's bind (the scoped shard for per-organization tables)
+    """
+    frame = pd.read_sql(statement, db.session.connection(bind_arguments={'clause': statement}))
+    for name in date_columns:
+        frame[name] = pd.to_datetime(frame[name], format='ISO8601')
+    return frame
+
+def _read_requirements():
+    """
+    Requirement columns of every organization in scope, one bulk read.
+    Document activity comes from the denormalized per-requirement stats,
+    so the documents table is not scanned.
+    """
+    table = ComplianceRequirement.__table__
+    return read_frame(db.select(
+        table.c.organization_id,
+        table.c.status,
+        _as_text(table.c.expiration_date),
+        table.c.document_count,
+        _as_text(table.c.latest_document_uploaded_at)
+    ), date_columns=['expiration_date', 'latest_document_uploaded_at'])
+
+def load_frames(app):
+    """
+    (requirements, organizations, subscriptions) DataFrames for the whole
+    platform: requirements from every shard in parallel, the rest from the primary
+    """
+    requirements = pd.concat(run_on_shards(app, _read_requirements).values(), ignore_index=True)
+
+    table = Organization.__table__
+    organizations = read_frame(
+        db.select(table.c.id, table.c.name, _as_text(table.c.created_at)),
+        date_columns=['created_at']
+    )
+
+    table = Subscription.__table__
+    subscriptions = read_frame(
+        db.select(table.c.organization_id, table.c.status, _as_text(table.c.trial_end)),
+        date_columns=['trial_end']
+    )
+
+    return requirements, organizations, subscriptions
+
+def compute_analytics(requirements, organizations, subscriptions, now, today):
+    """
+    Platform totals, at-risk organizations and trial conversion from the
+    bulk-read frames, aggregated with numpy over whole columns. now is UTC
+    like the stored timestamps; today is the local date statuses use.
+    """
+    org_ids = organizations['id'].to_numpy()
+    org_count = len(org_ids)
+
+    # Position of each requirement's organization; -1 for rows of unknown organizations
+    positions = pd.Index(org_ids).get_indexer(requirements['organization_id'])
+    known = positions >= 0
+    positions = positions[known]
+    status = requirements['status'].to_numpy()[known]
+    days_left = (
+        requirements['expiration_date'].to_numpy().astype('datetime64[D]')[known] - np.datetime64(today, 'D')
+    ).astype(np.int64)
+    due_this_week = (days_left >= 0) & (days_left <= WEEK_DAYS)
+
+    def per_organization(weights=None):
+        return np.bincount(positions, weights=weights, minlength=org_count).astype(np.int64)
+
+    per_org = pd.DataFrame({
+        'organization_id': org_ids,
+        'name': organizations['name'].to_numpy(),
+        'total': per_organization(),
+        **{name: per_organization(status == name) for name in STATUSES},
+        'expiring_this_week': per_organization(due_this_week),
+        'documents': per_organization(requirements['document_count'].to_numpy()[known]),
+    })
+    last_upload = pd.Series(
+        requirements['latest_document_uploaded_at'].to_numpy()[known]
+    ).groupby(positions).max().reindex(range(org_count))
+    per_org['last_upload'] = last_upload.astype(object).where(last_upload.notna(), None).to_numpy()
+    per_org['compliance_percentage'] = np.round(
+        np.divide(per_org['compliant'] * 100, per_org['total'], out=np.zeros(org_count), where=per_org['total'] > 0), 1
+    )
+
+    # Local trials have no subscription row; the trial runs from organization creation
+    billing = organizations[['id', 'created_at']].merge(
+        subscriptions, how='left', left_on='id', right_on='organization_id'
+    )
+    billing['status'] = billing['status'].fillna('trial')
+    trial_end = billing['trial_end'].fillna(
+        billing['created_at'] + pd.Timedelta(days=TRIAL_DAYS)
+    )
+    per_org['subscription_status'] = billing['status'].to_numpy()
+
+    # At risk: share of requirements already expired or expiring within a week
+    at_risk = per_org[(per_org['expired'] + per_org['expiring_this_week']) > 0].copy()
+    at_risk['risk'] = np.round((at_risk['expired'] + at_risk['expiring_this_week']) * 100 / at_risk['total'], 1)
+    at_risk = at_risk.sort_values(['risk', 'expired', 'total'], ascending=False)
+
+    # Trial conversion: of organizations whose trial has ended, how many pay
+    trial_over = (trial_end <= pd.Timestamp(now)).to_numpy()
+    paid = billing['status'].isin(PAID_STATUSES).to_numpy()
+    cohorts = pd.DataFrame({
+        'month': billing['created_at'].dt.to_period('M').astype(str),
+        'organizations': 1,
+        'trials_ended': trial_over.astype(int),
+        'converted': (paid & trial_over).astype(int),
+    }).groupby('month').sum().sort_index(ascending=False).head(COHORT_MONTHS).reset_index()
+    cohorts['conversion_percentage'] = np.round(
+        np.divide(cohorts['converted'] * 100, cohorts['trials_ended'], out=np.zeros(len(cohorts)), where=cohorts['trials_ended'] > 0), 1
+    )
+
+    totals = {name: int(per_org[name].sum()) for name in ['total', *STATUSES, 'expiring_this_week', 'documents']}
+    totals['organizations'] = org_count
+    totals['compliance_percentage'] = round(totals['compliant'] * 100 / totals['total'], 1) if totals['total'] else 0
+    totals['at_risk_organizations'] = len(at_risk)
+
+    return {
+        'computed_at': now,
+        'totals': totals,
+        # Requirements expiring on each of the next WEEK_DAYS + 1 days, today first
+        'expiring_by_day': [
+            {'date': today + timedelta(days=offset), 'count': int(count)}
+            for offset, count in enumerate(np.bincount(days_left[due_this_week], minlength=WEEK_DAYS + 1))
+        ],
+        'at_risk': at_risk.head(AT_RISK_LIMIT).to_dict('records'),
+        'subscriptions': billing['status'].value_counts().to_dict(),
+        'conversion': {
+            'trials_ended': int(trial_over.sum()),
+            'converted': int((paid & trial_over).sum()),
+            'conversion_percentage': round(float((paid & trial_over).sum() * 100 / trial_over.sum()), 1) if trial_over.any() else 0,
+            'trials_ending_this_week': int(((billing['status'] == 'trial').to_numpy() & ~trial_over & (
+                trial_end <= pd.Timestamp(now) + pd.Timedelta(days=WEEK_DAYS)
+            ).to_numpy()).sum()),
+        },
+        'cohorts': cohorts.to_dict('records'),
+    }
+
+def get_operator_analytics(refresh=False):
+    """
+    Platform-wide analytics, recomputed at most every ANALYTICS_CACHE_TTL
+    seconds per process unless refresh is set
+    """
+    ttl = current_app.config.get('ANALYTICS_CACHE_TTL', 0)
+    now = time.monotonic()
+
+    if ttl > 0 and not refresh:
+        with _cache_lock:
+            entry = _analytics_cache.get('platform')
+        if entry and entry[0] > now:
+            return entry[1]
+
+    app = current_app._get_current_object()
+    today = datetime.now().date()
+    analytics = compute_analytics(*load_frames(app), datetime.utcnow(), today)
+
+    # Recorded daily snapshots give the 30-day trend without touching requirements
+    analytics['trend'] = get_platform_trend(today - timedelta(days=29), today)
+
+    if ttl > 0:
+        with _cache_lock:
+            _analytics_cache['platform'] = (now + ttl, analytics)
+
+    return analytics
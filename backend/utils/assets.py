@@ -0,0 +1,154 @@
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+import mimetypes
+import hashlib
+import shutil
+import click
+import json
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are skipped without the package
+    brotli = None
+
+# Build output under the static folder, and its manifest of original -> fingerprinted paths
+ASSET_BUILD_DIR = 'dist'
+ASSET_MANIFEST = 'manifest.json'
+
+# Text assets worth compressing; images are already compressed
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.map'}
+
+# Precompressed variants in order of preference: (Accept-Encoding token, file suffix)
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# Fingerprinted files never change, so browsers may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def fingerprint(file_path):
+    """
+    Short content hash used in a versioned filename
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+def build_assets(static_folder):
+    """
+    Copy every static file into the build directory under a content-hashed
+    name, write gzip and brotli variants of text assets, and write the
+    manifest. Returns the manifest.
+    """
+    build_dir = os.path.join(static_folder, ASSET_BUILD_DIR)
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder):
+            dirs[:] = [name for name in dirs if name != ASSET_BUILD_DIR]
+
+        for name in files:
+            source = os.path.join(root, name)
+            relative = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            stem, extension = os.path.splitext(relative)
+            versioned = f'{stem}.{fingerprint(source)}{extension}'
+
+            target = os.path.join(build_dir, versioned)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+
+            if extension.lower() in COMPRESSIBLE_EXTENSIONS:
+                with open(source, 'rb') as f:
+                    data = f.read()
+                with open(target + '.gz', 'wb') as f:
+                    f.write(gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    with open(target + '.br', 'wb') as f:
+                        f.write(brotli.compress(data, quality=11))
+
+            manifest[relative] = versioned
+
+    with open(os.path.join(build_dir, ASSET_MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return manifest
+
+def load_manifest(static_folder):
+    """
+    Read the build manifest, or an empty one when assets haven't been built
+    """
+    try:
+        with open(os.path.join(static_folder, ASSET_BUILD_DIR, ASSET_MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def manifest_version(manifest):
+    """
+    Short hash of a manifest; changes whenever any asset does
+    """
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:8]
+
+def asset_url(filename):
+    """
+    Template helper: URL of the fingerprinted build of a static file,
+    falling back to the plain static URL when it isn't in the manifest
+    """
+    versioned = current_app.extensions['asset_manifest'].get(filename)
+    if versioned is None:
+        return url_for('static', filename=filename)
+    return url_for('versioned_asset', filename=versioned)
+
+def serve_versioned_asset(filename):
+    """
+    Serve a fingerprinted asset, preferring a precompressed variant the client accepts
+    """
+    build_dir = os.path.join(current_app.static_folder, ASSET_BUILD_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    # Best precompressed copy the client accepts; q=0 refuses an encoding
+    suffixes = {
+        encoding: suffix for encoding, suffix in ENCODINGS
+        if os.path.isfile(os.path.join(build_dir, filename + suffix))
+    }
+    encoding = request.accept_encodings.best_match(list(suffixes))
+    if encoding is not None:
+        response = send_from_directory(build_dir, filename + suffixes[encoding], mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(build_dir, filename, mimetype=mimetype)
+
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def init_assets(app):
+    """
+    Load the manifest, route /static/dist/ to the versioned asset handler
+    and expose asset_url to templates
+    """
+    app.extensions['asset_manifest'] = load_manifest(app.static_folder)
+    app.extensions['asset_version'] = manifest_version(app.extensions['asset_manifest'])
+    app.add_url_rule(
+        f'{app.static_url_path}/{ASSET_BUILD_DIR}/<path:filename>',
+        endpoint='versioned_asset',
+        view_func=serve_versioned_asset
+    )
+    app.jinja_env.globals['asset_url'] = asset_url
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """
+    Fingerprint and precompress static assets into the static build directory.
+    """
+    manifest = build_assets(current_app.static_folder)
+    current_app.extensions['asset_manifest'] = manifest
+    current_app.extensions['asset_version'] = manifest_version(manifest)
+    if brotli is None:
+        click.echo('Brotli is not installed; only gzip variants were written')
+    click.echo(f'Built {len(manifest)} assets into {os.path.join(current_app.static_folder, ASSET_BUILD_DIR)}')
@@ -1,8 +1,9 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from backend.models.finance import Subscription
-from backend.routes.stripe import create_checkout_session, create_customer_portal_session, handle_checkout_completed, handle_subscription_updated, handle_subscription_deleted
+from backend.routes.stripe import create_checkout_session, create_customer_portal_session, retrieve_checkout_session, get_period_end
 from backend.database.database import db
+from backend.utils.stripe_events import store_stripe_event, notify_event_worker
 from datetime import datetime, timedelta
 import stripe
 import os
@@ -94,31 +95,25 @@ def success():
     
     if session_id:
         try:
-            # Initialize Stripe with API key
-            stripe.api_key = os.environ.get('STRIPE_SECRET_KEY', '').strip('"').strip("'")
-            
-            # Retrieve the session from Stripe
-            checkout_session = stripe.checkout.Session.retrieve(session_id)
+            # One round trip: the session with its subscription expanded
+            checkout_session = retrieve_checkout_session(session_id)
+            stripe_subscription = checkout_session.subscription
             
             # Get the subscription
             subscription = Subscription.query.filter_by(
                 organization_id=current_user.organization_id
             ).first()
             
-            if subscription and checkout_session.subscription:
-                # Retrieve subscription details
-                stripe_subscription = stripe.Subscription.retrieve(checkout_session.subscription)
-                
+            if subscription and stripe_subscription:
                 # Update local subscription record
-                subscription.stripe_subscription_id = checkout_session.subscription
+                subscription.stripe_subscription_id = stripe_subscription.id
                 subscription.status = 'active'
                 subscription.trial_end = None  # Clear trial end date
                 
-                # Handle current_period_end - it's a Unix timestamp
-                if hasattr(stripe_subscription, 'current_period_end'):
-                    subscription.current_period_end = datetime.fromtimestamp(stripe_subscription.current_period_end)
-                else:
-                    subscription.current_period_end = datetime.utcnow() + timedelta(days=30)
+                if checkout_session.get('customer') and not subscription.stripe_customer_id:
+                    subscription.stripe_customer_id = checkout_session.get('customer')
+                
+                subscription.current_period_end = get_period_end(stripe_subscription) or (datetime.utcnow() + timedelta(days=30))
                 
                 subscription.updated_at = datetime.utcnow()
                 
@@ -127,7 +122,7 @@ def success():
                 flash('Subscription activated successfully! Welcome to ClearComply.', 'success')
             elif not subscription:
                 flash('Payment received, but subscription record not found. Please contact support.', 'error')
-            elif not checkout_session.subscription:
+            elif not stripe_subscription:
                 flash('Payment received, but subscription not created. Please contact support.', 'error')
             else:
                 flash('Payment received, but there was an issue activating your subscription. Please contact support.', 'warning')
@@ -175,17 +170,8 @@ def webhook():
     except stripe.error.SignatureVerificationError:
         return jsonify({'error': 'Invalid signature'}), 400
     
-    # Handle the event
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        handle_checkout_completed(session)
-    
-    elif event['type'] == 'customer.subscription.updated':
-        subscription = event['data']['object']
-        handle_subscription_updated(subscription)
-    
-    elif event['type'] == 'customer.subscription.deleted':
-        subscription = event['data']['object']
-        handle_subscription_deleted(subscription)
+    # Persist and acknowledge right away; the event worker applies it in the background
+    if store_stripe_event(event, payload):
+        notify_event_worker()
     
     return jsonify({'status': 'success'}), 200
\ No newline at end of file
@@ -0,0 +1,258 @@
+from backend.models.compliance import ComplianceRequirement
+from backend.models.imports import ImportJob
+from backend.database.database import db
+from backend.database.sharding import organization_scope
+from backend.utils.page_cache import bump_data_version
+from backend.utils.renewal import parse_renewal_frequency, FREQUENCY_ERROR
+from datetime import datetime, timedelta
+import pandas as pd
+import numpy as np
+import threading
+import uuid
+import os
+
+# Columns recognised in an import file (header names are case/space insensitive)
+REQUIRED_COLUMNS = ['name', 'expiration_date']
+OPTIONAL_COLUMNS = ['description', 'renewal_frequency', 'renewal_interval_days', 'renewal_interval_months']
+
+# Rows per executemany batch
+IMPORT_BATCH_SIZE = 5000
+
+# Cap on row errors kept for display
+MAX_REPORTED_ERRORS = 200
+
+# Finished jobs are kept this long so their results can still be viewed
+JOB_RETENTION = timedelta(hours=1)
+
+# A running job with no progress for this long died with its process
+JOB_STALE_AFTER = timedelta(minutes=10)
+
+# job_id -> rows processed, for jobs running in this process
+_running_jobs = {}
+_jobs_lock = threading.Lock()
+
+def read_requirements_file(file_path):
+    """
+    Read a CSV or XLSX import file into a DataFrame of strings.
+    Excel date cells come through as 'YYYY-MM-DD 00:00:00'; the midnight
+    time is dropped from the expiration date so they read like typed dates.
+    """
+    if file_path.lower().endswith('.xlsx'):
+        df = pd.read_excel(file_path, dtype=str, keep_default_na=False)
+        df.columns = [str(col).strip().lower().replace(' ', '_') for col in df.columns]
+        if 'expiration_date' in df.columns:
+            df['expiration_date'] = df['expiration_date'].str.replace(r'^(\d{4}-\d{2}-\d{2}) 00:00:00$', r'\1', regex=True)
+        return df
+
+    df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+    df.columns = [str(col).strip().lower().replace(' ', '_') for col in df.columns]
+    return df
+
+def blank_to_none(column):
+    """
+    Strip a text column and turn blank cells into None (NULL)
+    """
+    column = column.str.strip()
+    return column.astype(object).where(column != '', None)
+
+def validate_requirements_frame(df):
+    """
+    Validate and parse an import DataFrame column-wise.
+    Returns (records DataFrame, list of (row_number, message) errors).
+    """
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        return None, [(1, f"Missing required column(s): {', '.join(missing_columns)}")]
+
+    for col in OPTIONAL_COLUMNS:
+        if col not in df.columns:
+            df[col] = ''
+
+    names = df['name'].str.strip()
+    expiration = pd.to_datetime(df['expiration_date'].str.strip(), format='%Y-%m-%d', errors='coerce')
+
+    # Parse each distinct (frequency, intervals) combination once; None marks an invalid one
+    codes, combinations = pd.MultiIndex.from_arrays([
+        df['renewal_frequency'], df['renewal_interval_days'].str.strip(), df['renewal_interval_months'].str.strip()
+    ]).factorize()
+    parsed = np.empty(len(combinations), dtype=object)
+    for index, (frequency, interval_days, interval_months) in enumerate(combinations):
+        try:
+            parsed[index] = parse_renewal_frequency(frequency, interval_days or None, interval_months or None)
+        except ValueError:
+            parsed[index] = None
+    renewal = pd.Series(parsed[codes], index=df.index, dtype=object)
+
+    # Row numbers as seen in a spreadsheet (header is row 1)
+    row_numbers = np.arange(len(df)) + 2
+
+    checks = [
+        (names == '', 'Name is required'),
+        (names.str.len() > 200, 'Name must be 200 characters or fewer'),
+        (expiration.isna(), 'Expiration date must be in YYYY-MM-DD format'),
+        (renewal.isna(), FREQUENCY_ERROR),
+    ]
+
+    errors = []
+    for mask, message in checks:
+        for row_number in row_numbers[mask.to_numpy()]:
+            errors.append((int(row_number), message))
+    errors.sort()
+
+    if errors:
+        return None, errors
+
+    # Initial statuses, same rules as update_requirement_status for a requirement without documents
+    today = pd.Timestamp(datetime.now().date())
+    thirty_days_from_now = today + timedelta(days=30)
+    status = np.select(
+        [expiration < today, expiration <= thirty_days_from_now],
+        ['expired', 'expiring_soon'],
+        default='missing'
+    )
+
+    records = pd.DataFrame({
+        'name': names.astype(object),
+        'description': blank_to_none(df['description']),
+        'expiration_date': expiration.dt.date,
+        'renewal_frequency': pd.Series([frequency for frequency, _, _ in renewal], index=df.index, dtype=object),
+        'renewal_interval_days': pd.Series([interval_days for _, interval_days, _ in renewal], index=df.index, dtype=object),
+        'renewal_interval_months': pd.Series([interval_months for _, _, interval_months in renewal], index=df.index, dtype=object),
+        'status': status.tolist(),
+    })
+
+    return records, []
+
+def import_requirements(organization_id, records, progress=None):
+    """
+    Insert validated records in batched executemany calls inside one transaction
+    """
+    table = ComplianceRequirement.__table__
+    total = len(records)
+    now = datetime.utcnow()
+
+    try:
+        for start in range(0, total, IMPORT_BATCH_SIZE):
+            batch = records.iloc[start:start + IMPORT_BATCH_SIZE].assign(
+                organization_id=organization_id,
+                created_at=now,
+                updated_at=now,
+                document_count=0
+            )
+            db.session.execute(table.insert(), batch.to_dict('records'))
+
+            if progress:
+                progress(min(start + IMPORT_BATCH_SIZE, total), total)
+
+        # Core inserts skip the flush hooks that normally do this
+        bump_data_version([organization_id])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return total
+
+def _update_job(job_id, **fields):
+    """
+    Record job progress in its own short transaction on the primary,
+    apart from the import's transaction on the organization's shard
+    """
+    with db.engine.begin() as connection:
+        connection.execute(
+            db.update(ImportJob).where(ImportJob.id == job_id).values(updated_at=datetime.utcnow(), **fields)
+        )
+
+def get_import_job(job_id):
+    """
+    Get a snapshot of an import job's progress. Jobs running in this process
+    report their progress from memory, which is also where it is kept while
+    the import holds a SQLite primary's only write lock.
+    """
+    with db.engine.connect() as connection:
+        row = connection.execute(db.select(ImportJob.__table__).where(ImportJob.id == job_id)).mappings().first()
+    if row is None:
+        return None
+
+    job = dict(row)
+    with _jobs_lock:
+        processed = _running_jobs.get(job_id)
+    if processed is not None:
+        job['processed'] = max(job['processed'], processed)
+    elif job['finished_at'] is None and job['updated_at'] < datetime.utcnow() - JOB_STALE_AFTER:
+        job.update(status='failed', message='The import was interrupted. Check your requirements and try again.')
+    return job
+
+def start_import_job(app, organization_id, file_path):
+    """
+    Run an import in a background thread and return its job id.
+    The uploaded file is removed once the job finishes.
+    """
+    job_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        connection.execute(db.delete(ImportJob).where(ImportJob.updated_at < now - JOB_RETENTION))
+        connection.execute(db.insert(ImportJob).values(
+            id=job_id,
+            organization_id=organization_id,
+            status='validating',
+            errors=[],
+            message='',
+            created_at=now,
+            updated_at=now
+        ))
+
+    def update(**fields):
+        _update_job(job_id, **fields)
+
+    def record_progress(processed, total, single_writer):
+        with _jobs_lock:
+            _running_jobs[job_id] = processed
+        if not single_writer:
+            update(processed=processed)
+
+    def run():
+        with app.app_context(), organization_scope(organization_id):
+            try:
+                df = read_requirements_file(file_path)
+                update(total=len(df))
+
+                records, errors = validate_requirements_frame(df)
+                if errors:
+                    update(
+                        status='failed',
+                        errors=errors[:MAX_REPORTED_ERRORS],
+                        error_count=len(errors),
+                        message='No requirements were imported. Fix the rows below and try again.'
+                    )
+                    return
+
+                update(status='importing')
+                # SQLite has one writer per file: progress can't be written to the
+                # primary while the import's own transaction is open on it, so
+                # it is only kept in memory then
+                bind = db.session.get_bind(clause=ComplianceRequirement.__table__)
+                single_writer = bind is db.engine and bind.dialect.name == 'sqlite'
+                count = import_requirements(
+                    organization_id,
+                    records,
+                    progress=lambda processed, total: record_progress(processed, total, single_writer)
+                )
+                update(status='completed', processed=count, message=f'Imported {count} requirements.')
+                print(f"[Import] Imported {count} requirements for organization {organization_id}")
+            except Exception as e:
+                print(f"[Import] Failed for organization {organization_id}: {str(e)}")
+                update(status='failed', message='The file could not be imported. Check its format and try again.')
+            finally:
+                update(finished_at=datetime.utcnow())
+                with _jobs_lock:
+                    _running_jobs.pop(job_id, None)
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+
+    with _jobs_lock:
+        _running_jobs[job_id] = 0
+    threading.Thread(target=run, name=f'import-{job_id}', daemon=True).start()
+    return job_id
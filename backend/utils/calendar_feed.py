@@ -0,0 +1,111 @@
+from backend.models.compliance import ComplianceRequirement
+from backend.utils.email_reminder import REMINDER_SCHEDULE
+from datetime import timedelta
+import hashlib
+
+# Longest content line in octets before folding (RFC 5545 3.1)
+LINE_LIMIT = 75
+
+def escape_text(value):
+    """
+    Escape a TEXT property value (RFC 5545 3.3.11)
+    """
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+def fold_line(line):
+    """
+    Split a content line into LINE_LIMIT-octet pieces joined by CRLF and a
+    space, without cutting a UTF-8 character in half
+    """
+    encoded = line.encode('utf-8')
+    if len(encoded) <= LINE_LIMIT:
+        return line
+
+    pieces = []
+    start = 0
+    limit = LINE_LIMIT
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Back up to the start of a character
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        pieces.append(encoded[start:end].decode('utf-8'))
+        start = end
+        limit = LINE_LIMIT - 1  # Continuation lines start with a space
+    return '\r\n '.join(pieces)
+
+def _event(uid, day, stamp, summary, description, url):
+    return [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f"DTSTAMP:{stamp.strftime('%Y%m%dT%H%M%SZ')}",
+        f"DTSTART;VALUE=DATE:{day.strftime('%Y%m%d')}",
+        f"DTEND;VALUE=DATE:{(day + timedelta(days=1)).strftime('%Y%m%d')}",
+        f'SUMMARY:{escape_text(summary)}',
+        f'DESCRIPTION:{escape_text(description)}',
+        f'URL:{url}',
+        'TRANSP:TRANSPARENT',
+        'END:VEVENT',
+    ]
+
+def build_calendar(organization, requirements, requirement_url):
+    """
+    An iCalendar document with an all-day event on each requirement's
+    expiration date and on each day a reminder email goes out.
+    requirement_url(requirement) gives the link shown in each event.
+    Returns (body bytes, ETag); both only change when the events do.
+    """
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//ClearComply//Compliance Expirations//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(organization.name)} compliance',
+        # Hint for clients that honour it; polls are cheap either way
+        'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+    ]
+
+    for requirement in requirements:
+        # DTSTAMP from the row keeps the body stable between versions
+        stamp = requirement.updated_at or requirement.created_at
+        url = requirement_url(requirement)
+        details = [requirement.description or '']
+        if requirement.renewal_frequency_label:
+            details.append(f'Renews: {requirement.renewal_frequency_label}')
+        details.append(url)
+        description = '\n\n'.join(part for part in details if part)
+
+        lines += _event(
+            f'requirement-{requirement.id}-expiration@clearcomply',
+            requirement.expiration_date,
+            stamp,
+            f'{requirement.name} expires',
+            description,
+            url
+        )
+
+        for days, reminder_type in sorted(REMINDER_SCHEDULE.items(), reverse=True):
+            if days == 0:
+                continue  # Same day as the expiration event
+            lines += _event(
+                f'requirement-{requirement.id}-{reminder_type}@clearcomply',
+                requirement.expiration_date - timedelta(days=days),
+                stamp,
+                f'{requirement.name} expires in {days} days',
+                description,
+                url
+            )
+
+    lines.append('END:VCALENDAR')
+
+    body = ('\r\n'.join(fold_line(line) for line in lines) + '\r\n').encode('utf-8')
+    return body, hashlib.sha1(body).hexdigest()
+
+def organization_requirements(organization_id):
+    """
+    Requirements shown in an organization's feed, soonest first
+    """
+    return ComplianceRequirement.query.filter_by(
+        organization_id=organization_id
+    ).order_by(ComplianceRequirement.expiration_date, ComplianceRequirement.id).all()
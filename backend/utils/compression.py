@@ -0,0 +1,105 @@
+from flask import current_app, request
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Fall back to gzip only without the package
+    brotli = None
+
+# Dynamic content worth compressing; PDFs, images and archives are already compressed
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/csv',
+    'text/plain',
+    'text/css',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+}
+
+def _encoder(encoding, level):
+    """
+    (compress chunk, flush pending output, finish stream) for an encoding
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        return compressor.process, compressor.flush, compressor.finish
+
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+def _compress_stream(chunks, encoding, level):
+    """
+    Compress an iterable body chunk by chunk, flushing after each chunk so
+    streamed output reaches the client as it is produced
+    """
+    compress, flush, finish = _encoder(encoding, level)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                # Werkzeug always encodes text bodies as UTF-8
+                chunk = chunk.encode('utf-8')
+            data = compress(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+def compress_response(response):
+    """
+    after_request hook: gzip or brotli encode compressible responses the
+    client accepts. COMPRESS_LEVEL is the CPU budget (1 fastest to 9
+    smallest, 0 disables); buffered bodies under COMPRESS_MIN_SIZE bytes
+    are sent as is. Streamed bodies are compressed incrementally.
+    """
+    level = current_app.config.get('COMPRESS_LEVEL', 0)
+
+    if (
+        level <= 0
+        or request.method == 'HEAD'
+        or response.status_code != 200
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or 'Content-Encoding' in response.headers
+        or response.cache_control.no_transform
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        original = response.response
+        response.response = _compress_stream(original, encoding, level)
+        response.direct_passthrough = False
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config.get('COMPRESS_MIN_SIZE', 0):
+            return response
+        compress, flush, finish = _encoder(encoding, level)
+        response.set_data(compress(data) + finish())
+
+    response.headers['Content-Encoding'] = encoding
+
+    # The encoded body no longer matches byte ranges or a strong validator of the original
+    response.headers.pop('Accept-Ranges', None)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    return response
+
+def init_compression(app):
+    """
+    Compress dynamic responses for every route
+    """
+    app.after_request(compress_response)
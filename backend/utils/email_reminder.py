@@ -1,11 +1,25 @@
 from flask_mail import Message, Mail
-from flask import render_template_string
+from flask import current_app, render_template_string
 from backend.models.compliance import ComplianceRequirement
 from backend.models.reminders import ReminderLog
 from backend.models.auth import User
 from backend.database.database import db
+from backend.database.sharding import OrganizationMoving, check_no_moves
 from datetime import datetime, timedelta
 
+# Days before expiration -> reminder type
+REMINDER_SCHEDULE = {30: '30_day', 7: '7_day', 0: 'day_of'}
+
+# How far back a sent reminder of each type suppresses a repeat
+DEDUPE_WINDOWS = {
+    'day_of': timedelta(hours=12),
+    '7_day': timedelta(days=1),
+    '30_day': timedelta(days=1),
+}
+
+# Requirement ids per dedupe lookup
+DEDUPE_BATCH_SIZE = 500
+
 def send_reminder_email(mail: Mail, requirement: ComplianceRequirement, user_email: str, reminder_type: str):
     """
     Send reminder email for a compliance requirement
@@ -64,6 +78,13 @@ def send_reminder_email(mail: Mail, requirement: ComplianceRequirement, user_ema
     """
     
     try:
+        # A move refuses the log write, so check for one before the email goes
+        # out rather than sending it unlogged. The check doesn't write: holding
+        # SQLite's write lock across the SMTP round trip would stall every
+        # web request that writes.
+        if current_app.config.get('DATABASE_SHARDS'):
+            check_no_moves()
+        
         msg = Message(
             subject=subject,
             recipients=[user_email],
@@ -71,7 +92,6 @@ def send_reminder_email(mail: Mail, requirement: ComplianceRequirement, user_ema
         )
         mail.send(msg)
         
-        # Log the reminder
         reminder_log = ReminderLog(
             requirement_id=requirement.id,
             reminder_type=reminder_type,
@@ -81,72 +101,74 @@ def send_reminder_email(mail: Mail, requirement: ComplianceRequirement, user_ema
         db.session.commit()
         
         return True
+    except OrganizationMoving:
+        db.session.rollback()
+        raise
     except Exception as e:
+        db.session.rollback()
         print(f"Failed to send email: {str(e)}")
         return False
 
 def check_and_send_reminders(app, mail: Mail):
     """
-    Check all requirements and send reminders where needed
+    Check requirements that are due a reminder today and send reminders where needed
     """
     with app.app_context():
         today = datetime.now().date()
+        now = datetime.now()
+        
+        # Only requirements expiring exactly 30, 7 or 0 days from today are due
+        due_dates = {today + timedelta(days=days): reminder_type for days, reminder_type in REMINDER_SCHEDULE.items()}
+        requirements = ComplianceRequirement.query.filter(
+            ComplianceRequirement.expiration_date.in_(list(due_dates))
+        ).all()
         
-        # Get all requirements
-        requirements = ComplianceRequirement.query.all()
+        if not requirements:
+            print("Total reminders sent: 0")
+            return 0
         
+        # Reminders already sent inside the dedupe windows, read from the
+        # (requirement_id, reminder_type, sent_at) index a batch at a time
+        oldest = now - max(DEDUPE_WINDOWS.values())
+        requirement_ids = [req.id for req in requirements]
+        already_sent = set()
+        
+        for start in range(0, len(requirement_ids), DEDUPE_BATCH_SIZE):
+            recent = db.session.query(
+                ReminderLog.requirement_id, ReminderLog.reminder_type, ReminderLog.sent_at
+            ).filter(
+                ReminderLog.requirement_id.in_(requirement_ids[start:start + DEDUPE_BATCH_SIZE]),
+                ReminderLog.reminder_type.in_(list(DEDUPE_WINDOWS)),
+                ReminderLog.sent_at >= oldest
+            )
+            already_sent.update(
+                (log.requirement_id, log.reminder_type) for log in recent
+                if log.sent_at >= now - DEDUPE_WINDOWS[log.reminder_type]
+            )
+        
+        owners = {}
         reminders_sent = 0
         
         for req in requirements:
-            days_until_expiry = (req.expiration_date - today).days
-            
-            # Get organization owner email
-            owner = User.query.filter_by(
-                organization_id=req.organization_id
-            ).first()
-            
-            if not owner:
-                continue
+            reminder_type = due_dates[req.expiration_date]
             
             # Check if reminder already sent for this period
-            existing_log = None
-            reminder_type = None
-            
-            # Day of expiration
-            if days_until_expiry == 0:
-                reminder_type = 'day_of'
-                existing_log = ReminderLog.query.filter_by(
-                    requirement_id=req.id,
-                    reminder_type='day_of'
-                ).filter(
-                    ReminderLog.sent_at >= datetime.now() - timedelta(hours=12)
-                ).first()
+            if (req.id, reminder_type) in already_sent:
+                continue
             
-            # 7 days before
-            elif days_until_expiry == 7:
-                reminder_type = '7_day'
-                existing_log = ReminderLog.query.filter_by(
-                    requirement_id=req.id,
-                    reminder_type='7_day'
-                ).filter(
-                    ReminderLog.sent_at >= datetime.now() - timedelta(days=1)
+            # Get organization owner email (once per organization)
+            if req.organization_id not in owners:
+                owners[req.organization_id] = User.query.filter_by(
+                    organization_id=req.organization_id
                 ).first()
+            owner = owners[req.organization_id]
             
-            # 30 days before
-            elif days_until_expiry == 30:
-                reminder_type = '30_day'
-                existing_log = ReminderLog.query.filter_by(
-                    requirement_id=req.id,
-                    reminder_type='30_day'
-                ).filter(
-                    ReminderLog.sent_at >= datetime.now() - timedelta(days=1)
-                ).first()
+            if not owner:
+                continue
             
-            # Send reminder if needed and not already sent
-            if reminder_type and not existing_log:
-                if send_reminder_email(mail, req, owner.email, reminder_type):
-                    reminders_sent += 1
-                    print(f"Sent {reminder_type} reminder for: {req.name}")
+            if send_reminder_email(mail, req, owner.email, reminder_type):
+                reminders_sent += 1
+                print(f"Sent {reminder_type} reminder for: {req.name}")
         
         print(f"Total reminders sent: {reminders_sent}")
-        return reminders_sent
\ No newline at end of file
+        return reminders_sent
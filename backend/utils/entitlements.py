@@ -0,0 +1,88 @@
+from flask import current_app, flash, redirect, url_for
+from flask_login import current_user
+from datetime import datetime, timedelta
+import threading
+import time
+
+# Length of the default trial, counted from organization creation
+TRIAL_DAYS = 30
+
+# Subscription statuses that grant access (local trials also need days remaining;
+# 'trialing' is a Stripe-managed trial)
+ACCESS_STATUSES = {'trial', 'trialing', 'active'}
+
+# organization_id -> (data_version, expires_at, snapshot)
+_entitlement_cache = {}
+_cache_lock = threading.Lock()
+
+def compute_entitlement(organization, subscription):
+    """
+    Build an entitlement snapshot from an organization and its subscription (or None)
+    """
+    now = datetime.utcnow()
+    status = subscription.status if subscription else 'trial'
+
+    if subscription and subscription.trial_end:
+        trial_end = subscription.trial_end
+    else:
+        trial_end = organization.created_at + timedelta(days=TRIAL_DAYS)
+
+    if status == 'trial':
+        trial_days_remaining = max(0, (trial_end - now).days)
+        access_allowed = trial_days_remaining > 0
+    else:
+        trial_days_remaining = 0
+        access_allowed = status in ACCESS_STATUSES
+
+    return {
+        'organization_id': organization.id,
+        'status': status,
+        'trial_end': trial_end if status == 'trial' else None,
+        'trial_days_remaining': trial_days_remaining,
+        'current_period_end': subscription.current_period_end if subscription else None,
+        'cancel_at_period_end': bool(subscription.cancel_at_period_end) if subscription else False,
+        'access_allowed': access_allowed
+    }
+
+def get_entitlement(organization):
+    """
+    Get an organization's entitlement snapshot, cached per process while the
+    organization's data version is unchanged. Every subscription write bumps
+    that version, so a change applied by any worker is seen on the next
+    request; ENTITLEMENT_CACHE_TTL seconds bounds how late a trial that
+    simply runs out is noticed.
+    """
+    ttl = current_app.config.get('ENTITLEMENT_CACHE_TTL', 0)
+    now = time.monotonic()
+    version = organization.data_version
+
+    if ttl > 0:
+        with _cache_lock:
+            entry = _entitlement_cache.get(organization.id)
+        if entry and entry[0] == version and entry[1] > now:
+            return entry[2]
+
+    snapshot = compute_entitlement(organization, organization.subscription)
+
+    if ttl > 0:
+        with _cache_lock:
+            _entitlement_cache[organization.id] = (version, now + ttl, snapshot)
+
+    return snapshot
+
+def require_entitlement():
+    """
+    before_request gate for protected blueprints: send organizations
+    without an active trial or subscription to the billing page
+    """
+    if not current_app.config.get('ENTITLEMENT_GATE_ENABLED'):
+        return None
+
+    if not current_user.is_authenticated or not current_user.organization:
+        return None
+
+    if not get_entitlement(current_user.organization)['access_allowed']:
+        flash('Your trial or subscription has ended. Subscribe to continue using ClearComply.', 'warning')
+        return redirect(url_for('billing.billing'))
+
+    return None
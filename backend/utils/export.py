@@ -6,9 +6,13 @@ from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from datetime import datetime
 import pandas as pd
+import csv
 import io
 import os
 
+# Requirements written per chunk of a streamed CSV export
+CSV_CHUNK_ROWS = 500
+
 def generate_compliance_pdf(organization, requirements):
     """
     Generate a PDF report of all compliance requirements
@@ -131,29 +135,32 @@ def generate_compliance_pdf(organization, requirements):
     buffer.seek(0)
     return buffer
 
+def compliance_csv_row(organization, req):
+    """
+    One requirement as a CSV export row
+    """
+    # Get latest document info
+    latest_doc = req.documents[-1] if req.documents else None
+    
+    return {
+        'Organization': organization.name,
+        'Requirement Name': req.name,
+        'Description': req.description or '',
+        'Status': req.status.replace('_', ' ').title(),
+        'Expiration Date': req.expiration_date.strftime('%Y-%m-%d'),
+        'Renewal Frequency': req.renewal_frequency_label or '',
+        'Documents Count': len(req.documents),
+        'Latest Document': latest_doc.filename if latest_doc else 'None',
+        'Latest Upload Date': latest_doc.uploaded_at.strftime('%Y-%m-%d') if latest_doc else '',
+        'Created Date': req.created_at.strftime('%Y-%m-%d'),
+        'Last Updated': req.updated_at.strftime('%Y-%m-%d')
+    }
+
 def generate_compliance_csv(organization, requirements):
     """
     Generate a CSV export of all compliance requirements
     """
-    data = []
-    
-    for req in requirements:
-        # Get latest document info
-        latest_doc = req.documents[-1] if req.documents else None
-        
-        data.append({
-            'Organization': organization.name,
-            'Requirement Name': req.name,
-            'Description': req.description or '',
-            'Status': req.status.replace('_', ' ').title(),
-            'Expiration Date': req.expiration_date.strftime('%Y-%m-%d'),
-            'Renewal Frequency': req.renewal_frequency or '',
-            'Documents Count': len(req.documents),
-            'Latest Document': latest_doc.filename if latest_doc else 'None',
-            'Latest Upload Date': latest_doc.uploaded_at.strftime('%Y-%m-%d') if latest_doc else '',
-            'Created Date': req.created_at.strftime('%Y-%m-%d'),
-            'Last Updated': req.updated_at.strftime('%Y-%m-%d')
-        })
+    data = [compliance_csv_row(organization, req) for req in requirements]
     
     df = pd.DataFrame(data)
     
@@ -164,6 +171,32 @@ def generate_compliance_csv(organization, requirements):
     
     return buffer
 
+def stream_compliance_csv(organization, requirements):
+    """
+    Yield the same CSV export as generate_compliance_csv in chunks of
+    CSV_CHUNK_ROWS rows, so a streamed response never holds the whole file
+    """
+    buffer = io.StringIO()
+    writer = None
+    
+    for count, req in enumerate(requirements, 1):
+        row = compliance_csv_row(organization, req)
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row), lineterminator='\n')
+            writer.writeheader()
+        writer.writerow(row)
+        
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if writer is None:
+        # Match pandas' output for an empty export
+        yield '\n'
+    elif buffer.tell():
+        yield buffer.getvalue()
+
 def generate_requirement_detail_pdf(requirement):
     """
     Generate a detailed PDF for a single requirement
@@ -193,7 +226,7 @@ def generate_requirement_detail_pdf(requirement):
         ['Requirement Name', requirement.name],
         ['Status', requirement.status.replace('_', ' ').title()],
         ['Expiration Date', requirement.expiration_date.strftime('%B %d, %Y')],
-        ['Renewal Frequency', requirement.renewal_frequency or 'Not specified'],
+        ['Renewal Frequency', requirement.renewal_frequency_label or 'Not specified'],
         ['Description', requirement.description or 'No description'],
         ['Created', requirement.created_at.strftime('%B %d, %Y')],
         ['Last Updated', requirement.updated_at.strftime('%B %d, %Y')]
@@ -0,0 +1,163 @@
+from backend.models.compliance import ComplianceDocument
+from backend.database.database import db
+from backend.database.sharding import data_shards, shard_scope
+from datetime import datetime, timedelta
+import threading
+import queue
+import os
+
+# Files waiting to be removed by the background worker
+_removal_queue = queue.Queue()
+_worker_lock = threading.Lock()
+_worker = None
+
+def _removal_worker():
+    """
+    Remove queued files one at a time, off the request path
+    """
+    while True:
+        file_path = _removal_queue.get()
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # Leave it on disk; the orphan sweeper will reclaim it later
+            print(f"[FileCleanup] Failed to remove {file_path}: {str(e)}")
+        finally:
+            _removal_queue.task_done()
+
+def enqueue_file_removal(file_paths):
+    """
+    Queue files for removal by the background worker.
+    Call this only after the database change that orphaned them has committed.
+    """
+    global _worker
+
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_removal_worker, name='file-cleanup', daemon=True)
+            _worker.start()
+
+    for file_path in file_paths:
+        if file_path:
+            _removal_queue.put(file_path)
+
+def stored_file_path(upload_folder, file_path):
+    """
+    Where a document's file lives now. Files are keyed by their name in the
+    upload folder, as in download_document, so stored paths from an earlier
+    deploy directory or UPLOAD_FOLDER still resolve.
+    """
+    return os.path.join(upload_folder, os.path.basename(file_path))
+
+def fill_stored_names(batch_size=500):
+    """
+    Set stored_name on documents from before it was recorded, from the
+    basename of file_path, in the current scope. Returns the number filled.
+    """
+    table = ComplianceDocument.__table__
+    filled = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.file_path).where(table.c.stored_name.is_(None)).limit(batch_size)
+        ).all()
+        if not rows:
+            return filled
+        db.session.execute(
+            table.update().where(table.c.id == db.bindparam('document_id')).values(stored_name=db.bindparam('name')),
+            [{'document_id': row.id, 'name': os.path.basename(row.file_path)} for row in rows]
+        )
+        db.session.commit()
+        filled += len(rows)
+
+def _folder_matches_documents(upload_folder, batch_size):
+    """
+    False when documents exist but none of their files is in upload_folder:
+    UPLOAD_FOLDER is not where the files are, and nothing in it is an orphan
+    """
+    documents_exist = False
+    for key in data_shards():
+        with shard_scope(key):
+            names = db.session.query(ComplianceDocument.stored_name).order_by(
+                ComplianceDocument.id.desc()
+            ).yield_per(batch_size)
+            for (name,) in names:
+                documents_exist = True
+                if name and os.path.isfile(os.path.join(upload_folder, name)):
+                    return True
+    return not documents_exist
+
+def sweep_orphan_files(upload_folder, batch_size=500, grace_minutes=60, max_reported_missing=100):
+    """
+    Reconcile the upload folder against compliance_document.stored_name:
+    - Files on disk with no document row are removed (orphans)
+    - Document rows whose file is missing on disk are counted and logged
+    Both sides are walked in batches so neither the folder listing
+    nor the document table is ever held in memory at once. Uploads are
+    shared by every shard, so each batch is checked against all of them.
+    Nothing is removed when no document's file is in the folder at all.
+    """
+    results = {'scanned': 0, 'orphans_removed': 0, 'missing_files': 0, 'missing_file_ids': [], 'folder_mismatch': False}
+
+    if not os.path.isdir(upload_folder):
+        return results
+
+    for key in data_shards():
+        with shard_scope(key):
+            fill_stored_names(batch_size)
+
+    if not _folder_matches_documents(upload_folder, batch_size):
+        results['folder_mismatch'] = True
+        print(f"[FileCleanup] No document's file is in {upload_folder}; check UPLOAD_FOLDER. Nothing was removed.")
+        return results
+
+    # Skip recent files: upload_document saves the file before its row commits
+    cutoff = (datetime.now() - timedelta(minutes=grace_minutes)).timestamp()
+
+    def reclaim(batch):
+        names = {entry.name for entry in batch}
+        known = set()
+        for key in data_shards():
+            with shard_scope(key):
+                known.update(db.session.execute(
+                    db.select(ComplianceDocument.stored_name).where(ComplianceDocument.stored_name.in_(names))
+                ).scalars())
+
+        for entry in batch:
+            if entry.name in known:
+                continue
+            try:
+                os.remove(entry.path)
+                results['orphans_removed'] += 1
+            except OSError as e:
+                print(f"[FileCleanup] Failed to remove orphan {entry.path}: {str(e)}")
+
+    batch = []
+    with os.scandir(upload_folder) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.stat().st_mtime > cutoff:
+                continue
+            results['scanned'] += 1
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                reclaim(batch)
+                batch = []
+    if batch:
+        reclaim(batch)
+
+    # Stream document rows and flag any whose file has gone missing
+    for key in data_shards():
+        with shard_scope(key):
+            rows = db.session.query(ComplianceDocument.id, ComplianceDocument.stored_name).order_by(
+                ComplianceDocument.id
+            ).yield_per(batch_size)
+
+            for document_id, name in rows:
+                if not name or not os.path.isfile(os.path.join(upload_folder, name)):
+                    results['missing_files'] += 1
+                    if len(results['missing_file_ids']) < max_reported_missing:
+                        results['missing_file_ids'].append(document_id)
+                    print(f"[FileCleanup] Document {document_id} is missing its file: {name}")
+
+    return results
@@ -0,0 +1,232 @@
+from backend.models.compliance import ComplianceRequirement, ComplianceDocument
+from backend.models.history import ComplianceSnapshot
+from backend.database.database import db
+from backend.database.sharding import run_on_shards, check_no_moves, OrganizationMoving
+from backend.utils.page_cache import bump_data_version
+from flask import current_app
+from flask.cli import with_appcontext
+from datetime import datetime, timedelta
+import pandas as pd
+import numpy as np
+import click
+
+# Status columns of a snapshot, in display order
+SNAPSHOT_STATUSES = ['compliant', 'expiring_soon', 'expired', 'missing']
+
+# Rows per executemany batch
+SNAPSHOT_BATCH_SIZE = 5000
+
+def _write_snapshots(frame, replace_recorded):
+    """
+    Store snapshot rows (a DataFrame with the ComplianceSnapshot columns).
+    Earlier backfilled rows for the same days are replaced; recorded rows
+    only when replace_recorded is set, otherwise those days are skipped.
+    Returns the number of rows written.
+    """
+    if frame.empty:
+        return 0
+
+    # Counts read while an organization is between shards may miss or double it
+    check_no_moves()
+
+    table = ComplianceSnapshot.__table__
+    in_range = db.and_(
+        table.c.organization_id.in_(frame['organization_id'].unique().tolist()),
+        table.c.snapshot_date.between(frame['snapshot_date'].min(), frame['snapshot_date'].max())
+    )
+
+    if not replace_recorded:
+        recorded = pd.DataFrame(db.session.execute(
+            db.select(table.c.organization_id, table.c.snapshot_date).where(in_range, table.c.backfilled.is_(False))
+        ).all(), columns=['organization_id', 'snapshot_date'])
+        if not recorded.empty:
+            keys = pd.MultiIndex.from_frame(frame[['organization_id', 'snapshot_date']])
+            frame = frame[~keys.isin(pd.MultiIndex.from_frame(recorded))]
+        in_range = db.and_(in_range, table.c.backfilled.is_(True))
+
+    db.session.execute(table.delete().where(in_range))
+    for start in range(0, len(frame), SNAPSHOT_BATCH_SIZE):
+        db.session.execute(table.insert(), frame.iloc[start:start + SNAPSHOT_BATCH_SIZE].to_dict('records'))
+    db.session.commit()
+
+    return len(frame)
+
+def record_status_snapshots(snapshot_date=None):
+    """
+    Append today's status counts of every organization in scope to the
+    snapshot store, replacing an earlier snapshot of the same day.
+    Run after update_all_statuses. Returns the number of organizations recorded.
+    """
+    snapshot_date = snapshot_date or datetime.now().date()
+
+    rows = db.session.execute(
+        db.select(
+            ComplianceRequirement.organization_id,
+            ComplianceRequirement.status,
+            db.func.count()
+        ).group_by(ComplianceRequirement.organization_id, ComplianceRequirement.status)
+    ).all()
+
+    if not rows:
+        return 0
+
+    counts = pd.DataFrame(rows, columns=['organization_id', 'status', 'count'])
+    frame = counts.pivot_table(
+        index='organization_id', columns='status', values='count', aggfunc='sum', fill_value=0
+    ).reindex(columns=SNAPSHOT_STATUSES, fill_value=0)
+    frame['total'] = counts.groupby('organization_id')['count'].sum()
+    frame = frame.astype(int).reset_index().assign(snapshot_date=snapshot_date, backfilled=False)
+
+    return _write_snapshots(frame, replace_recorded=True)
+
+def _with_percentage(row):
+    """
+    A snapshot row as a dict, with compliance_percentage as in get_status_counts
+    """
+    snapshot = dict(row)
+    snapshot['compliance_percentage'] = round((snapshot['compliant'] / snapshot['total']) * 100, 1) if snapshot['total'] else 0
+    return snapshot
+
+def get_compliance_trend(organization_id, start, end):
+    """
+    Daily snapshots of one organization between start and end (inclusive)
+    """
+    rows = db.session.execute(
+        db.select(
+            ComplianceSnapshot.snapshot_date,
+            ComplianceSnapshot.total,
+            *[getattr(ComplianceSnapshot, status) for status in SNAPSHOT_STATUSES],
+            ComplianceSnapshot.backfilled
+        ).where(
+            ComplianceSnapshot.organization_id == organization_id,
+            ComplianceSnapshot.snapshot_date.between(start, end)
+        ).order_by(ComplianceSnapshot.snapshot_date)
+    ).mappings().all()
+
+    return [_with_percentage(row) for row in rows]
+
+def get_platform_trend(start, end):
+    """
+    Daily status counts summed over every organization between start and end (inclusive)
+    """
+    rows = db.session.execute(
+        db.select(
+            ComplianceSnapshot.snapshot_date,
+            db.func.count().label('organizations'),
+            db.func.sum(ComplianceSnapshot.total).label('total'),
+            *[db.func.sum(getattr(ComplianceSnapshot, status)).label(status) for status in SNAPSHOT_STATUSES]
+        ).where(
+            ComplianceSnapshot.snapshot_date.between(start, end)
+        ).group_by(ComplianceSnapshot.snapshot_date).order_by(ComplianceSnapshot.snapshot_date)
+    ).mappings().all()
+
+    return [_with_percentage(row) for row in rows]
+
+def _interval_counts(counts, rows, starts, ends):
+    """
+    Add one to counts[row, day] for every day in [start, end) of each row,
+    with a difference array so the cost does not grow with interval length
+    """
+    days = counts.shape[1]
+    starts = np.clip(starts, 0, days)
+    ends = np.clip(ends, 0, days)
+    valid = starts < ends
+
+    diff = np.zeros((counts.shape[0], days + 1), dtype=np.int64)
+    np.add.at(diff, (rows[valid], starts[valid]), 1)
+    np.add.at(diff, (rows[valid], ends[valid]), -1)
+    counts += diff.cumsum(axis=1)[:, :days]
+
+def reconstruct_snapshots(start, end):
+    """
+    Rebuild the daily status counts of every organization in scope between
+    start and end from created_at, expiration_date and document upload
+    dates, using the same rules as update_requirement_status. Requirements
+    and documents deleted since, and expiration dates that have been
+    renewed, cannot be seen, so the result approximates what was shown.
+    Returns a DataFrame of snapshot rows.
+    """
+    requirements = pd.DataFrame(db.session.execute(
+        db.select(
+            ComplianceRequirement.id,
+            ComplianceRequirement.organization_id,
+            ComplianceRequirement.created_at,
+            ComplianceRequirement.expiration_date
+        )
+    ).all(), columns=['id', 'organization_id', 'created_at', 'expiration_date'])
+
+    if requirements.empty:
+        return pd.DataFrame()
+
+    first_uploads = pd.DataFrame(db.session.execute(
+        db.select(
+            ComplianceDocument.requirement_id,
+            db.func.min(ComplianceDocument.uploaded_at)
+        ).group_by(ComplianceDocument.requirement_id)
+    ).all(), columns=['id', 'first_upload'])
+    requirements = requirements.merge(first_uploads, on='id', how='left')
+
+    first_day = np.datetime64(start, 'D')
+    days = (end - start).days + 1
+
+    def day_index(column, missing):
+        values = pd.to_datetime(column).to_numpy().astype('datetime64[D]')
+        return np.where(np.isnat(values), missing, (values - first_day).astype(np.int64))
+
+    never = days + 1
+    created = day_index(requirements['created_at'], 0)
+    expires = day_index(requirements['expiration_date'], never)
+    uploaded = day_index(requirements['first_upload'], never)
+    soon = expires - 30
+
+    organization_ids, rows = np.unique(requirements['organization_id'].to_numpy(), return_inverse=True)
+    counts = {status: np.zeros((len(organization_ids), days), dtype=np.int64) for status in ['total'] + SNAPSHOT_STATUSES}
+
+    # Day intervals [start, end) of each status, same rules as update_requirement_status
+    _interval_counts(counts['total'], rows, created, np.full(len(rows), never))
+    _interval_counts(counts['expired'], rows, np.maximum(created, expires + 1), np.full(len(rows), never))
+    _interval_counts(counts['expiring_soon'], rows, np.maximum(created, soon), expires + 1)
+    _interval_counts(counts['compliant'], rows, np.maximum(created, uploaded), soon)
+    _interval_counts(counts['missing'], rows, created, np.minimum(uploaded, soon))
+
+    frame = pd.DataFrame({
+        'organization_id': np.repeat(organization_ids, days),
+        'snapshot_date': np.tile(pd.date_range(start, periods=days).date, len(organization_ids)),
+        **{status: values.ravel() for status, values in counts.items()},
+        'backfilled': True,
+    })
+    return frame[frame['total'] > 0].reset_index(drop=True)
+
+def backfill_snapshots(start, end, replace_recorded=False):
+    """
+    Reconstruct and store snapshots for organizations in scope. Days that
+    already have a recorded snapshot keep it unless replace_recorded is set.
+    Returns the number of rows written.
+    """
+    frame = reconstruct_snapshots(start, end)
+    return _write_snapshots(frame, replace_recorded)
+
+@click.command('backfill-snapshots')
+@click.option('--days', default=365, show_default=True, help='Days before today to reconstruct.')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='First day (overrides --days).')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Last day. Defaults to yesterday.')
+@click.option('--replace-recorded', is_flag=True, help='Also overwrite snapshots taken by the nightly job.')
+@with_appcontext
+def backfill_snapshots_command(days, start, end, replace_recorded):
+    """
+    Reconstruct past daily compliance snapshots from requirement and document dates.
+    """
+    end = end.date() if end else datetime.now().date() - timedelta(days=1)
+    start = start.date() if start else end - timedelta(days=days - 1)
+    if start > end:
+        raise click.BadParameter('start must be on or before end')
+
+    try:
+        counts = run_on_shards(current_app._get_current_object(), lambda: backfill_snapshots(start, end, replace_recorded))
+    except OrganizationMoving as e:
+        raise click.ClickException(f'Organizations {list(e.args)} are being moved; run this again once they are done')
+    
+    # History pages are cached per data version
+    bump_data_version()
+    db.session.commit()
+    print(f"[History] Wrote {sum(counts.values())} snapshots for {start} to {end}")
@@ -0,0 +1,90 @@
+from backend.models.auth import User, Organization
+from backend.models.finance import Subscription
+from backend.database.database import db
+from flask import current_app
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import event
+import threading
+import time
+
+# user_id -> (expires_at, organization_id, detached User)
+_identity_cache = {}
+_cache_lock = threading.Lock()
+
+def _identity_query(user_id):
+    """
+    Select a user together with its organization and subscription in one joined query
+    """
+    return db.select(User).options(
+        joinedload(User.organization).joinedload(Organization.subscription)
+    ).where(User.id == user_id)
+
+def load_identity(user_id):
+    """
+    Load the user for a request along with its organization and subscription.
+    With IDENTITY_CACHE_TTL > 0 a detached copy is cached per process and merged
+    into the request session without touching the database until it expires.
+    """
+    ttl = current_app.config.get('IDENTITY_CACHE_TTL', 0)
+
+    if ttl <= 0:
+        return db.session.execute(_identity_query(user_id)).unique().scalar_one_or_none()
+
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _identity_cache.get(user_id)
+
+    if entry and entry[0] > now:
+        return db.session.merge(entry[2], load=False)
+
+    # Load in a separate session so the cached copy never picks up request changes
+    with Session(db.engine) as session:
+        user = session.execute(_identity_query(user_id)).unique().scalar_one_or_none()
+
+    if not user:
+        return None
+
+    with _cache_lock:
+        _identity_cache[user_id] = (now + ttl, user.organization_id, user)
+
+    return db.session.merge(user, load=False)
+
+def invalidate_identity(user_id=None, organization_id=None):
+    """
+    Drop cached identities for a user, or for every user of an organization
+    """
+    with _cache_lock:
+        if user_id is not None:
+            _identity_cache.pop(user_id, None)
+    if organization_id is not None:
+        invalidate_organization_identities([organization_id])
+
+def invalidate_organization_identities(organization_ids=None):
+    """
+    Drop cached identities of every user of some organizations (all when None).
+    Core UPDATEs of users, organizations or subscriptions bypass the flush hook
+    below and call this instead.
+    """
+    with _cache_lock:
+        if organization_ids is None:
+            _identity_cache.clear()
+            return
+        organization_ids = set(organization_ids)
+        for key in [key for key, entry in _identity_cache.items() if entry[1] in organization_ids]:
+            del _identity_cache[key]
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_changed_identities(session, flush_context):
+    """
+    Invalidate cached identities whenever a user, organization or subscription changes
+    """
+    if not _identity_cache:
+        return
+
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, User):
+            invalidate_identity(user_id=instance.id, organization_id=instance.organization_id)
+        elif isinstance(instance, Organization):
+            invalidate_identity(organization_id=instance.id)
+        elif isinstance(instance, Subscription):
+            invalidate_identity(organization_id=instance.organization_id)
@@ -0,0 +1,176 @@
+from backend.models.auth import Organization
+from backend.models.compliance import ComplianceRequirement, ComplianceDocument
+from backend.models.finance import Subscription
+from backend.database.database import db
+from backend.utils.identity import invalidate_organization_identities
+from flask import current_app, make_response, request, session
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from sqlalchemy.orm import Session
+from sqlalchemy import event
+import threading
+import hashlib
+import os
+
+# (organization_id, fragment name, key) -> (data_version, value), least recently used first
+_fragment_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def get_data_version(organization_id):
+    """
+    Current data version of an organization; changes whenever anything it displays changes
+    """
+    return db.session.query(Organization.data_version).filter(
+        Organization.id == organization_id
+    ).scalar() or 0
+
+def _bump_statement(organization_ids=None):
+    """
+    UPDATE advancing the data version of some organizations (all when None)
+    """
+    table = Organization.__table__
+    statement = table.update().values(data_version=table.c.data_version + 1, data_changed_at=datetime.utcnow())
+    if organization_ids is not None:
+        statement = statement.where(table.c.id.in_(organization_ids))
+    return statement
+
+# session.info key of the organizations to bump once the session commits (None in the set: all)
+_PENDING_BUMPS = 'pending_data_version_bumps'
+
+def _schedule_bump(db_session, organization_ids):
+    pending = db_session.info.setdefault(_PENDING_BUMPS, set())
+    if organization_ids is None:
+        pending.add(None)
+    else:
+        pending.update(organization_ids)
+
+def bump_data_version(organization_ids=None):
+    """
+    Advance the data version of some organizations (all when None) once the
+    caller's transaction commits, invalidating their cached fragments and ETags
+    """
+    if organization_ids is not None:
+        organization_ids = {int(organization_id) for organization_id in organization_ids if organization_id is not None}
+        if not organization_ids:
+            return
+
+    _schedule_bump(db.session, organization_ids)
+
+@event.listens_for(Session, 'after_flush')
+def _bump_changed_organizations(db_session, flush_context):
+    """
+    Note organizations whose requirements, documents, subscription or
+    details were written in this flush, to bump when the session commits
+    """
+    organization_ids = set()
+
+    for instance in list(db_session.new) + list(db_session.dirty) + list(db_session.deleted):
+        if isinstance(instance, (ComplianceRequirement, Subscription)):
+            organization_ids.add(instance.organization_id)
+        elif isinstance(instance, ComplianceDocument):
+            requirement = instance.__dict__.get('requirement')
+            if requirement is not None:
+                organization_ids.add(requirement.organization_id)
+        elif isinstance(instance, Organization) and instance not in db_session.new:
+            organization_ids.add(instance.id)
+
+    organization_ids.discard(None)
+    if organization_ids:
+        _schedule_bump(db_session, organization_ids)
+
+@event.listens_for(Session, 'after_commit')
+def _bump_committed_organizations(db_session):
+    """
+    Bump the noted organizations in a short transaction of its own after
+    the write commits. Bumping inside the writer's transaction held every
+    organization's row locked until commit, so concurrent writers of one
+    organization (imports, uploads, the webhook worker) queued on it.
+    Until this lands, readers may still be served the previous version.
+    """
+    pending = db_session.info.pop(_PENDING_BUMPS, None)
+    if not pending:
+        return
+
+    organization_ids = None if None in pending else pending
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(_bump_statement(organization_ids))
+    except Exception as e:
+        print(f"[PageCache] Failed to bump data versions: {str(e)}")
+
+    # Cached identities carry the organization row this just changed
+    invalidate_organization_identities(organization_ids)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_bumps(db_session):
+    db_session.info.pop(_PENDING_BUMPS, None)
+
+def cached_fragment(organization_id, version, name, key, render):
+    """
+    Return render() for a page fragment, reusing the value from an earlier
+    call with the same organization, name, key and data version.
+    Holds at most FRAGMENT_CACHE_SIZE fragments per process (0 disables).
+    """
+    size = current_app.config.get('FRAGMENT_CACHE_SIZE', 0)
+    if size <= 0:
+        return render()
+
+    cache_key = (organization_id, name, key)
+    with _cache_lock:
+        entry = _fragment_cache.get(cache_key)
+        if entry and entry[0] == version:
+            _fragment_cache.move_to_end(cache_key)
+            return entry[1]
+
+    value = render()
+
+    with _cache_lock:
+        _fragment_cache[cache_key] = (version, value)
+        _fragment_cache.move_to_end(cache_key)
+        while len(_fragment_cache) > size:
+            _fragment_cache.popitem(last=False)
+
+    return value
+
+@lru_cache(maxsize=None)
+def _template_signature(template_folder):
+    """
+    Fingerprint of the deployed templates, so a release changes every ETag
+    """
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(template_folder):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(f'{path}:{os.stat(path).st_mtime_ns}'.encode())
+    return digest.hexdigest()[:8]
+
+def page_etag(organization_id, version, user_id):
+    """
+    Weak ETag for a page of an organization's data as seen by one user.
+    Pages link fingerprinted assets, so an asset build changes it too.
+    """
+    page = hashlib.sha1(request.full_path.encode()).hexdigest()[:12]
+    templates = _template_signature(os.path.join(current_app.root_path, current_app.template_folder))
+    assets = current_app.extensions.get('asset_version', '')
+    return f'{organization_id}-{version}-{user_id}-{page}-{templates}{assets}'
+
+def conditional_page(etag, render):
+    """
+    Answer If-None-Match with a 304 without rendering, otherwise send
+    render() with a weak ETag. Pages showing flashed messages are sent
+    without an ETag so a later revalidation can't bring the message back.
+    """
+    if '_flashes' in session:
+        response = make_response(render())
+    elif request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+    else:
+        response = make_response(render())
+        response.set_etag(etag, weak=True)
+
+    # Browsers may keep the page but must revalidate before showing it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
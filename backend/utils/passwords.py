@@ -0,0 +1,61 @@
+from werkzeug.security import generate_password_hash, check_password_hash
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from flask import current_app
+from functools import lru_cache
+import threading
+
+_executor = None
+_executor_lock = threading.Lock()
+
+class PasswordHashBusy(Exception):
+    """Raised when the hashing pool is saturated and a request waited too long"""
+
+def _get_executor():
+    """
+    Lazily create the bounded pool that all password hashing runs on
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['PASSWORD_HASH_WORKERS'],
+                thread_name_prefix='password-hash'
+            )
+    return _executor
+
+def _run(func, *args):
+    """
+    Run a hash function on the pool, giving up after PASSWORD_HASH_TIMEOUT seconds
+    """
+    future = _get_executor().submit(func, *args)
+    try:
+        return future.result(timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+    except TimeoutError:
+        future.cancel()
+        raise PasswordHashBusy()
+
+@lru_cache(maxsize=None)
+def _hash_prefix(method):
+    """
+    Full parameter prefix werkzeug writes for a method, e.g. 'scrypt' -> 'scrypt:32768:8:1'
+    """
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+def hash_password(password):
+    """
+    Hash a password with the configured PASSWORD_HASH_METHOD
+    """
+    return _run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+def verify_password(password_hash, password):
+    """
+    Check a password against a stored hash
+    """
+    return _run(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash):
+    """
+    Check whether a stored hash was made with different parameters than the configured method
+    """
+    return password_hash.split('$', 1)[0] != _hash_prefix(current_app.config['PASSWORD_HASH_METHOD'])
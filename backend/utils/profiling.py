@@ -0,0 +1,221 @@
+from backend.models.auth import Organization
+from backend.models.profiling import Profile, JobProfileRequest
+from backend.database.database import db
+from backend.utils.admin import is_admin
+from backend.utils.identity import invalidate_identity
+from flask import current_app, g, request
+from flask_login import current_user
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+import threading
+import cProfile
+import pstats
+import uuid
+import time
+import os
+
+# Admins send this header (any non-empty value) to profile a single request
+PROFILE_HEADER = 'X-Profile-Request'
+
+# Scheduler jobs that can be flagged for profiling
+PROFILABLE_JOBS = ('update_statuses', 'send_reminders')
+
+def _start_profiler():
+    """
+    Profile the calling thread, or None when another profiler already is
+    """
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+def save_profile(kind, name, profilers, duration, organization_id=None, requested_by=None):
+    """
+    Merge the stopped profilers of one run into a pstats file, record it and
+    drop the oldest profiles beyond PROFILE_RETENTION
+    """
+    stats = None
+    for profiler in profilers:
+        profiler.create_stats()
+        if not profiler.stats:
+            continue
+        if stats is None:
+            stats = pstats.Stats(profiler)
+        else:
+            stats.add(profiler)
+
+    if stats is None:
+        return None
+
+    folder = current_app.config['PROFILE_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, f"{kind}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}.prof")
+    stats.dump_stats(file_path)
+
+    profile = Profile(
+        kind=kind,
+        name=name[:255],
+        organization_id=organization_id,
+        requested_by=requested_by,
+        file_path=file_path,
+        duration_ms=round(duration * 1000, 1)
+    )
+    db.session.add(profile)
+    db.session.commit()
+
+    expired = Profile.query.order_by(Profile.created_at.desc(), Profile.id.desc()).offset(
+        current_app.config.get('PROFILE_RETENTION', 50)
+    ).all()
+    for old in expired:
+        try:
+            os.remove(old.file_path)
+        except OSError:
+            pass
+        db.session.delete(old)
+    if expired:
+        db.session.commit()
+
+    return profile
+
+def _claim_organization_request(organization_id):
+    """
+    Take one of an organization's flagged requests; False when none are left
+    """
+    table = Organization.__table__
+    claimed = db.session.execute(
+        table.update().where(
+            table.c.id == organization_id,
+            table.c.profile_requests > 0
+        ).values(profile_requests=table.c.profile_requests - 1)
+    ).rowcount
+    db.session.commit()
+    # The cached identity carries the counter; without this every request would retry the claim
+    invalidate_identity(organization_id=organization_id)
+    return claimed > 0
+
+def start_request_profile():
+    """
+    before_request hook: profile the request when an admin sends PROFILE_HEADER
+    or the user's organization has flagged requests left
+    """
+    if not current_user.is_authenticated:
+        return
+
+    requested_by = None
+    if request.headers.get(PROFILE_HEADER) and is_admin(current_user):
+        requested_by = current_user.email
+    else:
+        organization = current_user.organization
+        # The counter rides along with the identity query, so unflagged requests cost nothing extra
+        if not organization or organization.profile_requests <= 0:
+            return
+        if not _claim_organization_request(organization.id):
+            return
+
+    profiler = _start_profiler()
+    if profiler is None:
+        return
+
+    g.profile = {
+        'profiler': profiler,
+        'started_at': time.perf_counter(),
+        'name': f'{request.method} {request.full_path.rstrip("?")}',
+        'organization_id': current_user.organization_id,
+        'requested_by': requested_by,
+    }
+
+def _finish_request_profile(app, profile):
+    profile['profiler'].disable()
+    duration = time.perf_counter() - profile['started_at']
+    with app.app_context():
+        save_profile(
+            'request',
+            profile['name'],
+            [profile['profiler']],
+            duration,
+            organization_id=profile['organization_id'],
+            requested_by=profile['requested_by']
+        )
+
+def finish_request_profile(response):
+    """
+    after_request hook: stop profiling once the response has been sent, so a
+    streamed body (CSV exports) is part of the profile
+    """
+    profile = g.pop('profile', None)
+    if profile is not None:
+        app = current_app._get_current_object()
+        response.call_on_close(lambda: _finish_request_profile(app, profile))
+    return response
+
+def discard_request_profile(error=None):
+    """
+    teardown hook: keep the profile of a request that failed before producing a response
+    """
+    profile = g.pop('profile', None)
+    if profile is not None:
+        _finish_request_profile(current_app._get_current_object(), profile)
+
+def init_profiling(app):
+    """
+    Profile flagged requests
+    """
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+    app.teardown_request(discard_request_profile)
+
+def _claim_job_request(job):
+    """
+    Take the flag for the next run of a job. Returns (claimed, requested_by).
+    """
+    flag = db.session.get(JobProfileRequest, job)
+    if flag is None:
+        return False, None
+    requested_by = flag.requested_by
+    claimed = JobProfileRequest.query.filter_by(job=job).delete(synchronize_session=False)
+    db.session.commit()
+    return claimed > 0, requested_by
+
+@contextmanager
+def job_profiling(app, job):
+    """
+    Profile one run of a scheduler job when it has been flagged. Yields a
+    wrapper for functions the job runs on other threads (run_on_shards);
+    their profiles are merged with the job's own.
+    """
+    with app.app_context():
+        claimed, requested_by = _claim_job_request(job)
+
+    if not claimed:
+        yield lambda func: func
+        return
+
+    profilers = []
+    lock = threading.Lock()
+
+    def profiled(func):
+        @wraps(func)
+        def run(*args, **kwargs):
+            profiler = _start_profiler()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    with lock:
+                        profilers.append(profiler)
+        return run
+
+    profiler = _start_profiler()
+    started_at = time.perf_counter()
+    try:
+        yield profiled
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profilers.insert(0, profiler)
+        with app.app_context():
+            save_profile('job', job, profilers, time.perf_counter() - started_at, requested_by=requested_by)
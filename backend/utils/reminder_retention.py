@@ -0,0 +1,73 @@
+from backend.models.reminders import ReminderLog, ReminderRollup
+from backend.database.database import db
+from datetime import datetime, timedelta
+
+def compact_reminder_logs(retention_days=90, batch_size=1000):
+    """
+    Fold reminder logs older than the retention window into the monthly
+    per-requirement rollup and delete them. Each batch is one transaction,
+    so a row is either still a log or already counted in the rollup.
+    Returns the number of logs compacted.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    compacted = 0
+
+    while True:
+        logs = db.session.query(ReminderLog.id, ReminderLog.requirement_id, ReminderLog.sent_at).filter(
+            ReminderLog.sent_at < cutoff
+        ).order_by(ReminderLog.sent_at, ReminderLog.id).limit(batch_size).all()
+
+        if not logs:
+            break
+
+        # (requirement_id, month) -> [count, last_sent_at]
+        totals = {}
+        for log in logs:
+            key = (log.requirement_id, log.sent_at.date().replace(day=1))
+            entry = totals.setdefault(key, [0, log.sent_at])
+            entry[0] += 1
+            entry[1] = max(entry[1], log.sent_at)
+
+        try:
+            existing = db.session.query(
+                ReminderRollup.id,
+                ReminderRollup.requirement_id,
+                ReminderRollup.month,
+                ReminderRollup.reminder_count,
+                ReminderRollup.last_sent_at
+            ).filter(
+                ReminderRollup.requirement_id.in_({key[0] for key in totals}),
+                ReminderRollup.month.in_({key[1] for key in totals})
+            ).all()
+
+            updates = []
+            for rollup in existing:
+                entry = totals.pop((rollup.requirement_id, rollup.month), None)
+                if entry is None:
+                    continue
+                updates.append({
+                    'id': rollup.id,
+                    'reminder_count': rollup.reminder_count + entry[0],
+                    'last_sent_at': max(filter(None, [rollup.last_sent_at, entry[1]]))
+                })
+
+            if updates:
+                db.session.execute(db.update(ReminderRollup), updates)
+            if totals:
+                db.session.execute(ReminderRollup.__table__.insert(), [
+                    {'requirement_id': requirement_id, 'month': month, 'reminder_count': count, 'last_sent_at': last_sent_at}
+                    for (requirement_id, month), (count, last_sent_at) in totals.items()
+                ])
+
+            db.session.query(ReminderLog).filter(
+                ReminderLog.id.in_([log.id for log in logs])
+            ).delete(synchronize_session=False)
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        compacted += len(logs)
+
+    return compacted
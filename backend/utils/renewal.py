@@ -0,0 +1,305 @@
+from backend.models.compliance import ComplianceRequirement, RENEWAL_FREQUENCIES
+from backend.database.database import db
+from backend.database.sharding import data_shards, shard_scope
+from backend.utils.page_cache import bump_data_version
+from flask.cli import with_appcontext
+from datetime import datetime, timedelta
+import pandas as pd
+import numpy as np
+import click
+import re
+
+# Requirements expiring within this many days can be renewed in bulk
+RENEW_WITHIN_DAYS = 30
+
+# Longest "every N days" / "every N months" periods accepted
+MAX_INTERVAL_DAYS = 3650
+MAX_INTERVAL_MONTHS = 120
+
+FREQUENCY_ERROR = 'Renewal frequency must be monthly, quarterly, semi-annual, annual, biennial, every N days or every N months'
+
+# Other spellings accepted for the RENEWAL_FREQUENCIES keys
+_ALIASES = {
+    'month': 'monthly',
+    'quarter': 'quarterly',
+    'semi-annual': 'semiannual',
+    'semi-annually': 'semiannual',
+    'semiannually': 'semiannual',
+    'half-yearly': 'semiannual',
+    'year': 'annual',
+    'yearly': 'annual',
+    'annually': 'annual',
+    'biennially': 'biennial',
+    'weekly': '1 week',
+    'fortnightly': '2 weeks',
+}
+
+# "every N <unit>" -> (key, length of one unit in that key's interval)
+_EVERY_N = re.compile(r'^(?:every\s+)?(\d+)\s*(day|week|month|year)s?$')
+_UNITS = {'day': ('days', 1), 'week': ('days', 7), 'month': ('months', 1), 'year': ('months', 12)}
+
+# Month counts that have a key of their own ('every 6 months' is 'semiannual')
+_MONTHLY_KEYS = {months: key for key, (_, months) in RENEWAL_FREQUENCIES.items() if months}
+
+def _check_interval(interval, maximum, missing, unit):
+    try:
+        interval = int(interval)
+    except (TypeError, ValueError):
+        raise ValueError(missing)
+    if not 1 <= interval <= maximum:
+        raise ValueError(f'{unit} between renewals must be between 1 and {maximum}')
+    return interval
+
+def parse_renewal_frequency(value, interval_days=None, interval_months=None):
+    """
+    Normalize a renewal frequency to (key, interval_days, interval_months).
+    Accepts the keys of RENEWAL_FREQUENCIES, common spellings ('Yearly',
+    'Semi-annual', 'Weekly', 'every 90 days', '6 months') and 'days' or
+    'months' with a separate interval. Blank means no frequency: (None, None, None).
+    Raises ValueError for anything else.
+    """
+    text = ' '.join(str(value or '').lower().split())
+    if not text:
+        return None, None, None
+
+    text = _ALIASES.get(text, text)
+    match = _EVERY_N.match(text)
+    if match:
+        text, unit = _UNITS[match.group(2)]
+        if text == 'days':
+            interval_days = int(match.group(1)) * unit
+        else:
+            interval_months = int(match.group(1)) * unit
+
+    if text not in RENEWAL_FREQUENCIES:
+        raise ValueError(FREQUENCY_ERROR)
+
+    if text == 'days':
+        return 'days', _check_interval(interval_days, MAX_INTERVAL_DAYS, 'Enter the number of days between renewals', 'Days'), None
+
+    if text == 'months':
+        interval_months = _check_interval(interval_months, MAX_INTERVAL_MONTHS, 'Enter the number of months between renewals', 'Months')
+        if interval_months in _MONTHLY_KEYS:
+            return _MONTHLY_KEYS[interval_months], None, None
+        return 'months', None, interval_months
+
+    return text, None, None
+
+def _add_months(months, day_offsets, count):
+    """
+    Move month starts forward by count months and add the day offsets,
+    clamping to the last day of the target month (Jan 31 + 1 month = Feb 28)
+    """
+    target = months + count.astype('timedelta64[M]')
+    last_day = (target + np.timedelta64(1, 'M')).astype('datetime64[D]') - np.timedelta64(1, 'D')
+    return np.minimum(target.astype('datetime64[D]') + day_offsets, last_day)
+
+def roll_forward(expiration_dates, period_months, period_days, today):
+    """
+    Advance each expiration date by the fewest whole renewal periods (at least
+    one) that put it after today. A row's period is either period_months or
+    period_days; rows with neither are returned unchanged.
+    """
+    dates = np.asarray(expiration_dates, dtype='datetime64[D]')
+    period_months = np.asarray(period_months, dtype=np.int64)
+    period_days = np.asarray(period_days, dtype=np.int64)
+    today = np.datetime64(today, 'D')
+    result = dates.copy()
+
+    by_days = period_days > 0
+    if by_days.any():
+        start = dates[by_days]
+        step = period_days[by_days]
+        lag = (today - start).astype(np.int64)
+        periods = np.maximum(lag // step + 1, 1)
+        result[by_days] = start + (periods * step).astype('timedelta64[D]')
+
+    by_months = ~by_days & (period_months > 0)
+    if by_months.any():
+        start = dates[by_months]
+        step = period_months[by_months]
+        months = start.astype('datetime64[M]')
+        day_offsets = start - months.astype('datetime64[D]')
+
+        # Whole periods that still land in or before today's month, then one
+        # more where that is not yet past today
+        lag = (today.astype('datetime64[M]') - months).astype(np.int64)
+        periods = np.maximum(lag // step, 1)
+        renewed = _add_months(months, day_offsets, periods * step)
+        behind = renewed <= today
+        if behind.any():
+            periods[behind] += 1
+            renewed[behind] = _add_months(months[behind], day_offsets[behind], periods[behind] * step[behind])
+        result[by_months] = renewed
+
+    return result
+
+def _periods(frequencies, interval_days, interval_months):
+    """
+    (period_months, period_days) arrays for the renewal_frequency,
+    renewal_interval_days and renewal_interval_months columns; zeros where
+    the frequency is unusable
+    """
+    period_months = np.zeros(len(frequencies), dtype=np.int64)
+    period_days = np.zeros(len(frequencies), dtype=np.int64)
+
+    # Few distinct values, so parse each once rather than per row
+    for (frequency, days, months), positions in pd.DataFrame({
+        'frequency': frequencies, 'days': interval_days, 'months': interval_months
+    }).groupby(['frequency', 'days', 'months'], dropna=False).indices.items():
+        try:
+            key, days, months = parse_renewal_frequency(
+                frequency, None if pd.isna(days) else days, None if pd.isna(months) else months
+            )
+        except ValueError:
+            continue
+        if key == 'days':
+            period_days[positions] = days
+        elif key == 'months':
+            period_months[positions] = months
+        elif key is not None:
+            period_months[positions] = RENEWAL_FREQUENCIES[key][1]
+
+    return period_months, period_days
+
+def next_expiration_date(requirement, today=None):
+    """
+    The requirement's expiration date rolled forward past today, or None
+    when it has no usable renewal frequency
+    """
+    period_months, period_days = _periods(
+        [requirement.renewal_frequency], [requirement.renewal_interval_days], [requirement.renewal_interval_months]
+    )
+    if not period_months[0] and not period_days[0]:
+        return None
+
+    today = today or datetime.now().date()
+    return roll_forward([requirement.expiration_date], period_months, period_days, today)[0].astype(object)
+
+def renew_all_due(organization_id, within_days=RENEW_WITHIN_DAYS):
+    """
+    Roll forward every requirement of an organization that is expired or
+    expires within within_days and has had a document uploaded since it came
+    due (on or after within_days before its expiration date), computing all
+    new dates and statuses in one vectorized pass and writing them in a single
+    batched UPDATE. Returns (renewed, skipped, awaiting): skipped requirements
+    have no usable frequency, awaiting ones no new document and are left as
+    they are.
+    """
+    today = datetime.now().date()
+
+    rows = db.session.execute(
+        db.select(
+            ComplianceRequirement.id,
+            ComplianceRequirement.expiration_date,
+            ComplianceRequirement.renewal_frequency,
+            ComplianceRequirement.renewal_interval_days,
+            ComplianceRequirement.renewal_interval_months,
+            ComplianceRequirement.document_count,
+            ComplianceRequirement.latest_document_uploaded_at
+        ).where(
+            ComplianceRequirement.organization_id == organization_id,
+            ComplianceRequirement.expiration_date <= today + timedelta(days=within_days)
+        )
+    ).all()
+
+    if not rows:
+        return 0, 0, 0
+
+    frame = pd.DataFrame(rows, columns=[
+        'id', 'expiration_date', 'renewal_frequency', 'renewal_interval_days', 'renewal_interval_months',
+        'document_count', 'latest_document_uploaded_at'
+    ])
+    period_months, period_days = _periods(
+        frame['renewal_frequency'], frame['renewal_interval_days'], frame['renewal_interval_months']
+    )
+    renewable = (period_months > 0) | (period_days > 0)
+    skipped = int((~renewable).sum())
+
+    # Renewing moves the expiration date on, so only do it with evidence of
+    # the renewal: a document uploaded inside the current renewal window
+    current = pd.to_datetime(frame['expiration_date']).to_numpy().astype('datetime64[D]')
+    uploaded = pd.to_datetime(frame['latest_document_uploaded_at']).to_numpy()
+    evidenced = ~np.isnat(uploaded) & (uploaded.astype('datetime64[D]') >= current - np.timedelta64(within_days, 'D'))
+    awaiting = int((renewable & ~evidenced).sum())
+
+    renew = renewable & evidenced
+    frame = frame[renew]
+    if frame.empty:
+        return 0, skipped, awaiting
+
+    expiration = roll_forward(
+        current[renew],
+        period_months[renew],
+        period_days[renew],
+        today
+    )
+
+    # Same rules as update_requirement_status
+    today = np.datetime64(today, 'D')
+    status = np.select(
+        [expiration < today, expiration <= today + np.timedelta64(30, 'D'), frame['document_count'].to_numpy() > 0],
+        ['expired', 'expiring_soon', 'compliant'],
+        default='missing'
+    )
+
+    now = datetime.utcnow()
+    db.session.execute(db.update(ComplianceRequirement), pd.DataFrame({
+        'id': frame['id'].to_numpy(),
+        'expiration_date': expiration.astype(object),
+        'status': status,
+        'updated_at': now,
+    }).to_dict('records'))
+
+    # Bulk updates skip the flush hooks that normally do this
+    bump_data_version([organization_id])
+    db.session.commit()
+
+    return len(frame), skipped, awaiting
+
+def normalize_renewal_frequencies():
+    """
+    Rewrite free-text renewal frequencies from before they were a fixed list
+    to their keys, one UPDATE per distinct text in the current scope.
+    Returns (rows updated, texts that could not be recognised).
+    """
+    table = ComplianceRequirement.__table__
+    texts = db.session.execute(
+        db.select(table.c.renewal_frequency).distinct().where(
+            table.c.renewal_frequency.is_not(None),
+            table.c.renewal_frequency.not_in(list(RENEWAL_FREQUENCIES))
+        )
+    ).scalars().all()
+
+    updated = 0
+    unrecognised = []
+    for text in texts:
+        try:
+            key, interval_days, interval_months = parse_renewal_frequency(text)
+        except ValueError:
+            unrecognised.append(text)
+            continue
+        updated += db.session.execute(
+            table.update().where(table.c.renewal_frequency == text).values(
+                renewal_frequency=key,
+                renewal_interval_days=interval_days,
+                renewal_interval_months=interval_months
+            )
+        ).rowcount
+    db.session.commit()
+
+    return updated, unrecognised
+
+@click.command('normalize-renewal-frequencies')
+@with_appcontext
+def normalize_renewal_frequencies_command():
+    """
+    Map free-text renewal frequencies ('Semi-annual', 'every 6 months') to the
+    keys the requirement form offers, on the primary and every shard. Values
+    it can't recognise are listed and left as entered.
+    """
+    for key in data_shards():
+        with shard_scope(key):
+            updated, unrecognised = normalize_renewal_frequencies()
+        print(f"[Renewal] {key or 'primary'}: normalized {updated} requirements"
+              + (f", left unrecognised: {', '.join(repr(text) for text in unrecognised)}" if unrecognised else ''))
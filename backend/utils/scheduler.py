@@ -1,47 +1,166 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from backend.utils.status import update_all_statuses
+from backend.utils.history import record_status_snapshots
 from backend.utils.email_reminder import check_and_send_reminders
+from backend.utils.file_cleanup import sweep_orphan_files
+from backend.utils.reminder_retention import compact_reminder_logs
+from backend.utils.stripe_reconcile import reconcile_subscriptions
+from backend.routes.stripe import stripe_secret
 from backend.database.database import db
-from flask import Flask
+from backend.database.sharding import run_on_shards, OrganizationMoving
+from backend.utils.page_cache import bump_data_version
+from backend.utils.profiling import job_profiling
+from flask import Flask, current_app
+from flask.cli import with_appcontext
 from flask_mail import Mail
+from datetime import datetime, timedelta
+import click
+import time
+
+# Minutes before a job that ran into an organization move is tried again
+MOVE_RETRY_MINUTES = 10
 
 def start_scheduler(app: Flask, mail: Mail):
     """
     Start background scheduler for:
-    - Automatic status updates (daily at midnight)
+    - Automatic status updates and daily compliance snapshots (at startup and daily at midnight)
     - Reminder emails (daily at 9 AM)
+    - Orphaned upload cleanup (daily at 3 AM)
+    - Reminder log compaction (daily at 4 AM)
+    - Stripe subscription reconciliation (daily at 2 AM)
+    Status updates, reminders and compaction run on every shard in parallel.
+    Status updates and reminders are profiled when flagged from the admin page.
+    Shard jobs that run into an organization move are retried once it is done.
     """
     scheduler = BackgroundScheduler()
     
+    def retry_after_move(name, job):
+        def run():
+            try:
+                job()
+            except OrganizationMoving as e:
+                # Every shard job is safe to repeat, so the whole run is retried
+                print(f"[Scheduler] {name} postponed {MOVE_RETRY_MINUTES} minutes: organizations {list(e.args)} are being moved")
+                scheduler.add_job(
+                    func=run,
+                    trigger='date',
+                    run_date=datetime.now() + timedelta(minutes=MOVE_RETRY_MINUTES),
+                    id=f'{name}_retry',
+                    replace_existing=True
+                )
+        return run
+    
     def update_statuses():
-        with app.app_context():
-            count = update_all_statuses()
-            print(f"[Scheduler] Updated {count} requirement statuses")
+        with job_profiling(app, 'update_statuses') as profiled:
+            counts = run_on_shards(app, profiled(update_all_statuses))
+            print(f"[Scheduler] Updated {sum(counts.values())} requirement statuses")
+            
+            counts = run_on_shards(app, profiled(record_status_snapshots))
+            print(f"[Scheduler] Recorded compliance snapshots for {sum(counts.values())} organizations")
+            
+            # A new day can change any page, so every organization's cached pages expire
+            with app.app_context():
+                bump_data_version()
+                db.session.commit()
     
     def send_reminders():
+        with job_profiling(app, 'send_reminders') as profiled:
+            counts = run_on_shards(app, profiled(lambda: check_and_send_reminders(app, mail)))
+            print(f"[Scheduler] Sent {sum(counts.values())} reminder emails")
+    
+    def compact_reminders():
+        counts = run_on_shards(app, lambda: compact_reminder_logs(
+            retention_days=app.config['REMINDER_LOG_RETENTION_DAYS'],
+            batch_size=app.config['REMINDER_COMPACT_BATCH_SIZE']
+        ))
+        print(f"[Scheduler] Compacted {sum(counts.values())} reminder logs")
+    
+    def sweep_uploads():
+        with app.app_context():
+            results = sweep_orphan_files(
+                app.config['UPLOAD_FOLDER'],
+                batch_size=app.config['FILE_SWEEP_BATCH_SIZE'],
+                grace_minutes=app.config['FILE_SWEEP_GRACE_MINUTES']
+            )
+            print(f"[Scheduler] Removed {results['orphans_removed']} orphaned files, "
+                  f"{results['missing_files']} documents missing files")
+    
+    def reconcile_stripe():
+        if not stripe_secret:
+            print("[Scheduler] Skipping Stripe reconciliation: STRIPE_SECRET_KEY not set")
+            return
         with app.app_context():
-            count = check_and_send_reminders(app, mail)
-            print(f"[Scheduler] Sent {count} reminder emails")
+            try:
+                report = reconcile_subscriptions()
+                print(f"[Scheduler] Stripe reconciliation: {report}")
+            except Exception as e:
+                print(f"[Scheduler] Stripe reconciliation failed: {str(e)}")
     
     # Update statuses daily at midnight
     scheduler.add_job(
-        func=update_statuses, 
+        func=retry_after_move('update_statuses', update_statuses), 
         trigger="cron", 
         hour=0, 
         minute=0,
         id='update_statuses'
     )
     
+    # Catch up once at startup; read views no longer refresh statuses themselves
+    scheduler.add_job(
+        func=retry_after_move('update_statuses', update_statuses),
+        id='update_statuses_startup'
+    )
+    
     # Send reminders daily at 9 AM
     scheduler.add_job(
-        func=send_reminders, 
+        func=retry_after_move('send_reminders', send_reminders), 
         trigger="cron", 
         hour=9, 
         minute=0,
         id='send_reminders'
     )
     
+    # Reconcile subscriptions against Stripe daily at 2 AM
+    scheduler.add_job(
+        func=reconcile_stripe, 
+        trigger="cron", 
+        hour=2, 
+        minute=0,
+        id='reconcile_stripe'
+    )
+    
+    # Reconcile the upload folder daily at 3 AM
+    scheduler.add_job(
+        func=retry_after_move('sweep_uploads', sweep_uploads), 
+        trigger="cron", 
+        hour=3, 
+        minute=0,
+        id='sweep_uploads'
+    )
+    
+    # Compact old reminder logs daily at 4 AM
+    scheduler.add_job(
+        func=retry_after_move('compact_reminders', compact_reminders), 
+        trigger="cron", 
+        hour=4, 
+        minute=0,
+        id='compact_reminders'
+    )
+    
     scheduler.start()
     print("[Scheduler] Background tasks started")
     
-    return scheduler
\ No newline at end of file
+    return scheduler
+
+@click.command('run-scheduler')
+@with_appcontext
+def run_scheduler_command():
+    """
+    Run the background scheduler in the foreground. Run exactly one of these per deployment.
+    """
+    scheduler = start_scheduler(current_app._get_current_object(), current_app.extensions['mail'])
+    try:
+        while True:
+            time.sleep(60)
+    except (KeyboardInterrupt, SystemExit):
+        scheduler.shutdown()
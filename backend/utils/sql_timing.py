@@ -0,0 +1,169 @@
+from flask import current_app, request
+from contextvars import ContextVar
+from sqlalchemy.engine import Engine
+from sqlalchemy import event
+import logging
+import json
+import time
+import sys
+import re
+import os
+
+# Structured slow-request records, one JSON object per line
+slow_request_log = logging.getLogger('clearcomply.slow_requests')
+
+# Statements of the current request; None outside requests (scheduler, CLI)
+_request_stats = ContextVar('request_sql_stats', default=None)
+
+# Frames from these locations are skipped when looking for the code that ran a statement
+_LIBRARY_MARKERS = ('site-packages', 'dist-packages', f'{os.sep}lib{os.sep}python')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMETERS = re.compile(r'%\(\w+\)s|%s|\$\d+')
+_PLACEHOLDER_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+class RequestSQLStats:
+    """
+    Statement count and database time of one request, with totals per distinct statement
+    """
+    __slots__ = ('started_at', 'count', 'duration', 'statements')
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        # statement -> [count, total seconds, slowest seconds, first call site]
+        self.statements = {}
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+
+        entry = self.statements.get(statement)
+        if entry is None:
+            # Walk the stack once per distinct statement, not once per execution
+            self.statements[statement] = [1, duration, duration, _call_site()]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            if duration > entry[2]:
+                entry[2] = duration
+
+    def top(self, limit):
+        """
+        The distinct statements that took the most total time, normalized
+        """
+        # IN lists of different lengths are different statements with the same shape
+        shapes = {}
+        for statement, (count, total, slowest, call_site) in self.statements.items():
+            shape = shapes.setdefault(normalize_sql(statement), [0, 0.0, 0.0, call_site])
+            shape[0] += count
+            shape[1] += total
+            shape[2] = max(shape[2], slowest)
+
+        ranked = sorted(shapes.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [{
+            'sql': sql,
+            'count': count,
+            'total_ms': round(total * 1000, 2),
+            'max_ms': round(slowest * 1000, 2),
+            'call_site': call_site,
+        } for sql, (count, total, slowest, call_site) in ranked]
+
+def normalize_sql(statement):
+    """
+    Collapse a statement to its shape: literals become ? and IN lists a single (?...)
+    """
+    statement = _PARAMETERS.sub('?', statement)
+    statement = _LITERALS.sub('?', statement)
+    statement = _PLACEHOLDER_LISTS.sub('(?...)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+def _call_site():
+    """
+    file:line of the innermost application frame (view, helper or template)
+    that led to the current statement
+    """
+    frame = sys._getframe(3)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename != __file__
+            and not filename.startswith('<')
+            and not any(marker in filename for marker in _LIBRARY_MARKERS)
+        ):
+            return f'{os.path.relpath(filename, current_app.root_path)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_stats.get() is not None:
+        context._sql_timing_started_at = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    started_at = getattr(context, '_sql_timing_started_at', None)
+    if stats is not None and started_at is not None:
+        stats.record(statement, time.perf_counter() - started_at)
+
+def start_request_timing():
+    """
+    before_request hook: start collecting the request's statements
+    """
+    if current_app.config.get('SQL_TIMING_ENABLED', True):
+        _request_stats.set(RequestSQLStats())
+
+def finish_request_timing(response):
+    """
+    after_request hook: report database time in a Server-Timing header and
+    log requests slower than SLOW_REQUEST_MS with their costliest statements
+    """
+    stats = _request_stats.get()
+    if stats is None:
+        return response
+    _request_stats.set(None)
+
+    elapsed = time.perf_counter() - stats.started_at
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", app;dur={elapsed * 1000:.1f}'
+    )
+
+    threshold = current_app.config.get('SLOW_REQUEST_MS', 0)
+    if threshold > 0 and elapsed * 1000 >= threshold:
+        slow_request_log.warning(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 1),
+            'db_ms': round(stats.duration * 1000, 1),
+            'statements': stats.count,
+            'distinct_statements': len(stats.statements),
+            'top_statements': stats.top(current_app.config.get('SLOW_REQUEST_TOP_STATEMENTS', 5)),
+        }))
+
+    return response
+
+def discard_request_timing(error=None):
+    """
+    teardown hook: drop the collector of a request that ended without a response
+    """
+    _request_stats.set(None)
+
+def init_sql_timing(app):
+    """
+    Time every statement run while handling a request and report it per request
+    """
+    if not slow_request_log.handlers and app.config.get('SLOW_REQUEST_LOG'):
+        handler = logging.FileHandler(app.config['SLOW_REQUEST_LOG'])
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_request_log.addHandler(handler)
+        slow_request_log.propagate = False
+
+    app.before_request(start_request_timing)
+    app.after_request(finish_request_timing)
+    app.teardown_request(discard_request_timing)
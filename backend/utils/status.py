@@ -1,6 +1,12 @@
-from backend.models.compliance import ComplianceRequirement
+from backend.models.compliance import ComplianceRequirement, ComplianceDocument
 from backend.database.database import db
+from backend.database.sharding import data_shards, shard_scope
+from flask.cli import with_appcontext
 from datetime import datetime, timedelta
+import click
+
+# Requirements per UPDATE when backfilling document stats
+DOCUMENT_STATS_BATCH_SIZE = 5000
 
 def update_requirement_status(requirement):
     """
@@ -13,7 +19,7 @@ def update_requirement_status(requirement):
     
     # If expired
     if requirement.expiration_date < today:
-        if requirement.documents:
+        if requirement.document_count:
             # Has documents but expired - needs renewal
             requirement.status = 'expired'
         else:
@@ -22,7 +28,7 @@ def update_requirement_status(requirement):
     
     # If expiring soon (within 30 days)
     elif requirement.expiration_date <= thirty_days_from_now:
-        if requirement.documents:
+        if requirement.document_count:
             # Has documents but expiring soon
             requirement.status = 'expiring_soon'
         else:
@@ -31,7 +37,7 @@ def update_requirement_status(requirement):
     
     # Future expiration
     else:
-        if requirement.documents:
+        if requirement.document_count:
             # Has documents and not expiring soon
             requirement.status = 'compliant'
         else:
@@ -42,28 +48,113 @@ def update_requirement_status(requirement):
 
 def update_all_statuses(organization_id=None):
     """
-    Update statuses for all requirements, optionally filtered by organization
+    Update statuses for all requirements, optionally filtered by organization.
+    Runs as a single set-based UPDATE and returns the number of rows changed.
     """
+    today = datetime.now().date()
+    thirty_days_from_now = today + timedelta(days=30)
+    
+    # Same rules as update_requirement_status
+    new_status = db.case(
+        (ComplianceRequirement.expiration_date < today, 'expired'),
+        (ComplianceRequirement.expiration_date <= thirty_days_from_now, 'expiring_soon'),
+        (ComplianceRequirement.document_count > 0, 'compliant'),
+        else_='missing'
+    )
+    
+    query = ComplianceRequirement.query
     if organization_id:
-        requirements = ComplianceRequirement.query.filter_by(
-            organization_id=organization_id
-        ).all()
-    else:
-        requirements = ComplianceRequirement.query.all()
+        query = query.filter_by(organization_id=organization_id)
     
-    for req in requirements:
-        update_requirement_status(req)
+    count = query.filter(
+        db.or_(ComplianceRequirement.status.is_(None), ComplianceRequirement.status != new_status)
+    ).update({ComplianceRequirement.status: new_status}, synchronize_session='fetch')
     
     db.session.commit()
     
-    return len(requirements)
+    return count
+
+def refresh_document_stats(requirement):
+    """
+    Recompute a requirement's denormalized document count and latest upload date
+    """
+    count, latest_uploaded_at = db.session.query(
+        db.func.count(ComplianceDocument.id),
+        db.func.max(ComplianceDocument.uploaded_at)
+    ).filter(ComplianceDocument.requirement_id == requirement.id).one()
+    
+    requirement.document_count = count
+    requirement.latest_document_uploaded_at = latest_uploaded_at
+    
+    return requirement
+
+def add_document_stats_columns(engine):
+    """
+    Add document_count and latest_document_uploaded_at to a compliance_requirement
+    table created before they existed; db.create_all does not alter existing tables.
+    Returns the names of the columns added.
+    """
+    table = ComplianceRequirement.__table__
+    existing = {column['name'] for column in db.inspect(engine).get_columns(table.name)}
+
+    added = []
+    with engine.begin() as connection:
+        for name, constraint in [('document_count', ' NOT NULL DEFAULT 0'), ('latest_document_uploaded_at', '')]:
+            if name in existing:
+                continue
+            column_type = table.c[name].type.compile(dialect=engine.dialect)
+            connection.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {name} {column_type}{constraint}'))
+            added.append(name)
+    return added
+
+def backfill_document_stats(batch_size=DOCUMENT_STATS_BATCH_SIZE):
+    """
+    Recompute every requirement's document count and latest upload date from
+    compliance_document in the current scope, a range of ids per transaction.
+    Returns the number of requirements updated.
+    """
+    def per_requirement(aggregate):
+        # Correlated on requirement_id, so each row is an index lookup
+        return db.select(aggregate).where(
+            ComplianceDocument.requirement_id == ComplianceRequirement.id
+        ).scalar_subquery()
+
+    last_id = db.session.query(db.func.max(ComplianceRequirement.id)).scalar() or 0
+    updated = 0
+    for start in range(0, last_id, batch_size):
+        updated += db.session.execute(
+            db.update(ComplianceRequirement).where(
+                ComplianceRequirement.id > start,
+                ComplianceRequirement.id <= start + batch_size
+            ).values(
+                document_count=per_requirement(db.func.count(ComplianceDocument.id)),
+                latest_document_uploaded_at=per_requirement(db.func.max(ComplianceDocument.uploaded_at))
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+
+    return updated
+
+@click.command('backfill-document-stats')
+@with_appcontext
+def backfill_document_stats_command():
+    """
+    Add the requirement document stats columns where missing and fill them from
+    uploaded documents, on the primary and every shard. Run once when upgrading
+    a database from before they existed, before the scheduler's next status update.
+    """
+    for key in data_shards():
+        engine = db.engines[key] if key else db.engine
+        added = add_document_stats_columns(engine)
+        with shard_scope(key):
+            updated = backfill_document_stats()
+        print(f"[Status] {key or 'primary'}: added columns {added or 'none'}, "
+              f"refreshed document stats of {updated} requirements")
 
 def get_status_counts(organization_id):
     """
     Get count of requirements by status for an organization
     """
-    update_all_statuses(organization_id)
-    
     requirements = ComplianceRequirement.query.filter_by(
         organization_id=organization_id
     ).all()
@@ -94,8 +185,6 @@ def get_expiring_soon_requirements(organization_id, days=30):
     """
     Get requirements expiring within specified days
     """
-    update_all_statuses(organization_id)
-    
     cutoff_date = datetime.now().date() + timedelta(days=days)
     
     return ComplianceRequirement.query.filter(
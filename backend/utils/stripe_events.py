@@ -0,0 +1,188 @@
+from backend.models.finance import StripeEvent
+from backend.routes.stripe import handle_checkout_completed, handle_subscription_updated, handle_subscription_deleted
+from backend.database.database import db
+from sqlalchemy.exc import IntegrityError
+from flask import current_app, url_for
+from flask.cli import with_appcontext
+from datetime import datetime, timedelta
+import threading
+import hashlib
+import stripe
+import click
+import hmac
+import json
+import time
+import os
+
+# Event types we act on, and the handler that applies each one
+EVENT_HANDLERS = {
+    'checkout.session.completed': handle_checkout_completed,
+    'customer.subscription.created': handle_subscription_updated,
+    'customer.subscription.updated': handle_subscription_updated,
+    'customer.subscription.deleted': handle_subscription_deleted,
+}
+
+# Give up on an event after this many failed attempts
+MAX_ATTEMPTS = 5
+
+# A claim older than this is assumed to belong to a worker that died
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+_wakeup = threading.Event()
+_worker_lock = threading.Lock()
+_worker = None
+
+def store_stripe_event(event, payload):
+    """
+    Persist a verified webhook event keyed by its Stripe event id.
+    Returns False if the event was already stored (a Stripe retry).
+    """
+    record = StripeEvent(
+        id=event['id'],
+        type=event['type'],
+        payload=payload,
+        created=event['created']
+    )
+    db.session.add(record)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+def apply_stripe_event(record):
+    """
+    Apply one stored event using the data in its payload. Handlers skip an
+    event older than the newest one already applied to its subscription.
+    """
+    handler = EVENT_HANDLERS.get(record.type)
+    if not handler:
+        return
+
+    event = stripe.Event.construct_from(json.loads(record.payload), stripe.api_key)
+    handler(event['data']['object'], event_created=record.created)
+
+def process_pending_events(batch_size=100):
+    """
+    Apply unprocessed events oldest first, skipping any already processed.
+    Each event is claimed with a conditional update before it is applied,
+    so two workers never apply the same event. Events may still be applied
+    out of order (a failed event is retried after newer ones, and every
+    process runs a worker); the handlers ignore an event older than the
+    last one applied to its subscription. Returns the number applied.
+    """
+    processed = 0
+    now = datetime.utcnow()
+
+    unclaimed = db.or_(StripeEvent.claimed_at.is_(None), StripeEvent.claimed_at < now - CLAIM_TIMEOUT)
+
+    pending = StripeEvent.query.filter(
+        StripeEvent.processed_at.is_(None),
+        StripeEvent.attempts < MAX_ATTEMPTS,
+        unclaimed
+    ).order_by(StripeEvent.created, StripeEvent.received_at).limit(batch_size).all()
+
+    for record in pending:
+        claimed = StripeEvent.query.filter(
+            StripeEvent.id == record.id,
+            StripeEvent.processed_at.is_(None),
+            StripeEvent.attempts == record.attempts,
+            unclaimed
+        ).update({
+            StripeEvent.attempts: record.attempts + 1,
+            StripeEvent.claimed_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if not claimed:
+            continue
+
+        try:
+            apply_stripe_event(record)
+            record.processed_at = datetime.utcnow()
+            record.last_error = None
+            db.session.commit()
+            processed += 1
+        except Exception as e:
+            db.session.rollback()
+            # Release the claim so the event is retried on a later pass
+            record.claimed_at = None
+            record.last_error = str(e)
+            db.session.commit()
+            print(f"[Stripe] Failed to apply event {record.id} ({record.type}): {str(e)}")
+
+    return processed
+
+def notify_event_worker():
+    """
+    Wake the worker so a newly stored event is applied right away
+    """
+    _wakeup.set()
+
+def start_event_worker(app, poll_seconds=30, batch_size=100):
+    """
+    Start the background thread that applies stored webhook events.
+    It runs when woken by the webhook and every poll_seconds to pick up retries.
+    """
+    global _worker
+
+    def run():
+        while True:
+            _wakeup.wait(timeout=poll_seconds)
+            _wakeup.clear()
+            with app.app_context():
+                try:
+                    # A full batch means more may be waiting
+                    if process_pending_events(batch_size) >= batch_size:
+                        _wakeup.set()
+                except Exception as e:
+                    print(f"[Stripe] Event worker error: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=run, name='stripe-events', daemon=True)
+            _worker.start()
+            # Apply anything left over from before a restart
+            _wakeup.set()
+
+    return _worker
+
+def sign_payload(payload, secret, timestamp=None):
+    """
+    Build a Stripe-Signature header for a payload, as Stripe would
+    """
+    timestamp = timestamp or int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+@click.command('replay-stripe-events')
+@click.argument('fixture_dir', type=click.Path(exists=True, file_okay=False))
+@with_appcontext
+def replay_stripe_events_command(fixture_dir):
+    """
+    Sign and post recorded Stripe events from FIXTURE_DIR to the webhook, then apply them.
+    Point STRIPE_API_BASE at stripe-mock to keep any API calls local.
+    """
+    secret = os.environ.get('STRIPE_WEBHOOK_SECRET', '').strip('"').strip("'")
+    client = current_app.test_client()
+
+    with current_app.test_request_context():
+        webhook_url = url_for('billing.webhook')
+
+    for filename in sorted(os.listdir(fixture_dir)):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(fixture_dir, filename)) as fixture:
+            payload = fixture.read()
+        response = client.post(
+            webhook_url,
+            data=payload,
+            content_type='application/json',
+            headers={'Stripe-Signature': sign_payload(payload, secret)}
+        )
+        click.echo(f"{filename}: {response.status_code}")
+
+    click.echo(f"Applied {process_pending_events()} events")
@@ -0,0 +1,151 @@
+from backend.models.finance import Subscription
+from backend.routes.stripe import get_stripe_client, get_period_end
+from backend.database.database import db
+from backend.utils.identity import invalidate_organization_identities
+from backend.utils.page_cache import bump_data_version
+from datetime import datetime
+import json
+
+# Stripe's maximum page size for list calls
+STRIPE_PAGE_SIZE = 100
+
+# Rows per bulk UPDATE executemany
+UPDATE_BATCH_SIZE = 1000
+
+# When a customer has several subscriptions, the one in the best state wins
+STATUS_RANK = {
+    'active': 0,
+    'trialing': 1,
+    'past_due': 2,
+    'unpaid': 3,
+    'paused': 4,
+    'incomplete': 5,
+    'canceled': 6,
+    'incomplete_expired': 7,
+}
+
+def fetch_stripe_subscriptions():
+    """
+    Walk every Stripe subscription page by page in maximum-size pages,
+    keeping the best subscription per customer. Pages are read as plain
+    JSON dicts; building SDK objects for each one dominates the run time.
+    """
+    client = get_stripe_client()
+    by_customer = {}
+    params = {'status': 'all', 'limit': STRIPE_PAGE_SIZE}
+
+    while True:
+        page = json.loads(client.raw_request('get', '/v1/subscriptions', **params).body)
+
+        for remote in page['data']:
+            rank = (STATUS_RANK.get(remote['status'], len(STATUS_RANK)), -(remote.get('created') or 0))
+            current = by_customer.get(remote['customer'])
+            if current is None or rank < current[0]:
+                by_customer[remote['customer']] = (rank, remote)
+
+        if not page.get('has_more') or not page['data']:
+            break
+        params['starting_after'] = page['data'][-1]['id']
+
+    return {customer_id: entry[1] for customer_id, entry in by_customer.items()}
+
+def reconcile_subscriptions(remote_by_customer=None, fetched_at=None):
+    """
+    Diff Stripe subscriptions against local rows in memory and apply
+    corrections with bulk updates. Rows changed since the fetch began
+    (fetched_at; a webhook applied during the walk) are newer than the
+    fetched state and left alone. Returns drift counts.
+    """
+    if fetched_at is None:
+        fetched_at = datetime.utcnow()
+    if remote_by_customer is None:
+        remote_by_customer = fetch_stripe_subscriptions()
+
+    report = {
+        'remote': len(remote_by_customer),
+        'local': 0,
+        'drifted': 0,
+        'status': 0,
+        'current_period_end': 0,
+        'cancel_at_period_end': 0,
+        'stripe_subscription_id': 0,
+        'unmatched_remote': 0,
+        'missing_remote': 0,
+        'changed_during_fetch': 0,
+    }
+
+    local_rows = db.session.query(
+        Subscription.id,
+        Subscription.organization_id,
+        Subscription.stripe_customer_id,
+        Subscription.stripe_subscription_id,
+        Subscription.status,
+        Subscription.current_period_end,
+        Subscription.cancel_at_period_end,
+        Subscription.updated_at
+    ).filter(db.or_(
+        Subscription.stripe_customer_id.isnot(None),
+        Subscription.stripe_subscription_id.isnot(None)
+    )).all()
+
+    report['local'] = len(local_rows)
+    by_subscription_id = {}
+    for remote in remote_by_customer.values():
+        by_subscription_id[remote['id']] = remote
+
+    updates = []
+    changed_organizations = []
+    matched = set()
+
+    for row in local_rows:
+        remote = remote_by_customer.get(row.stripe_customer_id) or by_subscription_id.get(row.stripe_subscription_id)
+        if remote is None:
+            report['missing_remote'] += 1
+            continue
+        matched.add(remote['id'])
+
+        if row.updated_at and row.updated_at > fetched_at:
+            report['changed_during_fetch'] += 1
+            continue
+
+        expected = {
+            'status': remote['status'],
+            'current_period_end': get_period_end(remote) or row.current_period_end,
+            'cancel_at_period_end': bool(remote.get('cancel_at_period_end')),
+            'stripe_subscription_id': remote['id'],
+        }
+
+        changes = [field for field, value in expected.items() if getattr(row, field) != value]
+        if not changes:
+            continue
+
+        for field in changes:
+            report[field] += 1
+        report['drifted'] += 1
+
+        # Every field is written so all rows share one statement
+        updates.append({'row_id': row.id, 'updated_at': datetime.utcnow(), **expected})
+        changed_organizations.append(row.organization_id)
+
+    report['unmatched_remote'] = len(remote_by_customer) - len(matched)
+
+    # A webhook applied after the rows were read also wins
+    table = Subscription.__table__
+    statement = table.update().where(
+        table.c.id == db.bindparam('row_id'),
+        db.or_(table.c.updated_at.is_(None), table.c.updated_at <= fetched_at)
+    )
+
+    try:
+        for start in range(0, len(updates), UPDATE_BATCH_SIZE):
+            db.session.execute(statement, updates[start:start + UPDATE_BATCH_SIZE])
+        bump_data_version(changed_organizations)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Core updates skip the ORM hooks that drop cached copies of these subscriptions
+    invalidate_organization_identities(changed_organizations)
+
+    return report
@@ -0,0 +1,27 @@
+"""
+Platform-wide operator analytics: bulk columnar reads plus vectorized
+aggregation, against the per-organization helper it replaces.
+"""
+from backend.models.auth import Organization
+from backend.database.database import db
+from backend.utils.status import get_status_counts
+from backend.utils.analytics import load_frames, compute_analytics
+from datetime import datetime
+
+def bench_operator_analytics(benchmark, app_context):
+    app, mail = app_context
+
+    def run():
+        return compute_analytics(*load_frames(app), datetime.utcnow(), datetime.now().date())
+
+    analytics = benchmark(run)
+    assert analytics['totals']['total'] > 0
+
+def bench_status_counts_per_organization(benchmark, app_context):
+    organization_ids = db.session.scalars(db.select(Organization.id)).all()
+
+    def run():
+        return [get_status_counts(organization_id) for organization_id in organization_ids]
+
+    counts = benchmark.pedantic(run, rounds=3)
+    assert len(counts) == len(organization_ids)
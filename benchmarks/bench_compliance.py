@@ -0,0 +1,74 @@
+"""
+Scaling of the status, renewal, reminder and export paths over synthetic tenants.
+See pytest.ini in this directory for how to run and compare.
+"""
+from backend.database.database import db
+from backend.models.auth import Organization
+from backend.models.compliance import ComplianceRequirement
+from backend.models.reminders import ReminderLog
+from backend.utils.status import update_all_statuses, get_status_counts
+from backend.utils.renewal import renew_all_due
+from backend.utils.email_reminder import check_and_send_reminders
+from backend.utils.export import generate_compliance_pdf, generate_compliance_csv
+from sqlalchemy.orm import selectinload
+
+# Organization every per-tenant benchmark reads
+ORGANIZATION_ID = 1
+
+def _organization_requirements():
+    organization = db.session.get(Organization, ORGANIZATION_ID)
+    requirements = ComplianceRequirement.query.filter_by(
+        organization_id=ORGANIZATION_ID
+    ).options(selectinload(ComplianceRequirement.documents)).order_by(
+        ComplianceRequirement.expiration_date
+    ).all()
+    return organization, requirements
+
+def bench_update_all_statuses(benchmark, app_context):
+    def reset():
+        # Every row needs a new status, the nightly worst case
+        db.session.query(ComplianceRequirement).update({ComplianceRequirement.status: None})
+        db.session.commit()
+
+    benchmark.pedantic(update_all_statuses, setup=reset, rounds=5)
+
+def bench_get_status_counts(benchmark, app_context):
+    counts = benchmark(get_status_counts, ORGANIZATION_ID)
+    assert counts['total'] > 0
+
+def bench_renew_all_due(benchmark, app_context):
+    table = ComplianceRequirement.__table__
+    original = db.session.execute(
+        db.select(table.c.id, table.c.expiration_date, table.c.status).where(table.c.organization_id == ORGANIZATION_ID)
+    ).mappings().all()
+
+    def reset():
+        # Put the renewed rows back so each round renews the same set
+        db.session.execute(db.update(ComplianceRequirement), [dict(row) for row in original])
+        db.session.commit()
+
+    renewed, skipped, awaiting = benchmark.pedantic(renew_all_due, args=(ORGANIZATION_ID,), setup=reset, rounds=5)
+    assert renewed > 0
+    reset()
+
+def bench_check_and_send_reminders(benchmark, app_context):
+    app, mail = app_context
+    last_log_id = db.session.query(db.func.max(ReminderLog.id)).scalar() or 0
+
+    def reset():
+        # Forget reminders sent by the previous round so each round sends the same batch
+        ReminderLog.query.filter(ReminderLog.id > last_log_id).delete(synchronize_session=False)
+        db.session.commit()
+
+    benchmark.pedantic(check_and_send_reminders, args=(app, mail), setup=reset, rounds=5)
+    reset()
+
+def bench_generate_compliance_pdf(benchmark, app_context):
+    organization, requirements = _organization_requirements()
+    output = benchmark(generate_compliance_pdf, organization, requirements)
+    assert output.getbuffer().nbytes > 0
+
+def bench_generate_compliance_csv(benchmark, app_context):
+    organization, requirements = _organization_requirements()
+    output = benchmark(generate_compliance_csv, organization, requirements)
+    assert output.getvalue()
@@ -0,0 +1,59 @@
+from benchmarks.synthetic_data import SIZES, make_app, generate
+from pytest_benchmark.utils import parse_compare_fail
+import pytest
+import os
+
+# Sizes run when --bench-sizes isn't given
+DEFAULT_SIZES = 'small,medium'
+
+# Slowdown of a median against the compared baseline that fails the run
+REGRESSION_THRESHOLD = 'median:15%'
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--bench-sizes',
+        default=DEFAULT_SIZES,
+        help=f"Comma separated dataset sizes from {', '.join(SIZES)} (default: {DEFAULT_SIZES})"
+    )
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Keep baselines next to the suite wherever pytest is run from
+    if config.getoption('benchmark_storage') == 'file://./.benchmarks':
+        config.option.benchmark_storage = f'file://{BASELINE_DIR}'
+
+    if config.getoption('benchmark_compare') and not config.getoption('benchmark_compare_fail'):
+        config.option.benchmark_compare_fail = [parse_compare_fail(REGRESSION_THRESHOLD)]
+
+def pytest_generate_tests(metafunc):
+    if 'dataset' in metafunc.fixturenames:
+        sizes = [size.strip() for size in metafunc.config.getoption('bench_sizes').split(',') if size.strip()]
+        unknown = set(sizes) - set(SIZES)
+        if unknown:
+            raise pytest.UsageError(f"Unknown --bench-sizes: {', '.join(sorted(unknown))}")
+        metafunc.parametrize('dataset', sizes, indirect=True, scope='session')
+
+@pytest.fixture(scope='session')
+def dataset(request, tmp_path_factory):
+    """
+    (app, mail) over a freshly generated database of the requested size
+    """
+    size = request.param
+    database_path = tmp_path_factory.mktemp(f'bench_{size}') / 'bench.db'
+    app, mail = make_app(f'sqlite:///{database_path}')
+
+    with app.app_context():
+        generate(*SIZES[size])
+
+    return app, mail
+
+@pytest.fixture
+def app_context(dataset):
+    """
+    Run a benchmark inside the dataset app's context
+    """
+    app, mail = dataset
+    with app.app_context():
+        yield app, mail
@@ -0,0 +1,355 @@
+"""
+End-to-end load test of one box.
+
+Seeds a synthetic database, boots the app under gunicorn with several
+workers, points mail at a local SMTP sink and Stripe at the local mock,
+then drives scripted user journeys (login, dashboard, requirements list,
+requirement detail, upload, download, exports) from concurrent virtual
+users. Signed Stripe webhooks arrive at a steady rate and the scheduler's
+status, reminder and reconciliation jobs run on an interval throughout.
+Reports throughput, p50/p95/p99 latency and error rate per endpoint.
+
+Usage:
+    python -m benchmarks.load_test [--users 20] [--duration 60] [--workers 4] [--threads 4]
+        [--size small] [--export-share 0.2] [--webhook-rate 2] [--job-interval 20] [--json report.json] [--keep]
+"""
+from benchmarks.synthetic_data import SIZES, make_app, generate
+from benchmarks import stripe_mock, smtp_sink
+from werkzeug.security import generate_password_hash
+from collections import defaultdict
+import multiprocessing
+import subprocess
+import threading
+import argparse
+import tempfile
+import requests
+import numpy as np
+import random
+import hashlib
+import shutil
+import hmac
+import json
+import time
+import sys
+import os
+import re
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Every seeded owner (owner<N>@example.com) logs in with this password
+PASSWORD = 'LoadTest-Password-1'
+
+WEBHOOK_SECRET = 'whsec_load_test'
+
+# Seconds to wait for gunicorn to answer before giving up
+SERVER_START_TIMEOUT = 60
+
+DOCUMENT_LINK = re.compile(r'/compliance/document/(\d+)/download')
+
+def prepare_database(database_path, size):
+    """
+    Seed the database, give every owner a real password hash and an active
+    Stripe subscription (cus_<N-1>/sub_<N-1>, matching the Stripe mock)
+    """
+    from backend.database.database import db
+    from backend.models.auth import User
+    from backend.models.finance import Subscription
+
+    app, mail = make_app(f'sqlite:///{database_path}')
+    with app.app_context():
+        generate(*SIZES[size])
+
+        # One hash shared by every account; the method is the app's default so logins cost what they do in production
+        password_hash = generate_password_hash(PASSWORD, method=os.environ.get('PASSWORD_HASH_METHOD', 'scrypt'))
+        db.session.execute(db.update(User).values(password_hash=password_hash))
+
+        organization_count = SIZES[size][0]
+        db.session.execute(Subscription.__table__.insert(), [{
+            'organization_id': organization_id,
+            'stripe_customer_id': f'cus_{organization_id - 1}',
+            'stripe_subscription_id': f'sub_{organization_id - 1}',
+            'status': 'active',
+            'cancel_at_period_end': False,
+        } for organization_id in range(1, organization_count + 1)])
+        db.session.commit()
+
+def start_server(env, workers, threads):
+    """
+    Boot gunicorn with the production config on a free port. Returns (process, base_url).
+    """
+    port = stripe_mock.free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn',
+            '--config', os.path.join(REPO_ROOT, 'gunicorn.conf.py'),
+            '--workers', str(workers),
+            '--threads', str(threads),
+            '--bind', f'127.0.0.1:{port}',
+            '--log-level', 'warning',
+            'wsgi:app'
+        ],
+        cwd=REPO_ROOT,
+        env=env
+    )
+    base_url = f'http://127.0.0.1:{port}'
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {process.returncode}')
+        try:
+            requests.get(f'{base_url}/', timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError('gunicorn did not start in time')
+
+def run_jobs(env, database_path, interval, stop):
+    """
+    Run the scheduler's status, reminder and reconciliation jobs every
+    interval seconds against the same database until stop is set
+    """
+    os.environ.update(env)
+
+    from backend.utils.status import update_all_statuses
+    from backend.utils.email_reminder import check_and_send_reminders
+    from backend.utils.stripe_reconcile import reconcile_subscriptions
+
+    app, mail = make_app(
+        f'sqlite:///{database_path}',
+        MAIL_SUPPRESS_SEND=False,
+        MAIL_SERVER=env['MAIL_SERVER'],
+        MAIL_PORT=int(env['MAIL_PORT']),
+        MAIL_USE_TLS=False
+    )
+
+    while not stop.wait(interval):
+        with app.app_context():
+            update_all_statuses()
+            reconcile_subscriptions()
+        check_and_send_reminders(app, mail)
+
+class Recorder:
+    """
+    Thread-safe latency samples and failures (by status code) per endpoint
+    """
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.failures = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+
+    def timed(self, name, session, method, url, expect=(200,), **kwargs):
+        started_at = time.perf_counter()
+        try:
+            response = session.request(method, url, allow_redirects=False, timeout=60, **kwargs)
+            body = response.content
+            failure = None if response.status_code in expect else str(response.status_code)
+        except requests.RequestException as e:
+            response, body, failure = None, b'', type(e).__name__
+        elapsed = time.perf_counter() - started_at
+
+        with self.lock:
+            self.samples[name].append(elapsed)
+            if failure:
+                self.failures[name][failure] += 1
+
+        return response, body
+
+    def report(self, duration):
+        rows = []
+        for name in sorted(self.samples):
+            latencies = np.array(self.samples[name]) * 1000
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            failures = dict(self.failures[name])
+            rows.append({
+                'endpoint': name,
+                'requests': len(latencies),
+                'rps': round(len(latencies) / duration, 2),
+                'p50_ms': round(float(p50), 1),
+                'p95_ms': round(float(p95), 1),
+                'p99_ms': round(float(p99), 1),
+                'error_rate': round(sum(failures.values()) / len(latencies), 4),
+                'failures': failures,
+            })
+        return rows
+
+def user_journeys(recorder, base_url, organization, requirements_per_org, export_share, deadline, seed):
+    """
+    One virtual user repeating a visit as owner of an organization until the deadline
+    """
+    rng = random.Random(seed)
+    first_requirement = (organization - 1) * requirements_per_org + 1
+
+    while time.monotonic() < deadline:
+        session = requests.Session()
+        requirement_id = rng.randrange(first_requirement, first_requirement + requirements_per_org)
+
+        response, _ = recorder.timed(
+            'POST /auth/login', session, 'POST', f'{base_url}/auth/login',
+            expect=(302,), data={'email': f'owner{organization}@example.com', 'password': PASSWORD}
+        )
+        if response is None or response.status_code != 302:
+            continue
+
+        recorder.timed('GET /dashboard/', session, 'GET', f'{base_url}/dashboard/')
+        recorder.timed('GET /compliance/', session, 'GET', f'{base_url}/compliance/')
+        recorder.timed('GET /compliance/?status=expiring_soon', session, 'GET', f'{base_url}/compliance/?status=expiring_soon')
+        recorder.timed('GET /compliance/<id>', session, 'GET', f'{base_url}/compliance/{requirement_id}')
+
+        recorder.timed(
+            'POST /compliance/<id>/upload', session, 'POST', f'{base_url}/compliance/{requirement_id}/upload',
+            expect=(302,), data={'description': 'Load test upload'},
+            files={'file': ('evidence.txt', os.urandom(16 * 1024).hex().encode(), 'text/plain')}
+        )
+
+        _, body = recorder.timed('GET /compliance/<id>', session, 'GET', f'{base_url}/compliance/{requirement_id}')
+        document_ids = [int(match) for match in DOCUMENT_LINK.findall(body.decode('utf-8', 'replace'))]
+        if document_ids:
+            recorder.timed(
+                'GET /compliance/document/<id>/download', session, 'GET',
+                f'{base_url}/compliance/document/{max(document_ids)}/download'
+            )
+
+        if rng.random() < export_share:
+            recorder.timed('GET /compliance/export/csv', session, 'GET', f'{base_url}/compliance/export/csv')
+            recorder.timed('GET /compliance/export/pdf', session, 'GET', f'{base_url}/compliance/export/pdf')
+
+        recorder.timed('GET /auth/logout', session, 'GET', f'{base_url}/auth/logout', expect=(302,))
+
+def send_webhooks(recorder, base_url, organizations, rate, deadline):
+    """
+    Post signed customer.subscription.updated events at rate per second
+    """
+    session = requests.Session()
+    subscriptions = stripe_mock.make_subscriptions(organizations)
+    sequence = 0
+
+    while time.monotonic() < deadline:
+        subscription = dict(subscriptions[sequence % organizations], status='active')
+        sequence += 1
+        timestamp = int(time.time())
+        payload = json.dumps({
+            'id': f'evt_load_{timestamp}_{sequence}',
+            'object': 'event',
+            'type': 'customer.subscription.updated',
+            'created': timestamp,
+            'data': {'object': subscription},
+        })
+        signature = hmac.new(WEBHOOK_SECRET.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+
+        recorder.timed(
+            'POST /billing/webhook', session, 'POST', f'{base_url}/billing/webhook',
+            data=payload, headers={'Content-Type': 'application/json', 'Stripe-Signature': f't={timestamp},v1={signature}'}
+        )
+        time.sleep(1 / rate)
+
+def print_report(rows, duration, users, emails):
+    total = sum(row['requests'] for row in rows)
+    errors = sum(sum(row['failures'].values()) for row in rows)
+
+    print(f"\n{users} users for {duration:.0f}s: {total} requests, {total / duration:.1f} req/s, "
+          f"{errors} errors, {emails} emails delivered to the sink\n")
+    print(f"{'Endpoint':<42}{'Requests':>9}{'Req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Errors':>8}  Failures")
+    for row in rows:
+        failures = ', '.join(f'{status} x{count}' for status, count in sorted(row['failures'].items()))
+        print(f"{row['endpoint']:<42}{row['requests']:>9}{row['rps']:>8}{row['p50_ms']:>9}"
+              f"{row['p95_ms']:>9}{row['p99_ms']:>9}{row['error_rate']:>8.1%}  {failures}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='End-to-end load test against gunicorn with local stand-ins')
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of load')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+    parser.add_argument('--size', choices=list(SIZES), default='small', help='Synthetic dataset size')
+    parser.add_argument('--export-share', type=float, default=0.2, help='Share of visits that also export CSV and PDF')
+    parser.add_argument('--webhook-rate', type=float, default=2, help='Stripe webhooks per second (0 disables)')
+    parser.add_argument('--job-interval', type=float, default=20, help='Seconds between scheduler job runs (0 disables)')
+    parser.add_argument('--json', help='Also write the report to this file')
+    parser.add_argument('--keep', action='store_true', help='Keep the database, uploads and slow-request log afterwards')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='clearcomply_load_')
+    database_path = os.path.join(workdir, 'load.db')
+    organizations, requirements_per_org = SIZES[args.size][:2]
+
+    print(f"Seeding {args.size} dataset in {workdir}")
+    prepare_database(database_path, args.size)
+
+    mock_process, mock_url = stripe_mock.start_process(organizations)
+    sink_process, sink_port, sent = smtp_sink.start_process()
+
+    env = dict(
+        os.environ,
+        DATABASE_URL=f'sqlite:///{database_path}',
+        UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+        PROFILE_FOLDER=os.path.join(workdir, 'profiles'),
+        SLOW_REQUEST_LOG=os.path.join(workdir, 'slow_requests.log'),
+        GUNICORN_ACCESS_LOG='',
+        SECRET_KEY='load-test-secret',
+        MAIL_SERVER='127.0.0.1',
+        MAIL_PORT=str(sink_port),
+        MAIL_USE_TLS='false',
+        STRIPE_API_BASE=mock_url,
+        STRIPE_SECRET_KEY='sk_test_load',
+        STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+        PYTHONPATH=REPO_ROOT,
+    )
+    os.makedirs(env['UPLOAD_FOLDER'], exist_ok=True)
+
+    server, base_url = start_server(env, args.workers, args.threads)
+    stop_jobs = multiprocessing.Event()
+    jobs = None
+    if args.job_interval > 0:
+        jobs = multiprocessing.Process(target=run_jobs, args=(env, database_path, args.job_interval, stop_jobs), daemon=True)
+        jobs.start()
+
+    recorder = Recorder()
+    started_at = time.monotonic()
+    deadline = started_at + args.duration
+
+    threads = [
+        threading.Thread(
+            target=user_journeys,
+            args=(recorder, base_url, index % organizations + 1, requirements_per_org, args.export_share, deadline, index),
+            daemon=True
+        )
+        for index in range(args.users)
+    ]
+    if args.webhook_rate > 0:
+        threads.append(threading.Thread(
+            target=send_webhooks, args=(recorder, base_url, organizations, args.webhook_rate, deadline), daemon=True
+        ))
+
+    print(f"Driving {args.users} users against {base_url} ({args.workers} workers x {args.threads} threads) for {args.duration:.0f}s")
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        duration = time.monotonic() - started_at
+        stop_jobs.set()
+        if jobs:
+            jobs.join(timeout=30)
+        server.terminate()
+        server.wait(timeout=30)
+        mock_process.terminate()
+        sink_process.terminate()
+
+    rows = recorder.report(duration)
+    print_report(rows, duration, args.users, sent.value)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'users': args.users, 'duration': duration, 'emails': sent.value, 'endpoints': rows}, f, indent=2)
+
+    if args.keep:
+        print(f"\nKept {workdir} (slow requests in slow_requests.log)")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
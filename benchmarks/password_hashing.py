@@ -0,0 +1,47 @@
+"""
+Report password verifications (logins) per second per core for each hash configuration.
+
+Usage:
+    python -m benchmarks.password_hashing [method ...]
+
+Methods are werkzeug method strings, e.g. scrypt:32768:8:1 or pbkdf2:sha256:600000.
+"""
+from werkzeug.security import generate_password_hash, check_password_hash
+import sys
+import time
+
+DEFAULT_METHODS = [
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+    'scrypt:65536:8:1',
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:1000000',
+]
+
+# Minimum wall time spent measuring each method
+MIN_SECONDS = 2.0
+
+def benchmark(method, password='correct horse battery staple'):
+    """
+    Time check_password_hash on one thread (one core) until MIN_SECONDS has elapsed
+    """
+    password_hash = generate_password_hash(password, method=method)
+    check_password_hash(password_hash, password)
+
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < MIN_SECONDS:
+        check_password_hash(password_hash, password)
+        count += 1
+    elapsed = time.perf_counter() - start
+
+    return count / elapsed, elapsed / count * 1000
+
+def main(methods):
+    print(f"{'Method':<28}{'Logins/s/core':>15}{'ms/login':>12}")
+    for method in methods:
+        rate, ms = benchmark(method)
+        print(f"{method:<28}{rate:>15.1f}{ms:>12.1f}")
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or DEFAULT_METHODS)
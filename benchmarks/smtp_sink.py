@@ -0,0 +1,86 @@
+"""
+Minimal local SMTP server that accepts and discards every message, for load
+tests. Point the app at it with MAIL_SERVER=127.0.0.1, MAIL_PORT=<port>
+and MAIL_USE_TLS=false.
+
+Usage:
+    python -m benchmarks.smtp_sink [port]
+"""
+from benchmarks.stripe_mock import free_port
+import socketserver
+import multiprocessing
+import socket
+import time
+import sys
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, counter=None):
+        # Messages accepted; a multiprocessing.Value so a parent process can read it
+        self.counter = counter if counter is not None else multiprocessing.Value('i', 0)
+        super().__init__((host, port), SMTPHandler)
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.reply('220 smtp-sink ready')
+        in_data = False
+
+        for raw in self.rfile:
+            line = raw.rstrip(b'\r\n')
+
+            if in_data:
+                if line == b'.':
+                    in_data = False
+                    with self.server.counter.get_lock():
+                        self.server.counter.value += 1
+                    self.reply('250 OK: queued')
+                continue
+
+            command = line[:4].upper()
+            if command == b'EHLO':
+                self.wfile.write(b'250-smtp-sink\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n')
+            elif command == b'DATA':
+                in_data = True
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                break
+            else:  # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply('250 OK')
+
+def serve(port, counter):
+    """
+    Run the sink in the foreground
+    """
+    SMTPSink(port=port, counter=counter).serve_forever()
+
+def start_process():
+    """
+    Run the sink in a separate process. Returns (process, port, counter);
+    counter.value is the number of messages received so far.
+    """
+    port = free_port()
+    counter = multiprocessing.Value('i', 0)
+    process = multiprocessing.Process(target=serve, args=(port, counter), daemon=True)
+    process.start()
+
+    # Wait until it accepts connections
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+
+    return process, port, counter
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    port = int(args[0]) if args else 1025
+    print(f"SMTP sink listening on 127.0.0.1:{port}")
+    serve(port, multiprocessing.Value('i', 0))
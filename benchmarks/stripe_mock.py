@@ -0,0 +1,160 @@
+"""
+Minimal local stand-in for the Stripe API, for benchmarks and load tests.
+
+Serves a synthetic set of subscriptions with Stripe-style cursor pagination,
+plus checkout and billing portal sessions. Point the app at it with
+STRIPE_API_BASE=http://127.0.0.1:<port>.
+
+Usage:
+    python -m benchmarks.stripe_mock [port] [subscriptions]
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import multiprocessing
+import threading
+import socket
+import json
+import time
+import sys
+
+def make_subscriptions(count, period_end=1800000000):
+    """
+    Build count synthetic subscriptions for customers cus_0 .. cus_{count-1}
+    """
+    statuses = ['active'] * 17 + ['past_due', 'canceled', 'trialing']
+    return [
+        {
+            'id': f'sub_{i}',
+            'object': 'subscription',
+            'customer': f'cus_{i}',
+            'status': statuses[i % len(statuses)],
+            'created': 1700000000 + i,
+            'current_period_end': period_end + (i % 28) * 86400,
+            'cancel_at_period_end': i % 50 == 0,
+            'metadata': {},
+        }
+        for i in range(count)
+    ]
+
+class StripeMock:
+    def __init__(self, subscriptions=None, host='127.0.0.1', port=0):
+        self.subscriptions = subscriptions or []
+        self.index = {sub['id']: position for position, sub in enumerate(self.subscriptions)}
+        self.request_count = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='stripe-mock', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def list_subscriptions(self, query):
+        limit = min(int(query.get('limit', ['10'])[0]), 100)
+        start = 0
+        if 'starting_after' in query:
+            start = self.index[query['starting_after'][0]] + 1
+        page = self.subscriptions[start:start + limit]
+        return {
+            'object': 'list',
+            'url': '/v1/subscriptions',
+            'has_more': start + limit < len(self.subscriptions),
+            'data': page,
+        }
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; avoid delayed-ACK stalls
+            disable_nagle_algorithm = True
+
+            def send_json(self, body, status=200):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                mock.request_count += 1
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == '/v1/subscriptions':
+                    self.send_json(mock.list_subscriptions(query))
+                elif url.path.startswith('/v1/checkout/sessions/'):
+                    session_id = url.path.rsplit('/', 1)[1]
+                    subscription = mock.subscriptions[0] if mock.subscriptions else None
+                    self.send_json({
+                        'id': session_id,
+                        'object': 'checkout.session',
+                        'customer': subscription['customer'] if subscription else None,
+                        'subscription': subscription,
+                        'metadata': {},
+                    })
+                else:
+                    self.send_json({'error': {'type': 'invalid_request_error', 'message': 'Not mocked'}}, 404)
+
+            def do_POST(self):
+                mock.request_count += 1
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                url = urlparse(self.path)
+                if url.path == '/v1/checkout/sessions':
+                    self.send_json({'id': 'cs_mock', 'object': 'checkout.session', 'url': 'https://checkout.stripe.test/cs_mock'})
+                elif url.path == '/v1/billing_portal/sessions':
+                    self.send_json({'id': 'bps_mock', 'object': 'billing_portal.session', 'url': 'https://billing.stripe.test/bps_mock'})
+                else:
+                    self.send_json({'error': {'type': 'invalid_request_error', 'message': 'Not mocked'}}, 404)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def free_port():
+    """
+    Ask the OS for an unused local port
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def serve(port, subscription_count):
+    """
+    Run the mock in the foreground
+    """
+    StripeMock(make_subscriptions(subscription_count), port=port).server.serve_forever()
+
+def start_process(subscription_count=0):
+    """
+    Run the mock in a separate process so it does not share the caller's GIL.
+    Returns (process, url); terminate the process when done.
+    """
+    port = free_port()
+    process = multiprocessing.Process(target=serve, args=(port, subscription_count), daemon=True)
+    process.start()
+
+    # Wait until it accepts connections
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+
+    return process, f'http://127.0.0.1:{port}'
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    port = int(args[0]) if args else 12111
+    print(f"Stripe mock listening on http://127.0.0.1:{port}")
+    serve(port, int(args[1]) if len(args) > 1 else 1000)
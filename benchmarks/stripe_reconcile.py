@@ -0,0 +1,77 @@
+"""
+Benchmark the nightly Stripe reconciliation against the local Stripe mock.
+
+Usage:
+    python -m benchmarks.stripe_reconcile [subscriptions] [drift_percent]
+"""
+from benchmarks.stripe_mock import start_process, make_subscriptions
+from datetime import datetime
+from flask import Flask
+import tempfile
+import random
+import time
+import sys
+import os
+
+def main(count=100000, drift_percent=5):
+    mock_process, mock_url = start_process(count)
+
+    # The Stripe client reads these when backend.routes.stripe is imported
+    os.environ['STRIPE_API_BASE'] = mock_url
+    os.environ['STRIPE_SECRET_KEY'] = 'sk_test_benchmark'
+
+    from backend.database.database import db
+    from backend.models.auth import User, Organization
+    from backend.models.finance import Subscription
+    from backend.utils.stripe_reconcile import reconcile_subscriptions
+
+    workdir = tempfile.mkdtemp(prefix='clearcomply_bench_')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        now = datetime.utcnow()
+        rng = random.Random(42)
+
+        db.session.execute(db.insert(User), [
+            {'id': i + 1, 'email': f'user{i}@example.com', 'password_hash': '-', 'organization_id': i + 1, 'created_at': now}
+            for i in range(count)
+        ])
+        db.session.execute(db.insert(Organization), [
+            {'id': i + 1, 'name': f'Org {i}', 'org_owner_id': i + 1, 'created_at': now}
+            for i in range(count)
+        ])
+
+        rows = []
+        for sub in make_subscriptions(count):
+            i = int(sub['id'].split('_')[1])
+            row = {
+                'organization_id': i + 1,
+                'stripe_customer_id': sub['customer'],
+                'stripe_subscription_id': sub['id'],
+                'status': sub['status'],
+                'current_period_end': datetime.fromtimestamp(sub['current_period_end']),
+                'cancel_at_period_end': sub['cancel_at_period_end'],
+                'created_at': now,
+                'updated_at': now,
+            }
+            # Introduce drift a webhook would normally have corrected
+            if rng.random() * 100 < drift_percent:
+                row['status'] = 'active' if sub['status'] != 'active' else 'past_due'
+            rows.append(row)
+        db.session.execute(db.insert(Subscription), rows)
+        db.session.commit()
+
+        start = time.perf_counter()
+        report = reconcile_subscriptions()
+        elapsed = time.perf_counter() - start
+
+    print(f"Reconciled {count} subscriptions in {elapsed:.2f}s ({count / elapsed:.0f}/s)")
+    print(report)
+    mock_process.terminate()
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 100000, float(args[1]) if len(args) > 1 else 5)
@@ -0,0 +1,191 @@
+"""
+Seeded synthetic tenant data for benchmarks.
+
+Fills a fresh database with N organizations x M requirements x
+K documents x R reminder logs. Expiration dates follow a realistic mix:
+most requirements renew within two years, some have lapsed, a band is
+expiring within 30 days and a few fall exactly on reminder days.
+
+Usage:
+    python -m benchmarks.synthetic_data DATABASE_PATH [orgs] [requirements] [documents] [reminders] [seed]
+"""
+from datetime import datetime, timedelta
+from flask import Flask
+from flask_mail import Mail
+import pandas as pd
+import numpy as np
+import time
+import sys
+
+# Named dataset sizes: (orgs, requirements per org, documents per requirement, reminder logs per requirement)
+SIZES = {
+    'small': (5, 200, 1, 2),
+    'medium': (20, 1000, 2, 4),
+    'large': (50, 4000, 2, 4),
+}
+
+# Rows per executemany batch
+INSERT_BATCH_SIZE = 10000
+
+# Share of requirements in each expiration band
+EXPIRATION_BANDS = {
+    'expired': 0.08,        # lapsed up to a year ago
+    'reminder_day': 0.03,   # exactly 0, 7 or 30 days out
+    'expiring_soon': 0.14,  # 1-30 days out
+    'future': 0.75,         # 31 days to two years out
+}
+
+def make_app(database_uri, **config):
+    """
+    Minimal app with the database and mail extensions the benchmarked code
+    needs; config overrides the defaults (e.g. to send mail to a sink)
+    """
+    from backend.database.database import db, get_engine_options, apply_sqlite_pragmas
+    import backend.models.auth, backend.models.compliance, backend.models.reminders, backend.models.finance, backend.models.profiling, backend.models.history  # noqa: F401 (register tables)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options(database_uri)
+    app.config['MAIL_SUPPRESS_SEND'] = True
+    app.config['MAIL_DEFAULT_SENDER'] = 'bench@example.com'
+    app.config.update(config)
+    db.init_app(app)
+    mail = Mail(app)
+
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine)
+        db.create_all()
+
+    return app, mail
+
+def expiration_offsets(rng, count):
+    """
+    Days from today until each requirement expires
+    """
+    bands = rng.choice(len(EXPIRATION_BANDS), size=count, p=list(EXPIRATION_BANDS.values()))
+    offsets = np.empty(count, dtype=np.int64)
+
+    masks = [bands == index for index in range(len(EXPIRATION_BANDS))]
+    offsets[masks[0]] = rng.integers(-365, 0, masks[0].sum())
+    offsets[masks[1]] = rng.choice([0, 7, 30], masks[1].sum())
+    offsets[masks[2]] = rng.integers(1, 31, masks[2].sum())
+    offsets[masks[3]] = rng.integers(31, 731, masks[3].sum())
+
+    return offsets
+
+def _insert(table, frame):
+    """
+    Insert a DataFrame into a table in batched executemany calls
+    """
+    from backend.database.database import db
+
+    for start in range(0, len(frame), INSERT_BATCH_SIZE):
+        db.session.execute(table.insert(), frame.iloc[start:start + INSERT_BATCH_SIZE].to_dict('records'))
+
+def generate(orgs, requirements, documents, reminders, seed=42):
+    """
+    Fill the current app's empty database. Returns row counts per table.
+    """
+    from backend.database.database import db
+    from backend.models.auth import User, Organization
+    from backend.models.compliance import ComplianceRequirement, ComplianceDocument
+    from backend.models.reminders import ReminderLog
+
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    today = datetime.now().date()
+
+    org_ids = np.arange(1, orgs + 1)
+    _insert(User.__table__, pd.DataFrame({
+        'id': org_ids,
+        'email': [f'owner{i}@example.com' for i in org_ids],
+        'password_hash': '-',
+        'organization_id': org_ids,
+        'created_at': now,
+    }))
+    _insert(Organization.__table__, pd.DataFrame({
+        'id': org_ids,
+        'name': [f'Organization {i}' for i in org_ids],
+        'org_owner_id': org_ids,
+        'created_at': now,
+        'data_version': 0,
+    }))
+
+    total = orgs * requirements
+    requirement_ids = np.arange(1, total + 1)
+    offsets = expiration_offsets(rng, total)
+    expiration_dates = pd.to_datetime(today) + pd.to_timedelta(offsets, unit='D')
+
+    # Same rules as update_all_statuses
+    status = np.select(
+        [offsets < 0, offsets <= 30, np.full(total, documents > 0)],
+        ['expired', 'expiring_soon', 'compliant'],
+        default='missing'
+    )
+
+    upload_times = now - pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, total * documents), unit='s')
+    latest_upload = None
+    if documents:
+        latest_upload = pd.Series(upload_times).groupby(np.repeat(requirement_ids, documents)).max().to_numpy()
+
+    _insert(ComplianceRequirement.__table__, pd.DataFrame({
+        'id': requirement_ids,
+        'name': [f'Requirement {i}' for i in requirement_ids],
+        'description': np.where(rng.random(total) < 0.6, 'Synthetic requirement for benchmarking', None),
+        'expiration_date': expiration_dates.date,
+        'renewal_frequency': rng.choice(['annual', 'quarterly', 'monthly', None], total),
+        'status': status,
+        'organization_id': np.repeat(org_ids, requirements),
+        'created_at': now,
+        'updated_at': now,
+        'document_count': documents,
+        'latest_document_uploaded_at': latest_upload if latest_upload is not None else None,
+    }).astype({'latest_document_uploaded_at': object}))
+
+    if documents:
+        document_ids = np.arange(1, total * documents + 1)
+        _insert(ComplianceDocument.__table__, pd.DataFrame({
+            'id': document_ids,
+            'requirement_id': np.repeat(requirement_ids, documents),
+            'filename': [f'document_{i}.pdf' for i in document_ids],
+            'file_path': [f'/nonexistent/uploads/document_{i}.pdf' for i in document_ids],
+            'stored_name': [f'document_{i}.pdf' for i in document_ids],
+            'version': 1,
+            'uploaded_at': pd.Series(upload_times).dt.to_pydatetime(),
+        }))
+
+    if reminders:
+        log_count = total * reminders
+        log_requirements = np.repeat(requirement_ids, reminders)
+        _insert(ReminderLog.__table__, pd.DataFrame({
+            'requirement_id': log_requirements,
+            'reminder_type': rng.choice(['30_day', '7_day', 'day_of'], log_count),
+            'sent_at': (now - pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, log_count), unit='s')).to_pydatetime(),
+            'email_to': [f'owner{(i - 1) // requirements + 1}@example.com' for i in log_requirements],
+        }))
+
+    db.session.commit()
+
+    return {
+        'organization': orgs,
+        'compliance_requirement': total,
+        'compliance_document': total * documents,
+        'reminder_log': total * reminders,
+    }
+
+def main(database_path, orgs=10, requirements=1000, documents=2, reminders=4, seed=42):
+    app, mail = make_app(f'sqlite:///{database_path}')
+
+    start = time.perf_counter()
+    with app.app_context():
+        counts = generate(orgs, requirements, documents, reminders, seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"Generated {counts} in {elapsed:.1f}s")
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    main(args[0], *[int(arg) for arg in args[1:]])
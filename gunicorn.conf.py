@@ -0,0 +1,59 @@
+"""
+Production gunicorn settings: gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment. Run `flask init-db`
+before the first start and a single `flask run-scheduler` beside the web tier.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 8000)}")
+
+# Import the app once in the master so workers fork with it loaded (faster
+# boots, shared memory pages); per-process resources are set up in post_fork
+preload_app = True
+
+# Threads keep a worker busy while requests wait on the database, SMTP, Stripe
+# or file I/O (uploads, downloads, exports); processes spread CPU work across cores
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Seconds an idle client connection is held open for its next request
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Seconds a request may take (PDF exports of large organizations) before the worker is replaced
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Recycle each worker after a jittered number of requests so slow leaks and
+# fragmentation never build up, and workers don't all restart at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# Seconds a recycled or stopping worker gets to finish in-flight requests
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Access log destination; set GUNICORN_ACCESS_LOG empty to turn it off
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def post_fork(server, worker):
+    """
+    Database connections and threads don't survive fork: drop pooled
+    connections inherited from the master and start this worker's own
+    Stripe event worker (the webhook wakes the one in its own process)
+    """
+    from backend.database.database import db
+    from app import start_background_workers
+
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    if app.config['SCHEDULER_ENABLED']:
+        server.log.warning('SCHEDULER_ENABLED is ignored under gunicorn; run `flask run-scheduler` once instead')
+        app.config['SCHEDULER_ENABLED'] = False
+
+    start_background_workers(app)